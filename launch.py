@@ -90,7 +90,7 @@ def reset_ui(validate_button, server_button, param_widgets):
 def create_gui():
     root = tk.Tk()
     root.title("Simulation Launcher")
-    root.geometry("600x500")
+    root.geometry("600x580")
 
     # Widgets pour les configurations
     ttk.Label(root, text="Mode de configuration:").grid(row=0, column=0, sticky=tk.W, padx=5, pady=5)
@@ -126,9 +126,20 @@ def create_gui():
     display_info_combobox = ttk.Combobox(root, textvariable=display_info_var, values=["true", "false"], state="readonly")
     display_info_combobox.grid(row=6, column=1, padx=5, pady=5)
 
+    ttk.Label(root, text="Horloge:").grid(row=7, column=0, sticky=tk.W, padx=5, pady=5)
+    clock_var = tk.StringVar(value="realtime")
+    clock_combobox = ttk.Combobox(root, textvariable=clock_var, values=["realtime", "scaled", "fast"], state="readonly")
+    clock_combobox.grid(row=7, column=1, padx=5, pady=5)
+
+    ttk.Label(root, text="Accélération (scaled):").grid(row=8, column=0, sticky=tk.W, padx=5, pady=5)
+    time_scale_entry = ttk.Entry(root)
+    time_scale_entry.insert(0, "20")
+    time_scale_entry.grid(row=8, column=1, padx=5, pady=5)
+
     param_widgets = [
         server_address_entry, agent_count_spinbox, map_spinbox,
-        verbose_combobox, mode_combobox, display_info_combobox
+        verbose_combobox, mode_combobox, display_info_combobox,
+        clock_combobox, time_scale_entry
     ]
 
     def validate_config():
@@ -165,7 +176,7 @@ def create_gui():
 
         elif mode == "Server Only":
             server_address_entry.config(state="normal")
-            server_button.grid(row=7, column=1, padx=5, pady=5)
+            server_button.grid(row=9, column=1, padx=5, pady=5)
             agent_count_spinbox.config(state="normal")
             map_spinbox.config(state="normal")
             verbose_combobox.config(state="disabled")
@@ -174,7 +185,7 @@ def create_gui():
 
         elif mode == "Client-Server":
             server_address_entry.config(state="normal")
-            server_button.grid(row=7, column=1, padx=5, pady=5)
+            server_button.grid(row=9, column=1, padx=5, pady=5)
             agent_count_spinbox.config(state="normal")
             map_spinbox.config(state="normal")
             verbose_combobox.config(state="normal")
@@ -186,7 +197,7 @@ def create_gui():
         if server_running:
             messagebox.showinfo("Serveur", "Le serveur est déjà en cours d'exécution.")
             return
-        command = f"python -u scripts/server.py --nb_agents {number_of_agents} --map_id {map_spinbox.get()} --ip_server {server_address_entry.get()}"
+        command = f"python -u scripts/server.py --nb_agents {number_of_agents} --map_id {map_spinbox.get()} --ip_server {server_address_entry.get()} --clock {clock_var.get()} --time_scale {time_scale_entry.get()}"
         run_in_console(command)
         server_button.config(text="Serveur Démarré", bg="green")
         server_running = True
@@ -197,24 +208,24 @@ def create_gui():
             return
         agent_button = agent_buttons[agent_index]
         agent_button.config(bg="green", text=f"Agent {agent_index} Démarré")
-        command = f"python -u scripts/agent.py --server_ip {server_address_entry.get()} --run {mode_var.get()} --display_info {display_info_var.get()} --verbose {verbose_var.get()}"
+        command = f"python -u scripts/agent.py --server_ip {server_address_entry.get()} --run {mode_var.get()} --display_info {display_info_var.get()} --verbose {verbose_var.get()} --clock {clock_var.get()} --time_scale {time_scale_entry.get()}"
         run_in_console(command)
 
     def close_all():
         close_all_processes(validate_button, server_button)
 
     validate_button = ttk.Button(root, text="Valider Paramétrage", command=validate_config)
-    validate_button.grid(row=7, column=0, padx=5, pady=5)
+    validate_button.grid(row=9, column=0, padx=5, pady=5)
 
     server_button = tk.Button(root, text="Démarrer le Serveur", command=toggle_server, bg="gray", state=tk.DISABLED)
-    server_button.grid(row=7, column=1, padx=5, pady=5)
+    server_button.grid(row=9, column=1, padx=5, pady=5)
 
-    ttk.Button(root, text="Arrêter Tous", command=close_all).grid(row=8, column=0, padx=5, pady=5)
+    ttk.Button(root, text="Arrêter Tous", command=close_all).grid(row=10, column=0, padx=5, pady=5)
 
     def add_agent_buttons():
         for i in range(number_of_agents):
             agent_button = tk.Button(root, text=f"Lancer Agent {i}", command=lambda idx=i: toggle_agent(idx), bg="gray")
-            agent_button.grid(row=9 + i, column=0, padx=5, pady=5)
+            agent_button.grid(row=11 + i, column=0, padx=5, pady=5)
             agent_buttons.append(agent_button)
 
     config_combobox.bind("<<ComboboxSelected>>", lambda _: update_ui())
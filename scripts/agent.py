@@ -5,10 +5,18 @@ __license__ = "Apache License 2.0"
 __version__ = "1.0.0"
 
 from network import Network
+from planner import GridPlanner, OBSTACLE_COST
+from belief import BeliefGrid, classify, UNKNOWN_VALUE, VALUE_OF_CLASS
+from observations import ObservationLog, decode_delta
+from sampling import border_points
+from tour import build_tour, farthest_first
+from localizer import Localizer
+from clock import Clock, CLOCK_MODES, make_clock
+from explorer import FrontierExplorer
 from my_constants import *
 from random import randint
-from threading import Thread
-from time import sleep, time
+from threading import Thread, Event
+from time import sleep
 from datetime import datetime
 
 import numpy as np
@@ -16,15 +24,26 @@ import random
 import math
 import traceback
 import argparse
+import sys
 
 class Agent:
     """ This class implements the behaviour of each agent based on their perception and communication with other agents"""
-    def __init__(self, server_ip, verbose):
+    def __init__(self, server_ip, verbose, protocol="auto", batch_size=10, network=None, clock=None, planner="astar", tour="farthest", search="model", explore="border", share_every=20, start_timeout=None):
         """Initializes the agent with server connection and configurations.
 
         Args:
             server_ip (str): IP address of the server.
             verbose (bool): Verbosity level for debugging information.
+            protocol (str, optional): Wire format, 'auto' negotiates the binary one and 'legacy' forces pickle. Defaults to 'auto'.
+            batch_size (int, optional): Maximum number of moves sent in a single MOVE_BATCH request. Defaults to 10.
+            network (Network, optional): Already connected transport, e.g. an in-memory one for headless simulations. Defaults to None.
+            clock (Clock, optional): Clock pacing the pauses between actions (see clock.py), the fast clock skips them. Defaults to a real-time clock.
+            planner (str, optional): 'astar' plans around the obstacles learned so far, 'greedy' goes in straight lines. Defaults to 'astar'.
+            tour (str, optional): Order of the points of interest, 'farthest' zig-zags across the map and 'shortest' needs the fewest moves. Defaults to 'farthest'.
+            search (str, optional): Search of an item once in its rings, 'model' deduces its position from the readings and 'hotcold' probes every neighbour. Defaults to 'model'.
+            explore (str, optional): Exploration, 'border' goes through random points near the edges and 'frontier' covers the region of the map negotiated with the other agents. Defaults to 'border'.
+            share_every (int, optional): Moves between two broadcasts of the cells observed, merged by the other agents in their own map. 0 disables the sharing. Defaults to 20.
+            start_timeout (float, optional): Seconds to wait for the other agents to connect before giving up, None waits as long as needed. Defaults to None.
         """
         self.nav_state = {
                             "nav_state": 'nav',
@@ -42,29 +61,40 @@ class Agent:
                             "visited_cell_count":0
                         }
         self.internal_agent_broadcast_stat = {"nb_send":0, "nb_receive":0, "box_coord_found_by_other":False, "key_coord_found_by_other":False}
-        self.forbidden_cells = []
+        self.batch_size = batch_size
+        self.clock = clock if clock is not None else Clock()
+        self.tour = tour
+        self.search = search
 
         # DO NOT TOUCH THE FOLLOWING INSTRUCTIONS
-        self.network = Network(server_ip=server_ip)
+        self.network = network if network is not None else Network(server_ip=server_ip, protocol=protocol)
         self.agent_id = self.network.id
         self.running = True
         self.verbose = verbose
-        self.network.send({"header": GET_DATA})
         self.msg = {}
-        env_conf = self.network.receive()
         self.nb_agent_expected = 0
         self.nb_agent_connected = 0
+        self.start_timeout = start_timeout
+        self.game_started = Event()  # set by msg_cb when the server sends GAME_START
+        self.region_claims = {}  # agent id -> position announced by each exploring agent (see explorer.py)
+        self.belief = self.planner = self.explorer = None  # created once the size of the map is known
+        Thread(target=self.msg_cb, daemon=True).start()  # reads every message, replies included
+        env_conf = self.network.request({"header": GET_DATA})
         self.x, self.y = env_conf["x"], env_conf["y"]  # initial agent position
         self.w, self.h = env_conf["w"], env_conf["h"]  # environment dimensions
+        self.planner = GridPlanner(self.w, self.h) if planner == "astar" else None
+        self.belief = BeliefGrid(self.w, self.h)  # observed values, visits and forbidden cells
+        self.nb_replans = 0  # replans since the last point of interest was reached
+        self.observations = ObservationLog(share_every) if share_every else None  # cells to share with the others
+        self.explorer = FrontierExplorer(self.w, self.h, self.agent_id, self.region_claims) if explore == "frontier" else None
 
-        self.visited_cells = []  # Track visited cells
-        self.visited_unic_cells = set()
         cell_val = env_conf["cell_val"]  # value of the cell the agent is located in
-        Thread(target=self.msg_cb, daemon=True).start()
+        self.belief.observe(self.x, self.y, cell_val)
         self.wait_for_connected_agent()
+        if self.explorer is not None:
+            self.explorer.cover(self.x, self.y)
+            self.communicate_region(REGION_CLAIM)
         print(f"{CONSOLE_COLOR['YELLOW']}[WARNING>'__init__'] - Name: Agent_{self.agent_id}{CONSOLE_COLOR['RESET']}")
-
-        sleep(5)
         
         self.start_date_time = datetime.now()
         self.end_date_time = None
@@ -88,10 +118,15 @@ class Agent:
                 self.msg = data
                 if self.msg["header"] == MOVE:
                     self.x, self.y = self.msg["x"], self.msg["y"]
+                elif self.msg["header"] == MOVE_BATCH:
+                    self.x, self.y = self.msg["x"], self.msg["y"]
                 elif self.msg["header"] == GET_NB_AGENTS:
                     self.nb_agent_expected = self.msg["nb_agents"]
                 elif self.msg["header"] == GET_NB_CONNECTED_AGENTS:
                     self.nb_agent_connected = self.msg["nb_connected_agents"]
+                elif self.msg["header"] == GAME_START:
+                    self.nb_agent_expected = self.nb_agent_connected = self.msg["nb_agents"]
+                    self.game_started.set()
                 elif self.msg["header"] == BROADCAST_MSG:
                     self.handle_broadcast_message(self.msg)
             except EOFError:
@@ -112,18 +147,19 @@ class Agent:
 
 
     def wait_for_connected_agent(self):
-        """We will wait to have the expected number of agents to be connected before starting the game.
+        """We will wait to have the expected number of agents to be connected before starting the game. The server
+        sends GAME_START as soon as the last agent is connected, the agent sleeps until then.
 
         Args:
             None
+
+        Raises:
+            TimeoutError: If the other agents are still not connected after 'start_timeout' seconds.
         """
-        self.network.send({"header": GET_NB_AGENTS})
-        check_conn_agent = True
-        while check_conn_agent:
-            if self.nb_agent_expected == self.nb_agent_connected:
-                if self.verbose:
-                    print(f"{CONSOLE_COLOR['YELLOW']}[WARNING>'wait_for_connected_agent'] - both connected!{CONSOLE_COLOR['RESET']}")
-                check_conn_agent = False
+        if not self.game_started.wait(self.start_timeout):
+            raise TimeoutError(f"The other agents did not connect within {self.start_timeout}s")
+        if self.verbose:
+            print(f"{CONSOLE_COLOR['YELLOW']}[WARNING>'wait_for_connected_agent'] - {self.nb_agent_connected} agents connected!{CONSOLE_COLOR['RESET']}")
     
     
     def calculate_points(self, factor=10):
@@ -141,7 +177,7 @@ class Agent:
 
     def get_random_interest_points(self, factor=10, min_distance=5):
         """Generates random interest points across the grid. It will exclude the forbiden cells and generate it near 
-        to the edges of the map. 
+        to the edges of the map. The sampling takes a bounded time, the spacing is reduced if the edges are too crowded.
 
         Args:
             factor (int, optional): Factor to adjust the density of points. Defaults to 10.
@@ -151,33 +187,7 @@ class Agent:
             list[tuple[int, int]]: List of generated interest points.
         """
         num_points = self.calculate_points(factor)
-        points = []
-
-        while len(points) < num_points:
-            #point = (random.randint(0, self.w - 1), random.randint(0, self.h - 1))
-            point_bord_1 = (random.randint(0, self.w - 1), random.randint(self.h-4, self.h - 1))
-            point_bord_2 = (random.randint(0, 4), random.randint(0, self.h - 1))
-            point_bord_3 = (random.randint(0, self.w - 1), random.randint(0, 4))
-            point_bord_4 = (random.randint(self.w - 4, self.w - 1), random.randint(0, self.h - 1))
-            eucli_dist_bord = []
-            L = [point_bord_1,point_bord_2,point_bord_3,point_bord_4]
-            
-            for i in range(len(L)):
-                eucli_dist_bord.append(self.calculate_euclidean_distance((self.x,self.y),L[i]))
-            min_valeur = min(eucli_dist_bord)
-            index_min = eucli_dist_bord.index(min_valeur)
-            del L[index_min]
-            
-            point = L[randint(0,2)]
-            
-
-            if point not in self.forbidden_cells and all(
-                self.calculate_euclidean_distance(point, existing_point) >= min_distance
-                for existing_point in points
-            ):
-                points.append(point)
-
-        return points
+        return border_points(self.w, self.h, num_points, (self.x, self.y), min_distance, self.belief.is_forbidden)
 
 
     def calculate_euclidean_distance(self, point1, point2):
@@ -194,7 +204,7 @@ class Agent:
 
 
     def determine_order(self, points, start_pos):
-        """Determines the order of points to visit, starting with the farthest one.
+        """Determines the order of points to visit: starting with the farthest one, or the order needing the fewest moves.
 
         Args:
             points (list[tuple[int, int]]): List of points to sort.
@@ -203,20 +213,9 @@ class Agent:
         Returns:
             list[tuple[int, int]]: Sorted list of points to visit.
         """
-        remaining_points = points[:]
-        current_pos = start_pos
-        ordered_points = []
-
-        while remaining_points:
-            farthest_point = max(
-                remaining_points,
-                key=lambda p: self.calculate_euclidean_distance(current_pos, p)
-            )
-            ordered_points.append(farthest_point)
-            remaining_points.remove(farthest_point)
-            current_pos = farthest_point
-
-        return ordered_points
+        if self.tour == "shortest":
+            return build_tour(points, start_pos)
+        return farthest_first(points, start_pos)
 
 
     def generate_commands(self, start_pos, target_pos):
@@ -272,6 +271,55 @@ class Agent:
         return commands, path
 
 
+    def plan_commands(self, start_pos, target_pos):
+        """Generates the commands to go from a position to another one, around the obstacles learned so far when the
+        planner is enabled.
+
+        Args:
+            start_pos (tuple[int, int]): Starting coordinates.
+            target_pos (tuple[int, int]): Target coordinates.
+
+        Returns:
+            tuple[list[int], list[tuple[int, int]]]: Generated commands and path.
+        """
+        if self.planner is not None:
+            return self.planner.plan(tuple(start_pos), tuple(target_pos))
+        return self.generate_commands(start_pos, target_pos)
+
+
+    def learn_cell(self, cell, value):
+        """Records the value of a cell the agent went through in the belief grid, the obstacle cells become costly for
+        the planner.
+
+        Args:
+            cell (tuple[int, int]): Coordinates of the cell.
+            value (float): Value of the cell.
+        """
+        if self.belief.observe(cell[0], cell[1], value) and self.observations is not None:
+            self.observations.add(cell, int(self.belief.cell_class[cell[1], cell[0]]))
+        if self.planner is not None and value == OBSTACLE_NEIGHBOUR_PERCENTAGE:
+            self.planner.set_cost(cell[0], cell[1], OBSTACLE_COST)
+
+
+    def merge_observations(self, delta):
+        """Merges the cells observed by another agent in the belief grid: the cells the agent did not observe itself get
+        their value, the obstacles become costly for the planner and the cells around become covered.
+
+        Args:
+            delta (bytes): Cells observed by the other agent, encoded by observations.encode_delta.
+        """
+        if self.belief is None:  # the other agents may start before this one received the size of the map
+            return
+        for (x, y), code in decode_delta(delta):
+            if self.belief.value_of((x, y)) == UNKNOWN_VALUE:
+                value = VALUE_OF_CLASS[code]
+                self.belief.observe(x, y, value)
+                if self.planner is not None and value == OBSTACLE_NEIGHBOUR_PERCENTAGE:
+                    self.planner.set_cost(x, y, OBSTACLE_COST)
+            if self.explorer is not None:
+                self.explorer.cover(x, y)
+
+
     def generate_path(self):
         """Generates a complete path based on interest points.
 
@@ -286,7 +334,7 @@ class Agent:
         current_pos = (self.x, self.y)
 
         for point in self.points_of_interest:
-            commands, path = self.generate_commands(current_pos, point)
+            commands, path = self.plan_commands(current_pos, point)
             all_commands.extend(commands)
             full_path.extend(path)
             current_pos = point
@@ -310,39 +358,64 @@ class Agent:
                 self.move_to_coordinates(self.nav_state["box"]["coord"][0],self.nav_state["box"]["coord"][1])
                 
                 if self.verbose:
-                    print(f"{CONSOLE_COLOR['CYAN']}[BEHAVIOR>'navigate_to_points']{CONSOLE_COLOR['RESET']} - Moving directly to open the box ({self.x}, {self.y}) -> {self.nav_state["box"]["coord"]}.{CONSOLE_COLOR['RESET']}")
+                    print(f"{CONSOLE_COLOR['CYAN']}[BEHAVIOR>'navigate_to_points']{CONSOLE_COLOR['RESET']} - Moving directly to open the box ({self.x}, {self.y}) -> {self.nav_state['box']['coord']}.{CONSOLE_COLOR['RESET']}")
             
             if self.nav_state["nav_state"] == 'moving_to_key':
                 self.move_to_coordinates(self.nav_state["key"]["coord"][0],self.nav_state["key"]["coord"][1])
                 if self.verbose:
-                    print(f"{CONSOLE_COLOR['CYAN']}[BEHAVIOR>'navigate_to_points']{CONSOLE_COLOR['RESET']} - Moving directly to open the box ({self.x}, {self.y}) -> {self.nav_state["box"]["coord"]}.{CONSOLE_COLOR['RESET']}")
+                    print(f"{CONSOLE_COLOR['CYAN']}[BEHAVIOR>'navigate_to_points']{CONSOLE_COLOR['RESET']} - Moving directly to open the box ({self.x}, {self.y}) -> {self.nav_state['box']['coord']}.{CONSOLE_COLOR['RESET']}")
         
             
             if not self.points_of_interest:
-                self.points_of_interest = self.get_random_interest_points()
-                self.points_of_interest = self.determine_order(self.points_of_interest, (self.x, self.y))
+                frontier = self.explorer.next_target((self.x, self.y), self.belief.forbidden) if self.explorer is not None else None
+                if frontier is not None:
+                    self.points_of_interest = [frontier]
+                else:   # border exploration, or the whole map is already covered
+                    self.points_of_interest = self.get_random_interest_points()
+                    self.points_of_interest = self.determine_order(self.points_of_interest, (self.x, self.y))
                 self.orders, self.path = self.generate_path()
 
             if self.nav_state["nav_state"] == 'nav':
                 if not self.orders or not self.path:
+                    if self.planner is not None:
+                        # the tour was interrupted (obstacle, search...): plan the remaining points from here, giving up
+                        # the next point when it keeps being out of reach
+                        self.nb_replans += 1
+                        while self.points_of_interest and (self.points_of_interest[0] == (self.x, self.y) or self.nb_replans > MAX_REPLANS):
+                            dropped = self.points_of_interest.pop(0)
+                            self.nb_replans = 0
+                            if self.explorer is not None:
+                                self.explorer.skip(dropped)
+                        if self.points_of_interest:
+                            self.orders, self.path = self.generate_path()
+                            continue
                     if self.verbose:
                         print(f"{CONSOLE_COLOR['YELLOW']}[WARNING>'navigate_to_points'] - ERROR: Orders or Path is empty during navigation! Regenerating...{CONSOLE_COLOR['RESET']}")
                     self.points_of_interest = []
                     continue
 
                 target = self.points_of_interest[0]
-                if target in self.forbidden_cells:
+                if self.belief.is_forbidden(target):
                     self.points_of_interest.pop(0)
                     continue
 
                 while self.orders and self.nav_state["nav_state"] != 'mission_completed':
-                    command = self.orders.pop(0)
-                    self.nav_state["last_direction"] = command
-                    self.nav_state["last_coord"] = (self.x, self.y)
-                    self.path.pop(0)
-                    self.move(command)
+                    # the server executes the next moves and stops on the first cell worth a look
+                    batch = self.orders[:self.batch_size]
+                    start_coord = (self.x, self.y)
+                    trajectory, _ = self.move_batch(batch, STOP_ON_NON_ZERO)
+                    if not trajectory:
+                        break
+                    del self.orders[:len(trajectory)]
+                    del self.path[:len(trajectory)]
+                    self.nav_state["last_direction"] = batch[len(trajectory) - 1]
+                    self.nav_state["last_coord"] = trajectory[-2] if len(trajectory) > 1 else start_coord
+                    for cell in trajectory:
+                        self.visit_cell(cell)
+                    while self.points_of_interest and self.points_of_interest[0] in trajectory:
+                        self.points_of_interest.pop(0)  # reached
+                        self.nb_replans = 0
                     cell_type, _ = self.get_data()
-                    self.visit_cell((self.x, self.y))
                     
                     if self.nav_state["key"]["coord"] != (None, None) and self.nav_state["key"]["has_key"] == False:
                         self.nav_state["nav_state"] = 'moving_to_key'
@@ -356,25 +429,25 @@ class Agent:
                         self.path = []
                         break
 
-                    if cell_type in ["KEY_NEIGHBOR", "KEY_OUTER"] and self.nav_state["key"]["has_key"] == False and (self.x, self.y) not in self.forbidden_cells:
+                    if cell_type in ["KEY_NEIGHBOR", "KEY_OUTER"] and self.nav_state["key"]["has_key"] == False and not self.belief.is_forbidden((self.x, self.y)):
                         if self.verbose:
                             print(f"{CONSOLE_COLOR['CYAN']}[BEHAVIOR>'navigate_to_points']{CONSOLE_COLOR['RESET']} - Switching to hot/cold search near ({self.x}, {self.y}).{CONSOLE_COLOR['RESET']}")
                         self.nav_state["nav_state"] = 'hot_cold_search_KEY'
-                        self.hot_cold_search()
+                        self.search_item()
                         self.orders = []
                         self.path = []
                         break
                     
-                    if cell_type in ["BOX_NEIGHBOR", "BOX_OUTER"] and self.nav_state["box"]["coord"] == (None, None) and (self.x, self.y) not in self.forbidden_cells:
+                    if cell_type in ["BOX_NEIGHBOR", "BOX_OUTER"] and self.nav_state["box"]["coord"] == (None, None) and not self.belief.is_forbidden((self.x, self.y)):
                         if self.verbose:
                             print(f"{CONSOLE_COLOR['CYAN']}[BEHAVIOR>'navigate_to_points']{CONSOLE_COLOR['RESET']} - Switching to hot/cold search near ({self.x}, {self.y}).{CONSOLE_COLOR['RESET']}")
                         self.nav_state["nav_state"] = 'hot_cold_search_BOX'
-                        self.hot_cold_search()
+                        self.search_item()
                         self.orders = []
                         self.path = []
                         break
 
-                    sleep(0.2)
+                    self.pause(0.2)
 
             
         print(f"{CONSOLE_COLOR['GREEN']}[INFO>'navigate_to_points'] - Stopping navigation process.{CONSOLE_COLOR['RESET']}")
@@ -390,26 +463,22 @@ class Agent:
         """
 
                 
-        self.orders, self.path = self.generate_commands((self.x, self.y), (target_x, target_y))
+        self.orders, self.path = self.plan_commands((self.x, self.y), (target_x, target_y))
         print(self.path)
         print(self.orders)
-        is_opposite = False
         while self.orders:
-            command = self.orders.pop(0)
-            self.nav_state["last_direction"] = command
+            batch = self.orders[:self.batch_size]
             self.nav_state["last_coord"] = (self.x, self.y)
-            self.path.pop(0)
-            last_dist = self.calculate_euclidean_distance((self.x, self.y),(target_x, target_y))
-            if is_opposite:
-                self.move(OPPOSITE_DIRECTION_INDEX[command])
-            else:
-                self.move(command)
-            new_dist = self.calculate_euclidean_distance((self.x, self.y),(target_x, target_y))
-            self.visit_cell((self.x, self.y))
-            if new_dist>last_dist:
-                is_opposite = True
+            trajectory, _ = self.move_batch(batch, STOP_NEVER)
+            if not trajectory:
+                break
+            del self.orders[:len(trajectory)]
+            del self.path[:len(trajectory)]
+            self.nav_state["last_direction"] = batch[len(trajectory) - 1]
+            for cell in trajectory:
+                self.visit_cell(cell)
             
-            sleep(1)
+            self.pause(1)
         
 
     def avoid_obstacle(self):
@@ -433,11 +502,13 @@ class Agent:
 
         # we go backward by two itterations (2 dirrections)
         for _ in range(2):  
-            self.move(reverse_direction)  # using the direction 
+            if self.move(reverse_direction) is None:  # using the direction, the path is kept if the server did not reply
+                return
             if self.verbose:
                 print(f"{CONSOLE_COLOR['CYAN']}[BEHAVIOR>'avoid_obstacle']{CONSOLE_COLOR['RESET']} - Stepped back in direction '{DIRECTION[reverse_direction]}'.")
 
-        self.move(CLOCKWISE_DIRECTION_INDEX[reverse_direction])
+        if self.move(CLOCKWISE_DIRECTION_INDEX[reverse_direction]) is None:
+            return
         #this is to discard the path and the order
         self.orders = []
         self.path = []
@@ -445,6 +516,54 @@ class Agent:
             print(f"{CONSOLE_COLOR['CYAN']}[BEHAVIOR>'avoid_obstacle']{CONSOLE_COLOR['RESET']} - Path cleared. Navigation will reprogram if needed.")
 
 
+    def search_item(self):
+        """Searches the item whose rings the agent just entered, with the strategy chosen at construction.
+
+        Args:
+            None
+        """
+        if self.search == "hotcold":
+            self.hot_cold_search()
+        else:
+            self.localize_item()
+
+
+    def localize_item(self):
+        """Locates the item whose rings the agent is in by keeping the cells that can be its centre given every value
+        read so far. The agent only moves to the cell that tells the most about the remaining candidates, then to the
+        item once a single candidate is left. Gives up, back to the navigation, when the readings are inconsistent.
+
+        Args:
+            None
+        """
+        value = self.belief.value_of((self.x, self.y))
+        percent = KEY_NEIGHBOUR_PERCENTAGE if value in (KEY_NEIGHBOUR_PERCENTAGE, KEY_NEIGHBOUR_PERCENTAGE/2) else BOX_NEIGHBOUR_PERCENTAGE
+        localizer = Localizer(self.w, self.h, (self.x, self.y), percent, self.belief.is_forbidden)
+        if self.verbose:
+            print(f"{CONSOLE_COLOR['CYAN']}[BEHAVIOR>'localize_item']{CONSOLE_COLOR['RESET']} - Localization initiated near ({self.x}, {self.y}).{CONSOLE_COLOR['RESET']}")
+
+        while localizer.update(self.belief):
+            target = localizer.next_cell((self.x, self.y), self.belief)
+            if target is None:
+                break
+            commands, _ = self.plan_commands((self.x, self.y), target)
+            trajectory, values = self.move_batch(commands, STOP_ON_TARGET)
+            if not trajectory:
+                break
+            for cell in trajectory:
+                self.visit_cell(cell)
+            if values[-1] == 1.0:
+                if self.verbose:
+                    print(f"{CONSOLE_COLOR['GREEN']}[INFO>'localize_item']{CONSOLE_COLOR['RESET']} - Target found at ({self.x}, {self.y}) after {localizer.nb_probes} probe(s)!")
+                self.handle_discovery()
+                return
+            self.pause(0.2)
+
+        if self.verbose:
+            print(f"{CONSOLE_COLOR['YELLOW']}[WARNING>'localize_item'] - No position of the item matches the readings around ({self.x}, {self.y}).{CONSOLE_COLOR['RESET']}")
+        self.nav_state["nav_state"] = 'nav'
+
+
     def hot_cold_search(self):
         """Performs a search to locate target cells (key and box) we implement a hot/cold strategy. That mean that the
         robot explores neighboring cells and decides the best path based on cell values and types.
@@ -456,7 +575,7 @@ class Agent:
             print(f"{CONSOLE_COLOR['CYAN']}[BEHAVIOR>'hot_cold_search']{CONSOLE_COLOR['RESET']} - Hot/Cold search initiated.{CONSOLE_COLOR['RESET']}")
 
         while True:
-            sleep(0.2)
+            self.pause(0.2)
             _, current_cell_value = self.get_data()  # this is to get the datas of the actual cell
             max_value = current_cell_value  # initialize the max value by the actual one 
             original_x, original_y = self.x, self.y  #and stock the actual position 
@@ -469,7 +588,8 @@ class Agent:
 
                 # and verify the limits of the grid and visited cells
                 if 0 <= nx < self.w and 0 <= ny < self.h and (nx, ny):
-                    self.move(direction_index)  # We moove the robot on the given direction 
+                    if self.move(direction_index) is None:  # We moove the robot on the given direction 
+                        continue    # no reply, the agent did not move
                     self.visit_cell((self.x, self.y))
                     neighbor_cell_type, neighbor_cell_value = self.get_data()
                     if self.verbose:
@@ -488,12 +608,12 @@ class Agent:
                             print(f"{CONSOLE_COLOR['GREEN']}[INFO>'hot_cold_search']{CONSOLE_COLOR['RESET']}Better cell found at ({nx}, {ny}) with value {neighbor_cell_value}.")
                         break
                     elif neighbor_cell_value == max_value:
-                        self.move(OPPOSITE_DIRECTION_INDEX[direction_index])  #we moove backward 
-                        self.visit_cell((self.x, self.y))
+                        if self.move(OPPOSITE_DIRECTION_INDEX[direction_index]) is not None:  #we moove backward 
+                            self.visit_cell((self.x, self.y))
                     else:
                         # if the value is less or equal as the original cells we go back on it
-                        self.move(OPPOSITE_DIRECTION_INDEX[direction_index])  # moove backward
-                        self.visit_cell((self.x, self.y))
+                        if self.move(OPPOSITE_DIRECTION_INDEX[direction_index]) is not None:  # moove backward
+                            self.visit_cell((self.x, self.y))
                         
 
     def handle_discovery(self):
@@ -506,18 +626,16 @@ class Agent:
         if cell_type == "TARGET":
             discovered_coord = (self.x, self.y)
             owner, item_type = self.get_owner()
+            if owner == "UNKNOWN" and self.planner is not None:    # centre of an obstacle
+                self.planner.set_cost(self.x, self.y, OBSTACLE_COST)
             
             if item_type == KEY_TYPE:
                 self.communicate_discovery(KEY_TYPE, owner, *discovered_coord)
             elif item_type == BOX_TYPE:
                 self.communicate_discovery(BOX_TYPE, owner, *discovered_coord)
                 
-            # add the cell and it neighbours in forbidden_cells
-            for dx in range(-1, 2):  # neighbours cells (-1, 0, +1)
-                for dy in range(-1, 2):
-                    forbidden_x, forbidden_y = discovered_coord[0] + dx, discovered_coord[1] + dy
-                    if 0 <= forbidden_x < self.w and 0 <= forbidden_y < self.h and (forbidden_x, forbidden_y) not in self.forbidden_cells:
-                        self.forbidden_cells.append((forbidden_x, forbidden_y))
+            # forbid the cell and its neighbours (-1, 0, +1)
+            self.belief.forbid_around(*discovered_coord)
 
             if owner == self.agent_id:
                 
@@ -558,7 +676,7 @@ class Agent:
             else: 
                 if self.verbose:
                     print(f"{CONSOLE_COLOR['CYAN']}[BEHAVIOR>'handle_discovery']{CONSOLE_COLOR['RESET']} - Shifting 3 cells after discovery to avoid cycles.")
-                    self.shift_position(3)
+                self.shift_position(3)
                 
             
 
@@ -574,6 +692,17 @@ class Agent:
             owner = msg.get("owner")  # Owner of the item discovered
             self.internal_agent_broadcast_stat['nb_receive']+=1
 
+            if discovery_type == OBSERVATIONS:
+                if int(owner) != int(self.agent_id):
+                    self.merge_observations(msg["delta"])
+                return
+            if discovery_type == REGION_CLAIM:
+                self.region_claims[int(owner)] = tuple(position)
+                return
+            if discovery_type == REGION_RELEASE:
+                self.region_claims.pop(int(owner), None)
+                return
+
             if owner != None and int(owner) == int(self.agent_id):
                 if int(discovery_type) == KEY_TYPE :
                     # Updates of the key coordonate if it belongs to this agent
@@ -605,10 +734,8 @@ class Agent:
             directions = list(DIRECTION.keys())  # with all possible directions
             direction = random.choice(directions)  # it choose a random direction 
             for _ in range(shift_distance):
-                dx, dy = DIRECTION_MAP[direction]
-                self.move(direction)
-                self.x += dx
-                self.y += dy
+                if self.move(direction) is None:
+                    break
                 if self.verbose:
                     print(f"{CONSOLE_COLOR['GREEN']}[INFO>'shift_position']{CONSOLE_COLOR['RESET']}Shifted randomly to ({self.x}, {self.y}) in direction {DIRECTION[direction]}.")
 
@@ -649,7 +776,7 @@ class Agent:
                     print(f"{CONSOLE_COLOR['MAGENTA']}[BROADCAST>'communicate_discovery'] - {msg}{CONSOLE_COLOR['RESET']}")
 
             # we add a delay to avoid network overload
-            sleep(0.1)
+            self.pause(0.1)
 
         except ConnectionResetError:
             self.running = False
@@ -669,12 +796,60 @@ class Agent:
                 traceback.print_exc()
 
 
+    def share_observations(self, nb_moves):
+        """Counts the moves of the agent and broadcasts the cells observed since the previous broadcast once the log
+        of observations is ready, so that the broadcasts are rate limited.
+
+        Args:
+            nb_moves (int): Number of moves just made.
+        """
+        if self.observations is None:
+            return
+        self.observations.moved(nb_moves)
+        if self.observations.is_ready():
+            msg = {
+                "sender": self.agent_id,
+                "header": BROADCAST_MSG,
+                "type": OBSERVATIONS,
+                "owner": self.agent_id,
+                "delta": self.observations.flush()
+            }
+            self.network.send(msg)
+            self.internal_agent_broadcast_stat['nb_send']+=1
+
+
+    def communicate_region(self, region_type):
+        """Broadcasts the position of the agent to claim a region of the map (REGION_CLAIM), or tells the other agents
+        that it stops exploring (REGION_RELEASE). The agent id is sent as the owner since the server replaces the sender.
+
+        Args:
+            region_type (int): REGION_CLAIM or REGION_RELEASE.
+        """
+        if region_type == REGION_CLAIM:
+            self.region_claims[self.agent_id] = (self.x, self.y)
+        else:
+            self.region_claims.pop(self.agent_id, None)
+        msg = {
+            "sender": self.agent_id,
+            "header": BROADCAST_MSG,
+            "type": region_type,
+            "position": (self.x, self.y),
+            "owner": self.agent_id
+        }
+        self.network.send(msg)
+        self.internal_agent_broadcast_stat['nb_send']+=1
+        if self.verbose:
+            print(f"{CONSOLE_COLOR['MAGENTA']}[BROADCAST>'communicate_region'] - {msg}{CONSOLE_COLOR['RESET']}")
+
+
     def communicate_completed_mission(self):
         """Broadcasts a message indicating the completion of the mission.
 
         Args:
             None
         """
+        if self.explorer is not None:
+            self.communicate_region(REGION_RELEASE)
         msg = {
             "sender":self.agent_id,
             "header": BROADCAST_MSG,
@@ -686,24 +861,73 @@ class Agent:
             print(f"{CONSOLE_COLOR['MAGENTA']}[BRODCAST>'communicate_completed_mission'] - {msg}{CONSOLE_COLOR['RESET']}")
         
 
-    def move(self, direction):
-        """Moves the agent in the specified direction.
+    def move(self, direction, timeout=5):
+        """Moves the agent in the specified direction and waits for the new position.
 
         Args:
             direction (int): Direction to move the agent.
+            timeout (int, optional): Maximum time in seconds to wait for the reply. Defaults to 5.
+
+        Returns:
+            dict: Reply of the server with the new position and the value of the cell, None on timeout.
         """
-        self.network.send({'sender': self.agent_id, 'header': 2, 'direction': direction})
-        sleep(0.05)
+        try:
+            reply = self.network.request({'sender': self.agent_id, 'header': MOVE, 'direction': direction}, timeout)
+        except TimeoutError:
+            if self.verbose:
+                print(f"{CONSOLE_COLOR['YELLOW']}[WARNING>'move'] - Timeout reached while waiting for the new position.{CONSOLE_COLOR['RESET']}")
+            return None
+        self.x, self.y = reply["x"], reply["y"]
+        self.learn_cell((self.x, self.y), reply["cell_val"])
+        self.share_observations(1)
+        return reply
         
         
+    def move_batch(self, directions, stop_on=STOP_NEVER, timeout=5):
+        """Executes a list of moves in a single request. The server stops right after the first cell matching the
+        'stop_on' conditions.
+
+        Args:
+            directions (list[int]): Directions to follow.
+            stop_on (int, optional): Combination of the STOP_ON_* flags. Defaults to STOP_NEVER.
+            timeout (int, optional): Maximum time in seconds to wait for the reply. Defaults to 5.
+
+        Returns:
+            tuple[list[tuple[int, int]], list[float]]: Visited cells and their values, empty lists on timeout.
+        """
+        try:
+            reply = self.network.request({'sender': self.agent_id, 'header': MOVE_BATCH, 'directions': list(directions), 'stop_on': stop_on}, timeout)
+        except TimeoutError:
+            if self.verbose:
+                print(f"{CONSOLE_COLOR['YELLOW']}[WARNING>'move_batch'] - Timeout reached while waiting for the moves.{CONSOLE_COLOR['RESET']}")
+            return [], []
+        self.x, self.y = reply["x"], reply["y"]
+        trajectory = [tuple(cell) for cell in reply["trajectory"]]
+        for cell, value in zip(trajectory, reply["values"]):
+            self.learn_cell(cell, value)
+        self.share_observations(len(trajectory))
+        return trajectory, reply["values"]
+
+
+    def pause(self, seconds):
+        """Waits between two actions so that the moves can be followed on the GUI, shortened or skipped by the clock.
+
+        Args:
+            seconds (float): Duration of the pause, in simulated time.
+        """
+        self.clock.sleep(seconds)
+
+
     def visit_cell(self, cell):
-        """Adds a cell to the list of visited cells and updates unique cells.
+        """Counts a visit of a cell in the belief grid, which keeps the number of visits and of unique cells, and marks
+        the cells around it as covered when exploring frontiers.
 
         Args:
             cell (tuple[int, int]): Coordinates of the visited cell by a tuple.
         """
-        self.visited_cells.append(cell)  
-        self.visited_unic_cells.add(cell)  
+        self.belief.visit(*cell)
+        if self.explorer is not None:
+            self.explorer.cover(*cell)
 
 
     #the next 3 functions will help us to provide some stastistics of the robots performances
@@ -714,9 +938,9 @@ class Agent:
             None
 
         Returns:
-            int: Number of unique cells visited on visited_unic_cells
+            int: Number of unique cells visited, kept by the belief grid
         """
-        return len(self.visited_unic_cells)
+        return self.belief.nb_unique
     
     
     def get_visited_cell_count(self):
@@ -728,7 +952,7 @@ class Agent:
         Returns:
             int: Total number of visited cells.
         """
-        return len(self.visited_cells)
+        return self.belief.nb_visits
     
     
     def get_total_cells(self):
@@ -755,50 +979,33 @@ class Agent:
             cell_value (float): The raw value of the cell for numeric comparisons.
         """
         try:
-            self.network.send({'sender': self.agent_id, 'header': 1})
-            cell_value = float(self.msg['cell_val'])
+            reply = self.network.request({'sender': self.agent_id, 'header': GET_DATA})
+            cell_value = float(reply['cell_val'])
+            self.belief.observe(reply['x'], reply['y'], cell_value)
 
             # Interpretation of values
-            if cell_value == KEY_NEIGHBOUR_PERCENTAGE:
-                return "KEY_NEIGHBOR", cell_value
-            elif cell_value == 0.25:
-                return "KEY_OUTER", cell_value
-            elif cell_value == BOX_NEIGHBOUR_PERCENTAGE:
-                return "BOX_NEIGHBOR", cell_value
-            elif cell_value == 0.3:
-                return "BOX_OUTER", cell_value
-            elif cell_value == OBSTACLE_NEIGHBOUR_PERCENTAGE:
-                return "OBSTACLE_NEIGHBOR", cell_value
-            elif cell_value == 1.0:
-                return "TARGET", cell_value
-            else:
-                return "EMPTY", cell_value
+            return classify(cell_value), cell_value
         except:
             return "UNKNOWN", -1.0  # Default return in case of error
 
 
     def get_owner(self, timeout=5):
         """
-        Get the value of the current cell and classify it based on known percentages.
-        Waits for a valid response with a timeout.
+        Get the owner and the type of the item the agent is located on.
+        Waits for the reply of the server with a timeout.
         Args:
-            timeout (int): Maximum time in seconds to wait for a valid response.
+            timeout (int): Maximum time in seconds to wait for the reply.
         Returns:
             (owner, item_type): Tuple containing the owner ID and item type if successful.
-            ("UNKNOWN", -1.0): Default return in case of timeout or error.
+            ("UNKNOWN", -1.0): Default return if there is no item, in case of timeout or error.
         """
-        start_time = time()
         try:
-            while time() - start_time < timeout:
-                self.network.send({'sender': self.agent_id, 'header': GET_ITEM_OWNER})
-                sleep(0.1)  # wait a bit until having an answer.
-
-                owner = self.msg
-                
-                if "owner" in owner and owner["owner"] is not None:
-                    return (owner["owner"], owner["type"])
+            owner = self.network.request({'sender': self.agent_id, 'header': GET_ITEM_OWNER}, timeout)
+            if owner.get("owner") is not None:
+                return (owner["owner"], owner["type"])
+            return "UNKNOWN", -1.0
 
-            # Timeout is pass
+        except TimeoutError:
             if self.verbose:
                 print(f"{CONSOLE_COLOR['YELLOW']}[WARNING>'get_owner'] - Timeout reached while waiting for owner response.{CONSOLE_COLOR['RESET']}")
             return "UNKNOWN", -1.0
@@ -810,11 +1017,14 @@ class Agent:
             return "UNKNOWN", -1.0  # return if there's an error 
 
         
-    def display_robot_stat(self):
-        """Displays the agent's statistics, including navigation performance.
+    def get_robot_stat(self):
+        """Computes the agent's statistics, including navigation performance.
 
         Args:
             None
+
+        Returns:
+            dict: Statistics printed by display_robot_stat.
         """
         # using the actual hour for calculs 
         end_time = self.end_date_time if self.end_date_time else datetime.now()
@@ -832,30 +1042,56 @@ class Agent:
         percentage_discovered = (unique_cells / total_cells) * 100 if total_cells > 0 else 0
         ration_unique_vs_visited = 1 - (unique_cells/total_cells)
 
+        return {
+            "start_date_time": self.start_date_time,
+            "end_date_time": end_time,
+            "elapsed_seconds": elapsed_seconds,
+            "nav_state": self.nav_state,
+            "coord": (self.x, self.y),
+            "visited_cells": self.get_visited_cell_count(),
+            "unique_cells": unique_cells,
+            "total_cells": total_cells,
+            "percentage_discovered": percentage_discovered,
+            "ration_unique_vs_visited": ration_unique_vs_visited,
+            "nb_send": self.internal_agent_broadcast_stat['nb_send'],
+            "nb_receive": self.internal_agent_broadcast_stat['nb_receive'],
+            "box_coord_found_by_other": self.internal_agent_broadcast_stat['box_coord_found_by_other'],
+            "key_coord_found_by_other": self.internal_agent_broadcast_stat['key_coord_found_by_other'],
+        }
+
+
+    def display_robot_stat(self):
+        """Displays the agent's statistics, including navigation performance.
+
+        Args:
+            None
+        """
+        stat = self.get_robot_stat()
+
         #and print all the stats
         print(f"""
 {CONSOLE_COLOR['BLUE']}============ Robot Information ============{CONSOLE_COLOR['RESET']}
 [TIME PROCESSING]
- > Start Date Time: {CONSOLE_COLOR['YELLOW']}{self.start_date_time.strftime("%Y-%m-%d %H:%M:%S")}{CONSOLE_COLOR['RESET']}
- > End Date Time: {CONSOLE_COLOR['YELLOW']}{end_time.strftime("%Y-%m-%d %H:%M:%S")}{CONSOLE_COLOR['RESET']}
- > Discovering Time: {CONSOLE_COLOR['GREEN']}{elapsed_seconds:.2f} seconds{CONSOLE_COLOR['RESET']}
+ > Start Date Time: {CONSOLE_COLOR['YELLOW']}{stat['start_date_time'].strftime("%Y-%m-%d %H:%M:%S")}{CONSOLE_COLOR['RESET']}
+ > End Date Time: {CONSOLE_COLOR['YELLOW']}{stat['end_date_time'].strftime("%Y-%m-%d %H:%M:%S")}{CONSOLE_COLOR['RESET']}
+ > Discovering Time: {CONSOLE_COLOR['GREEN']}{stat['elapsed_seconds']:.2f} seconds{CONSOLE_COLOR['RESET']}
 
  > Navigation status:
-{CONSOLE_COLOR['BLUE']}{self.nav_state}{CONSOLE_COLOR['RESET']}
+{CONSOLE_COLOR['BLUE']}{stat['nav_state']}{CONSOLE_COLOR['RESET']}
 
- > Robot coord : ({self.x}, {self.y})
+ > Robot coord : {stat['coord']}
 
 [MAP INFORMATION]
- > Number of visited cells: {CONSOLE_COLOR['YELLOW']}{self.get_visited_cell_count()}{CONSOLE_COLOR['RESET']}
- > Number of unique visited cells: {CONSOLE_COLOR['GREEN']}{unique_cells}/{total_cells}{CONSOLE_COLOR['RESET']}
- > Percentage of Discovering: {CONSOLE_COLOR['GREEN']}{percentage_discovered:.2f}%{CONSOLE_COLOR['RESET']}
- > Ration of effecient discovering (total visited / unique cell discovered): {ration_unique_vs_visited}
+ > Number of visited cells: {CONSOLE_COLOR['YELLOW']}{stat['visited_cells']}{CONSOLE_COLOR['RESET']}
+ > Number of unique visited cells: {CONSOLE_COLOR['GREEN']}{stat['unique_cells']}/{stat['total_cells']}{CONSOLE_COLOR['RESET']}
+ > Percentage of Discovering: {CONSOLE_COLOR['GREEN']}{stat['percentage_discovered']:.2f}%{CONSOLE_COLOR['RESET']}
+ > Ration of effecient discovering (total visited / unique cell discovered): {stat['ration_unique_vs_visited']}
 
 [COMM-LINK WITH OTHER]
- > Nuber of BROADCAST_MSG send : {self.internal_agent_broadcast_stat['nb_send']}
- > Nuber of BROADCAST_MSG receive : {self.internal_agent_broadcast_stat['nb_receive']}
- > Box coord. found by other ? : {self.internal_agent_broadcast_stat['box_coord_found_by_other']}
- > Key coord. found by other ? : {self.internal_agent_broadcast_stat['key_coord_found_by_other']}
+ > Nuber of BROADCAST_MSG send : {stat['nb_send']}
+ > Nuber of BROADCAST_MSG receive : {stat['nb_receive']}
+ > Box coord. found by other ? : {stat['box_coord_found_by_other']}
+ > Key coord. found by other ? : {stat['key_coord_found_by_other']}
     """)
 
     def periodic_display(self):
@@ -901,6 +1137,16 @@ if __name__ == "__main__":
     parser.add_argument("-r", "--run", help="Run the agent with our behavior or not : autonomous/manual", type=str, default="manual")
     parser.add_argument("-d", "--display_info", help="Display the information in agent console : false/true", type=str, default='false')
     parser.add_argument("-v", "--verbose", help="Verbose level to display in agent console : false/true", type=str, default='true')
+    parser.add_argument("-p", "--protocol", help="Wire format used with the server : auto/legacy", type=str, default='auto')
+    parser.add_argument("-b", "--batch_size", help="Maximum number of moves sent in a single request", type=int, default=10)
+    parser.add_argument("-pl", "--planner", help="Path planning : astar/greedy", type=str, default='astar')
+    parser.add_argument("-to", "--tour", help="Order of the points of interest : farthest/shortest", type=str, default='farthest')
+    parser.add_argument("-se", "--search", help="Search of an item once in its rings : model/hotcold", type=str, default='model')
+    parser.add_argument("-ex", "--explore", help="Exploration of the map : border/frontier", type=str, default='border')
+    parser.add_argument("-sh", "--share_every", help="Moves between two broadcasts of the observed cells, 0 to disable", type=int, default=20)
+    parser.add_argument("-c", "--clock", help=f"Pace of the pauses : {'/'.join(CLOCK_MODES)}", type=str, default='realtime')
+    parser.add_argument("-ts", "--time_scale", help="Speed-up of the scaled clock", type=float, default=20.0)
+    parser.add_argument("-st", "--start_timeout", help="Seconds to wait for the other agents, 0 to wait as long as needed", type=float, default=0)
 
     
     args = parser.parse_args()
@@ -909,7 +1155,13 @@ if __name__ == "__main__":
     else: 
         verbose = False
 
-    agent = Agent(args.server_ip, verbose)
+    network = Network(server_ip=args.server_ip, protocol=args.protocol)
+    try:
+        agent = Agent(args.server_ip, verbose, args.protocol, args.batch_size, network=network, planner=args.planner, tour=args.tour, search=args.search, explore=args.explore, share_every=args.share_every, clock=make_clock(args.clock, args.time_scale), start_timeout=args.start_timeout or None)
+    except TimeoutError as e:   #the other agents did not connect in time, or the server did not reply
+        print(f"{CONSOLE_COLOR['RED']}[ERROR>'__init__'] - Agent not started: {e or 'no reply from the server'}{CONSOLE_COLOR['RESET']}")
+        network.channel.close()
+        sys.exit(1)
     
     if args.display_info == 'true':
         agent.start_display_thread()
@@ -0,0 +1,247 @@
+__author__ = "Aybuke Ozturk Suri, Johvany Gustave"
+__copyright__ = "Copyright 2023, IN512, IPSA 2024"
+__credits__ = ["Aybuke Ozturk Suri", "Johvany Gustave"]
+__license__ = "Apache License 2.0"
+__version__ = "1.0.0"
+
+
+import asyncio, pickle, io, traceback
+import pygame
+from game import Game
+from protocol import FRAME_HEADER, MAX_FRAME_SIZE, decode, hello_ack, frame
+from snapshot import ViewerProcess
+from recorder import Recorder
+from outbound import OverflowQueue, OVERFLOW_POLICIES, coalesce_key
+from my_constants import *
+
+
+class AgentConnection(asyncio.Protocol):
+    """ Connection of one agent to the asyncio server. Messages are decoded and processed as soon as they arrive """
+    def __init__(self, server):
+        self.server = server
+        self.client_id = None
+        self.binary = False
+        self.negotiated = False
+        self.buffer = bytearray()
+        self.queue = OverflowQueue(server.queue_size, server.overflow_policy)  #messages waiting for room in the write buffer
+        self.paused = False     #the write buffer of the transport is full
+        self.blocked = set()    #connections not read until the queue has room ('block' policy)
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.client_id = self.server.register(self)
+        if self.client_id is None:  #the game is full
+            transport.close()
+            return
+        transport.write(pickle.dumps(self.client_id))
+
+    def data_received(self, data):
+        self.buffer += data
+        try:
+            for msg in self.read_messages():
+                if not self.negotiated:
+                    self.negotiated = True
+                    hello = msg["header"] == HELLO
+                    if hello:   #the agent supports the binary format
+                        self.transport.write(pickle.dumps(hello_ack()))
+                        self.binary = True
+                    self.server.join(self)
+                    if hello:
+                        continue
+                self.server.handle(self, msg)
+        except Exception as e:
+            print(f"Error with client {self.client_id}: {e}")
+            self.transport.close()
+
+    def read_messages(self):
+        """ Yield every complete message of the buffer """
+        while self.buffer:
+            if self.binary:
+                if len(self.buffer) < FRAME_HEADER.size:
+                    return
+                size, = FRAME_HEADER.unpack_from(self.buffer)
+                if size == 0 or size > MAX_FRAME_SIZE:
+                    raise ValueError(f"Invalid frame size: {size}")
+                end = FRAME_HEADER.size + size
+                if len(self.buffer) < end:
+                    return
+                payload = bytes(self.buffer[FRAME_HEADER.size:end])
+                del self.buffer[:end]
+                yield decode(payload)
+            else:   #pickles are self-delimited, several of them may be in the buffer
+                stream = io.BytesIO(self.buffer)
+                try:
+                    msg = pickle.load(stream)
+                except (EOFError, pickle.UnpicklingError):
+                    return  #incomplete pickle, wait for the rest
+                del self.buffer[:stream.tell()]
+                yield msg
+
+    def send(self, msg):
+        self.push(frame(msg) if self.binary else pickle.dumps(msg))
+
+    def push(self, data, key=None, sender=None):
+        """ Write serialized bytes, or queue them with the overflow policy while the write buffer of the transport is
+        full (see outbound.py). With the 'block' policy, the 'sender' of a broadcast is not read anymore until the
+        queue has room. Return False if the message was dropped """
+        if self.transport.is_closing():
+            return False
+        if not self.paused and not self.queue.items:
+            self.transport.write(data)
+            self.queue.nb_sent += 1
+            return True
+        if key is not None and self.queue.policy == "block" and self.queue.is_full() and sender is not None:
+            sender.transport.pause_reading()
+            self.blocked.add(sender)
+        return self.queue.add(data, key)
+
+    def pause_writing(self):
+        self.paused = True
+
+    def resume_writing(self):
+        self.paused = False
+        while self.queue.items and not self.paused:
+            data, _ = self.queue.items.popleft()
+            self.transport.write(data)  #may pause the writing again
+            self.queue.nb_sent += 1
+        if not self.queue.is_full():
+            self.unblock()
+
+    def unblock(self):
+        for connection in self.blocked:
+            if not connection.transport.is_closing():
+                connection.transport.resume_reading()
+        self.blocked.clear()
+
+    def connection_lost(self, exc):
+        self.unblock()
+        if self.client_id is not None:
+            print(f"Outbound queue of client {self.client_id}: {self.queue.stats()}")
+            self.server.unregister(self)
+
+
+class AsyncServer:
+    """ Server handling every agent connection in a single asyncio event loop.
+
+    The game is only touched from the event loop thread, so requests are processed one after the other without any
+    lock. The GUI is refreshed by a task of the same loop ('inline' viewer), by another process ('process' viewer, see
+    snapshot.py) or not drawn at all ('none' viewer, or gui=False). The episode is logged in the file 'record' when
+    given (see recorder.py). The messages that do not fit in the write buffer of a client wait in a queue of at most
+    'queue_size' messages, with the same 'overflow_policy' as the threaded server (see outbound.py).
+    """
+    def __init__(self, conf, nb_agents, map_id, gui=True, scenario=None, clock=None, viewer="inline", record=None, queue_size=256, overflow_policy="drop_oldest"):
+        """ Initialize the server """
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow_policy}")
+        self.queue_size = queue_size
+        self.overflow_policy = overflow_policy
+        self.viewer = viewer if gui else "none"
+        self.game = Game(nb_agents, map_id, gui=self.viewer == "inline", scenario=scenario, clock=clock)
+        self.clock = clock
+        if record is not None:
+            self.game.recorder = Recorder(record, self.game)
+        self.nb_disconnected = 0
+        self.id_count = 0
+        self.conf = conf
+        self.nb_agents = nb_agents
+
+        self.agent_state = [1]*nb_agents
+
+        self.clients = {}   #connections that negotiated their format, used as an ordered set
+        print(f"Server configuration: {conf}")
+        asyncio.run(self.start())
+
+
+    async def start(self):
+        """ Start listening to incoming clients and wait for the end of the game """
+        self.done = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        server = await loop.create_server(lambda: AgentConnection(self), *self.conf, reuse_address=True, backlog=max(100, self.nb_agents))
+        print("Server ready! Waiting for connections...")
+        viewer = ViewerProcess(self.game, self.clock) if self.viewer == "process" else None
+        async with server:
+            if self.viewer == "inline":
+                await self.render()
+            else:
+                await self.done.wait()
+        if viewer is not None:
+            viewer.stop()
+        if self.game.recorder is not None:
+            self.game.recorder.close()
+
+
+    async def render(self):
+        """ Refresh the GUI from the event loop until the window is closed or the game is over """
+        gui = self.game.gui
+        try:
+            gui.on_init()
+            while gui.running and not self.done.is_set():
+                for event in pygame.event.get():
+                    gui.on_event(event)
+                gui.draw()
+                await asyncio.sleep(1/gui.fps)
+        except Exception:
+            traceback.print_exc()
+        finally:
+            gui.on_cleanup()
+
+
+    def register(self, connection):
+        """ Give an id to a new client, None if every agent is already connected """
+        if self.id_count >= self.nb_agents:
+            return None
+        client_id = self.id_count
+        self.id_count += 1
+        return client_id
+
+
+    def join(self, connection):
+        """ Add a client that negotiated its format, and start the game once every agent joined """
+        self.clients[connection] = None
+        self.game.nb_ready += 1
+        if self.game.nb_ready == self.nb_agents:
+            for client in self.clients:
+                client.send({"sender": GAME_ID, "header": GAME_START, "nb_agents": self.nb_agents})
+
+
+    def unregister(self, connection):
+        """ Forget a disconnected client and stop the server once everybody left """
+        self.clients.pop(connection, None)
+        self.nb_disconnected += 1
+        if self.nb_disconnected >= self.nb_agents:
+            self.done.set()
+
+
+    def handle(self, connection, msg):
+        """ Process a message received from a client """
+        if msg["header"] == BROADCAST_MSG:
+            msg["sender"] = GAME_ID
+            if "nav_state" in msg and msg["nav_state"] == COMPLETED:
+                self.agent_state[connection.client_id] = 0
+            if self.game.recorder is not None:
+                self.game.recorder.broadcast(connection.client_id, msg)
+            self.send_to_all(connection, msg)
+        else:
+            reply = self.game.process(msg, connection.client_id)
+            if reply is not None:   #None for an unknown header, nothing to send back
+                if "seq" in msg:    #let the agent match the reply with its request
+                    reply["seq"] = msg["seq"]
+                connection.send(reply)
+
+        # Vérifier si tous les agents ont terminé
+        if all(state == 0 for state in self.agent_state):
+            print("All agents have completed their tasks. Shutting down the server.")
+            for client in self.clients:
+                client.transport.close()
+            self.done.set()
+
+
+    def send_to_all(self, sender, msg):
+        """ Broadcast a msg to all clients except the 'sender', without waiting for the transfers """
+        data = {}   #serialize the message once per format
+        key = coalesce_key(msg)
+        for client in self.clients:
+            if client != sender and not client.transport.is_closing():
+                if client.binary not in data:
+                    data[client.binary] = frame(msg) if client.binary else pickle.dumps(msg)
+                client.push(data[client.binary], key, sender)
@@ -0,0 +1,96 @@
+__author__ = "Aybuke Ozturk Suri, Johvany Gustave"
+__copyright__ = "Copyright 2023, IN512, IPSA 2024"
+__credits__ = ["Aybuke Ozturk Suri", "Johvany Gustave"]
+__license__ = "Apache License 2.0"
+__version__ = "1.0.0"
+
+""" What an agent knows about the map """
+
+import numpy as np
+
+from my_constants import *
+
+
+CELL_CLASSES = ["UNKNOWN", "EMPTY", "KEY_NEIGHBOR", "KEY_OUTER", "BOX_NEIGHBOR", "BOX_OUTER", "OBSTACLE_NEIGHBOR", "TARGET"]
+CLASS_CODE = {name: code for code, name in enumerate(CELL_CLASSES)}
+EMPTY_CODE = CLASS_CODE["EMPTY"]
+UNKNOWN_VALUE = -1.0
+
+
+def classify(cell_value):
+    """ Type of a cell deduced from its value """
+    if cell_value == KEY_NEIGHBOUR_PERCENTAGE:
+        return "KEY_NEIGHBOR"
+    elif cell_value == KEY_NEIGHBOUR_PERCENTAGE/2:
+        return "KEY_OUTER"
+    elif cell_value == BOX_NEIGHBOUR_PERCENTAGE:
+        return "BOX_NEIGHBOR"
+    elif cell_value == BOX_NEIGHBOUR_PERCENTAGE/2:
+        return "BOX_OUTER"
+    elif cell_value == OBSTACLE_NEIGHBOUR_PERCENTAGE:
+        return "OBSTACLE_NEIGHBOR"
+    elif cell_value == 1.0:
+        return "TARGET"
+    elif cell_value == UNKNOWN_VALUE:
+        return "UNKNOWN"
+    return "EMPTY"
+
+
+CLASS_OF_VALUE = {value: CLASS_CODE[classify(value)] for value in (KEY_NEIGHBOUR_PERCENTAGE, KEY_NEIGHBOUR_PERCENTAGE/2,
+    BOX_NEIGHBOUR_PERCENTAGE, BOX_NEIGHBOUR_PERCENTAGE/2, OBSTACLE_NEIGHBOUR_PERCENTAGE, 1.0, UNKNOWN_VALUE)}
+VALUE_OF_CLASS = {code: value for value, code in CLASS_OF_VALUE.items()}
+VALUE_OF_CLASS[EMPTY_CODE] = 0.0
+
+
+class BeliefGrid:
+    """ Per cell: observed value, number of visits, tick of the last visit, class and whether the cell is forbidden
+    (around an item already discovered). The counters used by the statistics are kept up to date, so every query is O(1)
+    and the memory does not grow with the length of the episode """
+    def __init__(self, w, h):
+        self.w, self.h = w, h
+        self.value = np.full((h, w), UNKNOWN_VALUE)   #float64, compared with the exact values of the game
+        self.visits = np.zeros((h, w), dtype=np.int32)
+        self.last_visit = np.full((h, w), -1, dtype=np.int32)
+        self.cell_class = np.zeros((h, w), dtype=np.int8)   #CELL_CLASSES index
+        self.forbidden = np.zeros((h, w), dtype=bool)
+        self.tick = 0   #number of visits so far
+        self.nb_unique = 0
+        self.nb_forbidden = 0
+
+    def observe(self, x, y, value):
+        """ Record the value of a cell, return True if it was unknown """
+        unknown = self.value[y, x] == UNKNOWN_VALUE
+        self.value[y, x] = value
+        self.cell_class[y, x] = CLASS_OF_VALUE.get(value, EMPTY_CODE)
+        return bool(unknown)
+
+    def visit(self, x, y, value=None):
+        """ Count a visit of the cell, and record its value when it is known """
+        visits = int(self.visits[y, x])
+        if visits == 0:
+            self.nb_unique += 1
+        self.visits[y, x] = visits + 1
+        self.last_visit[y, x] = self.tick
+        self.tick += 1
+        if value is not None:
+            self.observe(x, y, value)
+
+    def forbid_around(self, x, y, radius=1):
+        """ Forbid the cells of the square centred on (x, y) """
+        x0, x1 = max(0, x - radius), min(self.w, x + radius + 1)
+        y0, y1 = max(0, y - radius), min(self.h, y + radius + 1)
+        self.nb_forbidden += int(np.count_nonzero(~self.forbidden[y0:y1, x0:x1]))
+        self.forbidden[y0:y1, x0:x1] = True
+
+    def is_forbidden(self, cell):
+        return bool(self.forbidden[cell[1], cell[0]])
+
+    def class_of(self, cell):
+        return CELL_CLASSES[self.cell_class[cell[1], cell[0]]]
+
+    def value_of(self, cell):
+        return float(self.value[cell[1], cell[0]])
+
+    @property
+    def nb_visits(self):
+        return self.tick
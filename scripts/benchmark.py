@@ -0,0 +1,468 @@
+__author__ = "Aybuke Ozturk Suri, Johvany Gustave"
+__copyright__ = "Copyright 2023, IN512, IPSA 2024"
+__credits__ = ["Aybuke Ozturk Suri", "Johvany Gustave"]
+__license__ = "Apache License 2.0"
+__version__ = "1.0.0"
+
+""" Benchmarks of the project.
+
+    episodes: plays headless episodes on every map, for 1 to 4 agents and a set of seeds, and reports how fast the
+              agents complete their mission. The results can be saved (JSON or CSV) and compared to a saved baseline.
+    startup:  measures the construction of the game (heat map and obstacles) on generated maps from 35x30 to 2000x2000.
+    tours:    number of moves of a sweep over the points of interest and time to order them, for each tour strategy.
+    search:   moves and requests to reach a key or a box from each cell of its rings, for each search strategy.
+    vec:      agent-steps per second of the vectorized environment against Game.handle_move, on the same random moves.
+    gui:      frames per second of the game window on generated maps of increasing size, without a screen.
+    record:   cost of the event log on Game.process (exit with 1 above -mo), and speed of its replay and of seeking in it.
+"""
+
+import json, csv, os, sys, io, math, random, argparse, tempfile
+from contextlib import redirect_stdout
+from time import perf_counter, process_time
+import numpy as np
+
+from simulation import run_episode, LocalHub, EpisodeAborted
+from agent import Agent
+from clock import make_clock
+from scenario import generate_scenario
+from game import Game, MOVES
+from vec_env import VecEnv, make_games
+from recorder import Recorder, Replay
+from my_constants import MOVE, MOVE_BATCH, GET_DATA, GET_ITEM_OWNER, MIN_CELL_SIZE_TEXT
+from sampling import border_points
+from tour import TOUR_STRATEGIES, build_tour, farthest_first, tour_length
+
+
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "resources", "config.json")
+EPISODE_FIELDS = ["map_id", "nb_agents", "seed", "completed", "moves", "wall_time", "round_trips", "broadcasts_sent", "broadcasts_received", "coverage", "duplicate_cells", "broadcast_bytes"]
+#metric -> True if a higher value is a regression. The other fields are only reported
+REGRESSION_METRICS = {"moves": True, "round_trips": True, "wall_time": True, "completed": False}
+STARTUP_SIZES = [(35, 30), (100, 100), (250, 250), (500, 500), (1000, 1000), (2000, 2000)]
+STARTUP_FIELDS = ["width", "height", "nb_agents", "obstacles", "startup_ms"]
+TOUR_SIZES = [(35, 30), (100, 100), (500, 500), (2000, 2000)]
+TOUR_FIELDS = ["width", "height", "points", "tour", "moves", "order_ms"]
+SEARCH_STRATEGIES = ("hotcold", "model")
+SEARCH_FIELDS = ["item", "search", "start", "found", "moves", "requests"]
+GUI_SIZES = [(35, 30), (100, 100), (250, 250), (500, 500), (1000, 1000), (4000, 4000)]
+GUI_FIELDS = ["width", "height", "cell_size", "first_frame_ms", "fps", "half_cell_size", "half_scroll_fps", "zoom_cell_size", "zoom_scroll_fps"]
+VEC_FIELDS = ["engine", "episodes", "agents", "steps", "seconds", "agent_steps_per_s"]
+RECORD_FIELDS = ["step", "count", "seconds", "us_each", "log_bytes"]
+
+
+def configured_maps():
+    """ Ids of the maps defined in config.json """
+    with open(CONFIG_FILE, "r") as json_file:
+        return sorted(int(name.split("_")[1]) for name in json.load(json_file))
+
+
+def episode_row(episode):
+    """ Flatten the statistics of an episode """
+    agents = episode["agents"]
+    return {
+        "map_id": episode["map_id"],
+        "nb_agents": episode["nb_agents"],
+        "seed": episode["seed"],
+        "completed": int(episode["completed"]),
+        "moves": episode["moves"],
+        "wall_time": episode["wall_time"],
+        "round_trips": episode["round_trips"],
+        "broadcasts_sent": sum(agent["nb_send"] for agent in agents),
+        "broadcasts_received": sum(agent["nb_receive"] for agent in agents),
+        "coverage": float(np.mean([agent["unique_cells"] / agent["total_cells"] for agent in agents])),
+        "duplicate_cells": episode["duplicate_cells"],
+        "broadcast_bytes": episode["broadcast_bytes"],
+    }
+
+
+def run_episodes(maps, agent_counts, seeds, max_moves, planner="astar", tour="farthest", search="model", explore="border", share_every=20):
+    rows = []
+    for map_id in maps:
+        for nb_agents in agent_counts:
+            for seed in seeds:
+                rows.append(episode_row(run_episode(nb_agents, map_id, seed, max_moves, planner=planner, tour=tour, search=search, explore=explore, share_every=share_every)))
+                print(f"map {map_id}, {nb_agents} agent(s), seed {seed}: " + ", ".join(f"{field}={rows[-1][field]:.3g}" for field in EPISODE_FIELDS[3:]))
+    return rows
+
+
+def save_rows(rows, filename, fields=EPISODE_FIELDS):
+    if filename.endswith(".csv"):
+        with open(filename, "w", newline="") as csv_file:
+            writer = csv.DictWriter(csv_file, fieldnames=fields)
+            writer.writeheader()
+            writer.writerows(rows)
+    else:
+        with open(filename, "w") as json_file:
+            json.dump(rows, json_file, indent=2)
+
+
+def load_rows(filename):
+    if filename.endswith(".csv"):
+        with open(filename, "r", newline="") as csv_file:
+            return [{field: float(value) for field, value in row.items()} for row in csv.DictReader(csv_file)]
+    with open(filename, "r") as json_file:
+        return json.load(json_file)
+
+
+def summarize(rows):
+    """ Mean of each metric per (map, number of agents) """
+    groups = {}
+    for row in rows:
+        groups.setdefault((int(row["map_id"]), int(row["nb_agents"])), []).append(row)
+    return {key: {field: float(np.mean([row[field] for row in group])) for field in EPISODE_FIELDS[3:] if field in group[0]}
+            for key, group in groups.items()}   #older results may miss the latest fields
+
+
+def compare(rows, baseline_rows, tolerance):
+    """ Print the metrics that got worse than the baseline by more than 'tolerance' (relative), return their number """
+    current, baseline = summarize(rows), summarize(baseline_rows)
+    regressions = 0
+    for key in sorted(set(current) & set(baseline)):
+        for metric, higher_is_worse in REGRESSION_METRICS.items():
+            new, old = current[key][metric], baseline[key][metric]
+            change = (new - old) / old if old else 0.0
+            if (change if higher_is_worse else -change) > tolerance:
+                regressions += 1
+                print(f"REGRESSION map {key[0]}, {key[1]} agent(s): {metric} {old:.3g} -> {new:.3g} ({change:+.1%})")
+    print(f"{regressions} regression(s) against the baseline (tolerance {tolerance:.0%})")
+    return regressions
+
+
+def episodes_command(args):
+    maps = args.maps or configured_maps()
+    rows = run_episodes(maps, args.agents, args.seeds, args.max_moves, args.planner, args.tour, args.search, args.explore, args.share_every)
+    if args.output:
+        save_rows(rows, args.output)
+        print(f"Results saved in {args.output}")
+    if args.baseline and compare(rows, load_rows(args.baseline), args.tolerance):
+        sys.exit(1)
+
+
+def measure_startup(width, height, nb_agents, density, repeat):
+    """ Best time to build the game of a generated scenario, without GUI """
+    scenario = generate_scenario(width, height, nb_agents, density, seed=0)
+    times = []
+    for _ in range(repeat):
+        start = perf_counter()
+        with redirect_stdout(io.StringIO()):    #obstacles that cannot be placed are reported on stdout
+            Game(nb_agents, None, gui=False, scenario=scenario)
+        times.append(perf_counter() - start)
+    return {"width": width, "height": height, "nb_agents": nb_agents, "obstacles": scenario["obstacles"], "startup_ms": 1000 * min(times)}
+
+
+def startup_command(args):
+    rows = []
+    print(f"{'map':>11}{'agents':>8}{'obstacles':>11}{'startup (ms)':>14}")
+    for width, height in args.sizes or STARTUP_SIZES:
+        nb_agents = max(4, width * height // args.cells_per_agent)
+        rows.append(measure_startup(width, height, nb_agents, args.density, args.repeat))
+        print(f"{f'{width}x{height}':>11}{nb_agents:>8}{rows[-1]['obstacles']:>11}{rows[-1]['startup_ms']:>14.1f}")
+    if args.output:
+        save_rows(rows, args.output, STARTUP_FIELDS)
+        print(f"Results saved in {args.output}")
+
+
+def measure_tours(width, height, seeds):
+    """ Mean length and ordering time of the tours over the points an agent samples on a map, for each strategy """
+    order = {"farthest": farthest_first, "shortest": build_tour}
+    nb_points = math.ceil(height / 10) + math.ceil(width / 10)  #Agent.calculate_points
+    results = {tour: {"moves": [], "times": []} for tour in TOUR_STRATEGIES}
+    for seed in seeds:
+        random.seed(seed)
+        start = (random.randrange(width), random.randrange(height))
+        points = border_points(width, height, nb_points, start)
+        for tour in TOUR_STRATEGIES:
+            begin = perf_counter()
+            ordered = order[tour](points, start)
+            results[tour]["times"].append(perf_counter() - begin)
+            results[tour]["moves"].append(tour_length(ordered, start))
+    return [{"width": width, "height": height, "points": nb_points, "tour": tour, "moves": float(np.mean(result["moves"])),
+             "order_ms": 1000 * float(np.mean(result["times"]))} for tour, result in results.items()]
+
+
+def tours_command(args):
+    rows = []
+    print(f"{'map':>11}{'points':>8}{'tour':>10}{'moves':>10}{'order (ms)':>12}")
+    for width, height in args.sizes or TOUR_SIZES:
+        for row in measure_tours(width, height, args.seeds):
+            rows.append(row)
+            print(f"{f'{width}x{height}':>11}{row['points']:>8}{row['tour']:>10}{row['moves']:>10.0f}{row['order_ms']:>12.2f}")
+    if args.output:
+        save_rows(rows, args.output, TOUR_FIELDS)
+        print(f"Results saved in {args.output}")
+
+
+def search_scenario(item, start):
+    """ 20x20 map without obstacles, the searched item in the middle, the other one in a corner """
+    other = "box" if item == "key" else "key"
+    return {"width": 20, "height": 20, "nb_agents": 1, "obstacles": 0, f"{item}_1": {"x": 10, "y": 10},
+            f"{other}_1": {"x": 2, "y": 2}, "agent_1": {"x": start[0], "y": start[1], "color": [255, 0, 0]}}
+
+
+def measure_search(item, search, start, max_moves=500):
+    """ Moves and requests of an agent standing on 'start', in the rings of 'item', to reach it """
+    game = Game(1, None, gui=False, scenario=search_scenario(item, start))
+    hub = LocalHub(game, max_moves)
+    with redirect_stdout(io.StringIO()):
+        agent = Agent(None, False, network=hub.connect(), clock=make_clock("fast"), search=search)
+        agent.nav_state["nav_state"] = "hot_cold_search_KEY" if item == "key" else "hot_cold_search_BOX"
+        agent.handle_discovery = lambda: None   #stop on the item, without the moves that follow a discovery
+        hub.nb_moves, hub.nb_requests = 0, [0]
+        try:
+            agent.search_item()
+        except EpisodeAborted:
+            pass
+        agent.stop()
+    return {"item": item, "search": search, "start": f"{start[0]},{start[1]}", "found": int((agent.x, agent.y) == (10, 10)),
+            "moves": hub.nb_moves, "requests": hub.nb_requests[0]}
+
+
+def search_command(args):
+    rows = []
+    starts = [(10 + dx, 10 + dy) for dy in range(-2, 3) for dx in range(-2, 3) if (dx, dy) != (0, 0)]
+    print(f"{'item':>5}{'search':>9}{'found':>7}{'moves':>8}{'max':>6}{'requests':>10}{'max':>6}")
+    for item in ("key", "box"):
+        for search in SEARCH_STRATEGIES:
+            results = [measure_search(item, search, start) for start in starts]
+            rows.extend(results)
+            moves, requests = [row["moves"] for row in results], [row["requests"] for row in results]
+            print(f"{item:>5}{search:>9}{sum(row['found'] for row in results):>4}/{len(results)}{np.mean(moves):>8.1f}{max(moves):>6}"
+                  f"{np.mean(requests):>10.1f}{max(requests):>6}")
+    if args.output:
+        save_rows(rows, args.output, SEARCH_FIELDS)
+        print(f"Results saved in {args.output}")
+
+
+def measure_vec(map_id, nb_agents, nb_episodes, nb_steps, nb_scalar_episodes, seed=0):
+    """ Agent-steps per second of the vectorized environment on 'nb_episodes' episodes, and of Game.handle_move on the
+    first 'nb_scalar_episodes' of them, playing the same random moves. Also tell if both ended in the same state """
+    games = make_games(map_id, nb_agents, nb_episodes, seed)
+    env = VecEnv.from_games(games)
+    actions = np.random.default_rng(seed).integers(0, len(MOVES), size=(nb_steps, nb_episodes, nb_agents))
+    start = perf_counter()
+    for step in actions:
+        env.step(step)
+    vec_time = perf_counter() - start
+
+    scalar_games = games[:nb_scalar_episodes]
+    scalar_actions = actions[:, :nb_scalar_episodes].tolist()
+    start = perf_counter()
+    for step in scalar_actions:
+        for game, directions in zip(scalar_games, step):
+            for agent_id, direction in enumerate(directions):
+                game.handle_move({"direction": direction}, agent_id)
+    scalar_time = perf_counter() - start
+
+    same = all(np.array_equal(env.positions[e], [(agent.x, agent.y) for agent in game.agents])
+               and np.array_equal(env.nb_unique[e], [len(path) for path in game.agent_paths])
+               for e, game in enumerate(scalar_games))
+    rows = [{"engine": engine, "episodes": episodes, "agents": nb_agents, "steps": nb_steps, "seconds": seconds,
+             "agent_steps_per_s": episodes * nb_agents * nb_steps / seconds}
+            for engine, episodes, seconds in (("scalar", len(scalar_games), scalar_time), ("vec", nb_episodes, vec_time))]
+    return rows, same
+
+
+def vec_command(args):
+    rows, same = measure_vec(args.map_id, args.nb_agents, args.episodes, args.steps, args.scalar_episodes, args.seed)
+    print(f"{'engine':>8}{'episodes':>10}{'agents':>8}{'steps':>8}{'seconds':>10}{'agent-steps/s':>16}")
+    for row in rows:
+        print(f"{row['engine']:>8}{row['episodes']:>10}{row['agents']:>8}{row['steps']:>8}{row['seconds']:>10.3f}{row['agent_steps_per_s']:>16,.0f}")
+    print(f"Speed-up: {rows[1]['agent_steps_per_s'] / rows[0]['agent_steps_per_s']:.0f}x, same final state as the game: {same}")
+    if args.output:
+        save_rows(rows, args.output, VEC_FIELDS)
+        print(f"Results saved in {args.output}")
+    if not same:
+        sys.exit(1)
+
+
+def measure_gui(width, height, nb_frames, seed=0):
+    """ Time to open the window and frames per second of the GUI while the 4 agents of a generated map move one
+    random step per frame, with the whole map in the window. Then frames per second while the view also jumps to a
+    random place every frame (the window is drawn again), zoomed in once (half the map in the window) and zoomed in to
+    cells showing their values """
+    game = Game(4, None, gui=True, scenario=generate_scenario(width, height, 4, seed=seed))
+    gui = game.gui
+    rng = random.Random(seed)
+
+    def frames(scroll):
+        start = perf_counter()
+        for _ in range(nb_frames):
+            for agent_id in range(game.nb_agents):
+                game.handle_move({"direction": rng.randrange(len(MOVES))}, agent_id)
+            if scroll:
+                gui.move_view(rng.uniform(0, width), rng.uniform(0, height))
+            gui.draw()
+        return nb_frames / (perf_counter() - start)
+
+    start = perf_counter()
+    gui.on_init()
+    gui.draw()
+    row = {"width": width, "height": height, "cell_size": gui.cell_size, "first_frame_ms": 1000 * (perf_counter() - start)}
+    row["fps"] = frames(False)
+    gui.zoom(1)
+    row["half_cell_size"], row["half_scroll_fps"] = gui.cell_size, frames(True)
+    while gui.cell_size < MIN_CELL_SIZE_TEXT and gui.zoom_level < gui.max_zoom_level:
+        gui.zoom(1)
+    row["zoom_cell_size"], row["zoom_scroll_fps"] = gui.cell_size, frames(True)
+    gui.on_cleanup()
+    return row
+
+
+def gui_command(args):
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")   #no window needed
+    rows = []
+    print(f"{'map':>11}{'cell (px)':>11}{'first frame (ms)':>18}{'fps':>10}{'cell':>8}{'scroll fps':>12}{'cell':>8}{'scroll fps':>12}")
+    for width, height in args.sizes or GUI_SIZES:
+        rows.append(measure_gui(width, height, args.frames))
+        row = rows[-1]
+        print(f"{f'{width}x{height}':>11}{row['cell_size']:>11.3g}{row['first_frame_ms']:>18.1f}{row['fps']:>10.1f}"
+              f"{row['half_cell_size']:>8.3g}{row['half_scroll_fps']:>12.1f}{row['zoom_cell_size']:>8.3g}{row['zoom_scroll_fps']:>12.1f}")
+    if args.output:
+        save_rows(rows, args.output, GUI_FIELDS)
+        print(f"Results saved in {args.output}")
+
+
+def request_stream(nb_agents, nb_requests, seed=0):
+    """ Random requests of the agents, in the proportions of an episode: mostly moves and GET_DATA """
+    rng = random.Random(seed)
+    stream = []
+    for i in range(nb_requests):
+        kind = rng.random()
+        if kind < 0.6:
+            msg = {"header": MOVE, "direction": rng.randrange(len(MOVES))}
+        elif kind < 0.7:
+            msg = {"header": MOVE_BATCH, "directions": [rng.randrange(len(MOVES)) for _ in range(10)]}
+        elif kind < 0.95:
+            msg = {"header": GET_DATA}
+        else:
+            msg = {"header": GET_ITEM_OWNER}
+        stream.append((msg, i % nb_agents))
+    return stream
+
+
+def measure_record(map_id, nb_agents, nb_requests, repeat, seed=0):
+    """ CPU time of Game.process on the same requests without and with the event log (best of 'repeat' runs for each chunk of requests), then
+    time to replay the log and to seek to random records of it """
+    stream = request_stream(nb_agents, nb_requests, seed)
+    filename = os.path.join(tempfile.mkdtemp(), "episode.log")
+    chunks = range(0, nb_requests, 10000)   #long enough for the clock thread of the recorder to run in every chunk
+    times = {"process": [math.inf]*len(chunks), "process+record": [math.inf]*len(chunks)}   #best time of each chunk of requests
+    closing = math.inf
+    for _ in range(repeat):
+        games = {step: make_games(map_id, nb_agents, 1, seed)[0] for step in times}
+        games["process+record"].recorder = Recorder(filename, games["process+record"])
+        for chunk, first in enumerate(chunks):  #both games take turns, so that a slower period of the machine slows both
+            requests = stream[first:first + 10000]
+            for step, game in games.items():
+                start = process_time()  #CPU time of the process, the clock thread of the recorder included
+                for msg, agent_id in requests:
+                    game.process(msg, agent_id)
+                times[step][chunk] = min(times[step][chunk], process_time() - start)
+        start = process_time()
+        games["process+record"].recorder.close()
+        closing = min(closing, process_time() - start)
+    seconds = {step: sum(best) for step, best in times.items()}
+    seconds["process+record"] += closing
+    log_bytes = os.path.getsize(filename)
+    rows = [{"step": step, "count": nb_requests, "seconds": seconds[step], "us_each": 1e6 * seconds[step] / nb_requests, "log_bytes": log_bytes if step == "process+record" else 0}
+            for step in times]
+
+    replay = Replay(filename)
+    start = perf_counter()
+    replay.play()
+    seconds = perf_counter() - start
+    rows.append({"step": "replay", "count": len(replay), "seconds": seconds, "us_each": 1e6 * seconds / len(replay), "log_bytes": log_bytes})
+    targets = np.random.default_rng(seed).integers(0, len(replay), size=20).tolist()
+    start = perf_counter()
+    for index in targets:
+        replay.seek(index)
+    seconds = perf_counter() - start
+    rows.append({"step": "seek", "count": len(targets), "seconds": seconds, "us_each": 1e6 * seconds / len(targets), "log_bytes": log_bytes})
+    os.remove(filename)
+    return rows
+
+
+def record_command(args):
+    rows = measure_record(args.map_id, args.nb_agents, args.requests, args.repeat, args.seed)
+    print(f"{'step':>16}{'count':>10}{'seconds':>10}{'us each':>10}")
+    for row in rows:
+        print(f"{row['step']:>16}{row['count']:>10}{row['seconds']:>10.3f}{row['us_each']:>10.2f}")
+    overhead = rows[1]['us_each'] / rows[0]['us_each'] - 1
+    print(f"Recording overhead: {overhead:+.1%} per request (at most {args.max_overhead:.0%}), log of {rows[1]['log_bytes'] / args.requests:.1f} bytes per request")
+    if args.output:
+        save_rows(rows, args.output, RECORD_FIELDS)
+        print(f"Results saved in {args.output}")
+    if overhead > args.max_overhead:
+        sys.exit(1)
+
+
+def map_size(text):
+    """ WIDTHxHEIGHT argument """
+    width, height = text.lower().split("x")
+    return int(width), int(height)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks of the project")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    episodes = subparsers.add_parser("episodes", help="Moves and time to completion of headless episodes")
+    episodes.add_argument("-mi", "--maps", help="Maps to play (default: every map of config.json)", type=int, nargs="+")
+    episodes.add_argument("-nb", "--agents", help="Numbers of agents to test", type=int, nargs="+", default=[1, 2, 3, 4])
+    episodes.add_argument("-s", "--seeds", help="Seeds of the episodes", type=int, nargs="+", default=[0, 1, 2, 3, 4])
+    episodes.add_argument("-mm", "--max_moves", help="Moves after which an episode is stopped", type=int, default=20000)
+    episodes.add_argument("-pl", "--planner", help="Path planning of the agents: astar or greedy", type=str, default="astar")
+    episodes.add_argument("-to", "--tour", help="Order of the points of interest: farthest or shortest", type=str, default="farthest")
+    episodes.add_argument("-se", "--search", help="Search of an item once in its rings: model or hotcold", type=str, default="model")
+    episodes.add_argument("-ex", "--explore", help="Exploration of the map: border or frontier", type=str, default="border")
+    episodes.add_argument("-sh", "--share_every", help="Moves between two broadcasts of the observed cells, 0 to disable", type=int, default=20)
+    episodes.add_argument("-o", "--output", help="Save the results in a .json or .csv file", type=str)
+    episodes.add_argument("-b", "--baseline", help="Results (.json or .csv) to compare with, exit with 1 on regression", type=str)
+    episodes.add_argument("-t", "--tolerance", help="Relative change allowed before flagging a regression", type=float, default=0.1)
+    episodes.set_defaults(func=episodes_command)
+
+    startup = subparsers.add_parser("startup", help="Time to build the game on generated maps of increasing size")
+    startup.add_argument("-sz", "--sizes", help="Map sizes to test, as WIDTHxHEIGHT", type=map_size, nargs="+")
+    startup.add_argument("-d", "--density", help="Obstacle density of the generated maps", type=float, default=0.05)
+    startup.add_argument("-ca", "--cells_per_agent", help="One agent (with its key and box) per this number of cells, at least 4 agents", type=int, default=10000)
+    startup.add_argument("-r", "--repeat", help="Number of measures per size, the best one is kept", type=int, default=3)
+    startup.add_argument("-o", "--output", help="Save the results in a .json or .csv file", type=str)
+    startup.set_defaults(func=startup_command)
+
+    tours = subparsers.add_parser("tours", help="Moves of a sweep over the points of interest for each tour strategy")
+    tours.add_argument("-sz", "--sizes", help="Map sizes to test, as WIDTHxHEIGHT", type=map_size, nargs="+")
+    tours.add_argument("-s", "--seeds", help="Seeds of the sampled points", type=int, nargs="+", default=list(range(20)))
+    tours.add_argument("-o", "--output", help="Save the results in a .json or .csv file", type=str)
+    tours.set_defaults(func=tours_command)
+
+    search = subparsers.add_parser("search", help="Moves and requests to reach an item from its rings for each search strategy")
+    search.add_argument("-o", "--output", help="Save the results in a .json or .csv file", type=str)
+    search.set_defaults(func=search_command)
+
+    vec = subparsers.add_parser("vec", help="Agent-steps per second of the vectorized environment against the game")
+    vec.add_argument("-mi", "--map_id", help="Map to play", type=int, default=1)
+    vec.add_argument("-nb", "--nb_agents", help="Number of agents of each episode", type=int, default=4)
+    vec.add_argument("-e", "--episodes", help="Number of episodes stepped together", type=int, default=1000)
+    vec.add_argument("-st", "--steps", help="Number of steps", type=int, default=500)
+    vec.add_argument("-se", "--scalar_episodes", help="Episodes also played with Game.handle_move", type=int, default=20)
+    vec.add_argument("-s", "--seed", help="Seed of the obstacles and of the random moves", type=int, default=0)
+    vec.add_argument("-o", "--output", help="Save the results in a .json or .csv file", type=str)
+    vec.set_defaults(func=vec_command)
+
+    gui = subparsers.add_parser("gui", help="Frames per second of the game window on generated maps of increasing size")
+    gui.add_argument("-sz", "--sizes", help="Map sizes to test, as WIDTHxHEIGHT", type=map_size, nargs="+")
+    gui.add_argument("-f", "--frames", help="Number of frames drawn on each map", type=int, default=200)
+    gui.add_argument("-o", "--output", help="Save the results in a .json or .csv file", type=str)
+    gui.set_defaults(func=gui_command)
+
+    record = subparsers.add_parser("record", help="Cost of the event log on Game.process, speed of the replay and of the seeks")
+    record.add_argument("-mi", "--map_id", help="Map to play", type=int, default=1)
+    record.add_argument("-nb", "--nb_agents", help="Number of agents", type=int, default=4)
+    record.add_argument("-r", "--requests", help="Number of requests processed", type=int, default=200000)
+    record.add_argument("-re", "--repeat", help="Runs with and without the log, the best time of each chunk of requests is kept", type=int, default=5)
+    record.add_argument("-s", "--seed", help="Seed of the obstacles and of the requests", type=int, default=0)
+    record.add_argument("-mo", "--max_overhead", help="Overhead of the log on Game.process (relative) above which the benchmark exits with 1", type=float, default=0.2)
+    record.add_argument("-o", "--output", help="Save the results in a .json or .csv file", type=str)
+    record.set_defaults(func=record_command)
+
+    args = parser.parse_args()
+    args.func(args)
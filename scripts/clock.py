@@ -0,0 +1,48 @@
+__author__ = "Aybuke Ozturk Suri, Johvany Gustave"
+__copyright__ = "Copyright 2023, IN512, IPSA 2024"
+__credits__ = ["Aybuke Ozturk Suri", "Johvany Gustave"]
+__license__ = "Apache License 2.0"
+__version__ = "1.0.0"
+
+""" Clocks pacing the pauses of the agents and the refresh of the GUI.
+
+    realtime: a pause lasts as long as requested, so that the moves can be followed on the GUI
+    scaled: the pauses are 'scale' times shorter (e.g. 20), the GUI refreshes 'scale' times more often
+    fast: no pause at all, the GUI refreshes as often as it can (MAX_FPS)
+
+Every clock counts the simulated time, i.e. the sum of the pauses requested, so that it does not depend on the mode.
+"""
+
+import math
+from time import sleep
+
+
+CLOCK_MODES = ("realtime", "scaled", "fast")
+MAX_FPS = 60    #the GUI is not refreshed more often than this
+
+
+class Clock:
+    """ Simulated time running 'scale' times faster than the real time, without any pause when 'scale' is infinite """
+    def __init__(self, scale=1.0):
+        self.scale = scale
+        self.elapsed = 0.0  #simulated seconds
+
+    def sleep(self, seconds):
+        self.elapsed += seconds
+        if not math.isinf(self.scale):
+            sleep(seconds / self.scale)
+
+    def frame_rate(self, fps):
+        """ Frames per second of a GUI meant to be refreshed 'fps' times per simulated second """
+        return min(MAX_FPS, fps * self.scale)
+
+
+def make_clock(mode="realtime", scale=20.0):
+    """ Clock of one of the CLOCK_MODES, 'scale' is only used by the scaled mode """
+    if mode == "realtime":
+        return Clock()
+    if mode == "scaled":
+        return Clock(scale)
+    if mode == "fast":
+        return Clock(math.inf)
+    raise ValueError(f"Unknown clock mode '{mode}', expected one of {', '.join(CLOCK_MODES)}")
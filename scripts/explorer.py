@@ -0,0 +1,122 @@
+__author__ = "Aybuke Ozturk Suri, Johvany Gustave"
+__copyright__ = "Copyright 2023, IN512, IPSA 2024"
+__credits__ = ["Aybuke Ozturk Suri", "Johvany Gustave"]
+__license__ = "Apache License 2.0"
+__version__ = "1.0.0"
+
+""" Frontier exploration of the map shared between the agents.
+
+An agent reads the value of the cells it goes through, and an item is noticed as soon as the agent enters one of its
+rings: a visited cell therefore covers every cell at most COVER_RADIUS away. The agent always goes to the closest
+cell not covered yet (the frontier) within its region, then anywhere once its region is covered.
+
+The regions are negotiated with broadcasts: every exploring agent announces its position (REGION_CLAIM) and leaves
+when its mission is completed (REGION_RELEASE). Each agent splits the map with the same deterministic k-means, seeded
+with the announced positions in the order of the agent ids, so all of them agree on the regions without exchanging
+them. Agents announcing the same position (map 1) get the cells farthest from the others as seeds instead.
+"""
+
+import math
+import numpy as np
+
+
+COVER_RADIUS = 2    #an item is noticed from any cell of its 2 rings
+MAX_SAMPLES = 4096  #cells used by the k-means, the map is subsampled above this
+MAX_CHUNK = 2**22   #distances computed at once when labelling the cells
+
+
+def grid_samples(w, h, max_samples=MAX_SAMPLES):
+    """ (x, y) of regularly spaced cells, at most about 'max_samples' of them """
+    step = max(1, math.ceil(math.sqrt(w * h / max_samples)))
+    ys, xs = np.mgrid[0:h:step, 0:w:step]
+    return np.column_stack((xs.ravel(), ys.ravel())).astype(float)
+
+
+def kmeans_centres(w, h, seeds, iterations=10):
+    """ Centres of the regions, refined from 'seeds' (one per agent) with Lloyd's iterations on the cells of the map """
+    samples = grid_samples(w, h)
+    centres = []
+    for seed in seeds:
+        if any(seed[0] == c[0] and seed[1] == c[1] for c in centres):   #same start: farthest cell from the others
+            distances = np.min([((samples - c)**2).sum(axis=1) for c in centres], axis=0)
+            seed = samples[int(distances.argmax())]
+        centres.append(np.asarray(seed, dtype=float))
+    centres = np.array(centres)
+    for _ in range(iterations):
+        labels = ((samples[:, None, :] - centres[None, :, :])**2).sum(axis=2).argmin(axis=1)
+        for k in range(len(centres)):
+            members = samples[labels == k]
+            if len(members):    #an empty region keeps its centre
+                centres[k] = members.mean(axis=0)
+    return centres
+
+
+def voronoi_labels(w, h, centres):
+    """ Index of the closest centre for every cell, as a (h, w) array """
+    labels = np.empty((h, w), dtype=np.int32)
+    xs = np.arange(w, dtype=float)
+    rows = max(1, MAX_CHUNK // (w * len(centres)))
+    for y0 in range(0, h, rows):
+        ys = np.arange(y0, min(h, y0 + rows), dtype=float)
+        dx = (xs[None, :, None] - centres[None, None, :, 0])**2
+        dy = (ys[:, None, None] - centres[None, None, :, 1])**2
+        labels[y0:y0 + len(ys)] = (dx + dy).argmin(axis=2)
+    return labels
+
+
+class FrontierExplorer:
+    """ Cells covered by an agent and region of the map it is in charge of """
+    def __init__(self, w, h, agent_id, claims):
+        self.w, self.h = w, h
+        self.agent_id = agent_id
+        self.covered = np.zeros((h, w), dtype=bool)
+        self.claims = claims    #agent id -> announced position of the agents still exploring, kept up to date by the agent
+        self.partitioned = None     #claims the region was computed for
+        self.region = None      #(h, w) mask of the cells of this agent
+
+    def cover(self, x, y):
+        """ Mark the cells from which the agent on (x, y) notices an item """
+        r = COVER_RADIUS
+        self.covered[max(0, y - r):y + r + 1, max(0, x - r):x + r + 1] = True
+
+    def skip(self, cell):
+        """ Never go to 'cell' again, e.g. when it cannot be reached """
+        self.covered[cell[1], cell[0]] = True
+
+    def partition(self, claims):
+        """ Split the map between the exploring agents, keep the region of this agent """
+        ids = sorted(claims)
+        if self.agent_id not in ids:
+            self.region = np.ones((self.h, self.w), dtype=bool)
+        else:
+            centres = kmeans_centres(self.w, self.h, [claims[i] for i in ids])
+            self.region = voronoi_labels(self.w, self.h, centres) == ids.index(self.agent_id)
+        self.partitioned = claims
+
+    def next_target(self, position, excluded=None):
+        """ Closest cell (Chebyshev distance) not covered yet, in the region of the agent if there is one left, None when
+        the whole map is covered. 'excluded' is an optional (h, w) mask of cells not to go to """
+        claims = dict(self.claims)  #updated by the thread reading the broadcasts
+        if claims != self.partitioned:
+            self.partition(claims)
+        frontier = ~self.covered if excluded is None else ~(self.covered | excluded)
+        cells = np.argwhere(frontier & self.region)
+        if not len(cells):
+            cells = np.argwhere(frontier)
+            if not len(cells):
+                return None
+        distances = np.maximum(np.abs(cells[:, 1] - position[0]), np.abs(cells[:, 0] - position[1]))
+        y, x = cells[int(distances.argmin())]
+        return self.extend(position, (int(x), int(y)), frontier)
+
+    def extend(self, position, target, frontier):
+        """ Keep going in the direction of 'target' while the cells are not covered, so that the agent sweeps the map in
+        long lanes instead of stopping at every frontier cell """
+        dx = (target[0] > position[0]) - (target[0] < position[0])
+        dy = (target[1] > position[1]) - (target[1] < position[1])
+        x, y = target
+        if (dx, dy) == (0, 0):
+            return target
+        while 0 <= x + dx < self.w and 0 <= y + dy < self.h and frontier[y + dy, x + dx]:
+            x, y = x + dx, y + dy
+        return x, y
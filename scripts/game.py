@@ -6,6 +6,7 @@ __version__ = "1.0.0"
 
 
 import json, os
+from array import array
 import numpy as np
 
 from my_constants import *
@@ -13,99 +14,156 @@ from gui import GUI
 from time import sleep
 import random
 
+def item_kernel(neighbour_percent):
+    """ Values around an item: 1 on the item, 'neighbour_percent' on the first ring and half of it on the second one """
+    kernel = np.full((5, 5), neighbour_percent/2)
+    kernel[1:4, 1:4] = neighbour_percent
+    kernel[2, 2] = 1
+    return kernel
+
+
+def free_windows(values, size):
+    """ For each top-left corner (x, y) of a size x size window fully inside 'values', True if the window only holds
+    zeros. Computed with a summed-area table of the non-zero cells """
+    dtype = np.int32 if values.size < 2**31 else np.int64
+    sat = np.zeros((values.shape[0] + 1, values.shape[1] + 1), dtype=dtype)
+    np.cumsum(np.cumsum(values != 0, axis=0, dtype=dtype), axis=1, out=sat[1:, 1:])
+    return (sat[size:, size:] - sat[:-size, size:] - sat[size:, :-size] + sat[:-size, :-size]) == 0
+
+
+def blocked_windows(shape):
+    """ Windows of the size of 'shape' that contain one of its non-zero cells once it is placed at (size-1, size-1).
+    Entry (i, j) is the window whose top-left corner is (i, j) """
+    size = shape.shape[0]
+    blocked = np.zeros((2*size - 1, 2*size - 1), dtype=bool)
+    for i, j in np.argwhere(shape != 0):
+        blocked[i:i + size, j:j + size] = True
+    return blocked
+
+
+OBSTACLE_SIZE = 5
+BASE_L = np.array([
+    [0.35, 0.35, 0.35, 0, 0],
+    [0.35, 1.0,  0.35, 0, 0],
+    [0.35, 1.0,  0.35, 0.35, 0.35],
+    [0.35, 1.0,  1.0,  1.0,  0.35],
+    [0.35, 0.35, 0.35, 0.35, 0.35]
+])
+L_SHAPES = [np.rot90(BASE_L, rotations) for rotations in range(4)]    #obstacle en forme de L pour chaque rotation
+L_BLOCKED = [blocked_windows(shape) for shape in L_SHAPES]
+L_CENTRES = [[(int(i), int(j)) for i, j in np.argwhere(shape == 1.0)] for shape in L_SHAPES]   #(row, column) of the 1.0 cells
+MOVES = [(0, 0), (-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (1, -1), (-1, 1), (1, 1)]  #(dx, dy) of each direction
+ITEM_KERNELS = {"key": item_kernel(KEY_NEIGHBOUR_PERCENTAGE), "box": item_kernel(BOX_NEIGHBOUR_PERCENTAGE)}
+
+
 class Game:
     """ Handle the whole game """
-    def __init__(self, nb_agents, map_id):
+    def __init__(self, nb_agents, map_id, gui=True, scenario=None, clock=None):
         self.nb_agents = nb_agents
         self.nb_ready = 0
         self.agent_id = 0
-        self.moves = [(0, 0), (-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (1, -1), (-1, 1), (1, 1)]
+        self.moves = MOVES
         self.agent_paths = [None]*nb_agents
-        self.load_map(map_id)
-        self.load_obstacles(num_obstacles=nb_agents)
+        self.snapshot = None    #shared memory snapshot read by a viewer process, see snapshot.py
+        self.recorder = None    #event log of the requests, see recorder.py
+        self.load_map(map_id, scenario)
+        self.load_obstacles(num_obstacles=self.map_cfg.get("obstacles", nb_agents))
         #Generate obstacle randomly
-        self.gui = GUI(self)
+        self.gui = GUI(self, clock=clock) if gui else None   #no window at all for headless simulations
         
     
     def load_obstacles(self, num_obstacles=3):
         """
         Génère et place des obstacles en forme de L sur la carte.
+        Une table des sommes cumulées indique les positions où la zone 5x5 est libre, chaque obstacle placé retire
+        ensuite les positions qu'il bloque.
         """
-        def create_L_shape():
-            """Crée une matrice représentant un obstacle en forme de L avec rotation aléatoire."""
-            base_L = np.array([
-                [0.35, 0.35, 0.35, 0, 0],
-                [0.35, 1.0,  0.35, 0, 0],
-                [0.35, 1.0,  0.35, 0.35, 0.35],
-                [0.35, 1.0,  1.0,  1.0,  0.35],
-                [0.35, 0.35, 0.35, 0.35, 0.35]
-            ])
-            rotations = random.choice([0, 1, 2, 3])  # Rotation aléatoire (0°, 90°, 180°, 270°)
-            return np.rot90(base_L, rotations)
-
-        obstacle_size = 5  # Taille des obstacles
+        obstacle_size = OBSTACLE_SIZE  # Taille des obstacles
+        self.obstacle_centres = set()   # (x, y) des cellules à 1.0 des obstacles placés
+        self.obstacles = []     # (ligne, colonne, rotation) des obstacles placés, pour rejouer la partie
+        free = free_windows(self.map_real, obstacle_size)   # free[x, y]: la zone commençant en (x, y) est vide
         for _ in range(num_obstacles):
             placed = False
             attempts = 0
 
             while not placed and attempts < 100:
                 attempts += 1
-                obstacle = create_L_shape()
+                rotation = random.choice([0, 1, 2, 3])  # Rotation aléatoire (0°, 90°, 180°, 270°)
                 x = random.randint(0, self.map_h - obstacle_size)
                 y = random.randint(0, self.map_w - obstacle_size)
 
                 # Vérifie si la zone est libre pour placer tout l'obstacle
-                if np.sum(self.map_real[x:x + obstacle_size, y:y + obstacle_size]) == 0:
-                    # Place tout l'obstacle
-                    self.map_real[x:x + obstacle_size, y:y + obstacle_size] = obstacle
+                if free[x, y]:
+                    self.place_obstacle(x, y, rotation)
+                    # Les zones contenant une cellule non nulle de l'obstacle ne sont plus libres
+                    r = obstacle_size - 1
+                    x0, y0 = max(0, x - r), max(0, y - r)
+                    x1, y1 = min(free.shape[0], x + obstacle_size), min(free.shape[1], y + obstacle_size)
+                    free[x0:x1, y0:y1] &= ~L_BLOCKED[rotation][x0 - x + r:x1 - x + r, y0 - y + r:y1 - y + r]
                     placed = True
 
             if not placed:
                 print(f"Impossible de placer un obstacle après {attempts} tentatives.")
 
 
+    def place_obstacle(self, x, y, rotation):
+        """ Place tout l'obstacle de rotation 'rotation' dont le coin haut gauche est en ligne x, colonne y """
+        self.map_real[x:x + OBSTACLE_SIZE, y:y + OBSTACLE_SIZE] = L_SHAPES[rotation]
+        self.obstacle_centres.update((y + j, x + i) for i, j in L_CENTRES[rotation])
+        self.obstacles.append((x, y, rotation))
+
+
 
     
-    def load_map(self, map_id):
-        """ Load a map """
-        json_filename = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "resources", "config.json")
-        with open(json_filename, "r") as json_file:
-            self.map_cfg = json.load(json_file)[f"map_{map_id}"]        
+    def load_map(self, map_id, scenario=None):
+        """ Load a map of config.json, or the given scenario (see scenario.py) """
+        if scenario is not None:
+            self.map_cfg = scenario
+        else:
+            json_filename = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "resources", "config.json")
+            with open(json_filename, "r") as json_file:
+                self.map_cfg = json.load(json_file)[f"map_{map_id}"]        
         
+        self.map_w, self.map_h = self.map_cfg["width"], self.map_cfg["height"]
         self.agents, self.keys, self.boxes = [], [], []
         for i in range(self.nb_agents):
             self.agents.append(Agent(i+1, self.map_cfg[f"agent_{i+1}"]["x"], self.map_cfg[f"agent_{i+1}"]["y"], self.map_cfg[f"agent_{i+1}"]["color"]))
             self.keys.append(Key(self.map_cfg[f"key_{i+1}"]["x"], self.map_cfg[f"key_{i+1}"]["y"]))
             self.boxes.append(Box(self.map_cfg[f"box_{i+1}"]["x"], self.map_cfg[f"box_{i+1}"]["y"]))
-            self.agent_paths[i] = [(self.agents[i].x, self.agents[i].y)]
+            self.agent_paths[i] = VisitedCells(self.map_w, self.map_h)
+            self.agent_paths[i].add(self.agents[i].x, self.agents[i].y)
         
-        self.map_w, self.map_h = self.map_cfg["width"], self.map_cfg["height"]
+        self.item_index = {}    #(x, y) -> [(type, owner)] of the keys and boxes on the cell, in drawing order
+        for i in range(self.nb_agents):
+            self.item_index.setdefault((self.keys[i].x, self.keys[i].y), []).append((KEY_TYPE, i))
+            self.item_index.setdefault((self.boxes[i].x, self.boxes[i].y), []).append((BOX_TYPE, i))
         self.map_real = np.zeros(shape=(self.map_h, self.map_w))
         items = []
         items.extend(self.keys)
         items.extend(self.boxes)
-        offsets = [[(-1, -1), (0, -1), (1, -1), (-1, 0), (0, 0), (1, 0), (-1, 1), (0, 1), (1, 1)], [(-2, -2), (-1, -2), (0, -2), (1, -2), (2, -2), (-2, -1), (2, -1), (-2, 0), (2, 0), (-2, 1), ( 2, 1), (-2, 2), (-1, 2), (0, 2), (1, 2), (2, 2)]]
-        for item in items:
-            for i, sub_list in enumerate(offsets):
-                for dx, dy in sub_list:
-                    if dx != 0 or dy != 0:
-                        self.add_val(item.x + dx, item.y + dy, item.neighbour_percent/(i+1))
-                    else:
-                        self.add_val(item.x, item.y, 1)
+        for item in items:  #the last stamped item wins where neighbourhoods overlap
+            self.stamp(ITEM_KERNELS[item.type], item.x, item.y)
         
-    
-    def add_val(self, x, y, val):
-        """ Add a value if x and y coordinates are in the range [map_w; map_h] """
-        if 0 <= x < self.map_w and 0 <= y < self.map_h:
-            self.map_real[y, x] = val
 
+    def stamp(self, kernel, x, y):
+        """ Copy a square kernel centred on (x, y), the part outside of the map is clipped """
+        r = kernel.shape[0] // 2
+        x0, x1 = max(0, x - r), min(self.map_w, x + r + 1)
+        y0, y1 = max(0, y - r), min(self.map_h, y + r + 1)
+        if x0 < x1 and y0 < y1:
+            self.map_real[y0:y1, x0:x1] = kernel[y0 - (y - r):y1 - (y - r), x0 - (x - r):x1 - (x - r)]
 
+    
     def process(self, msg, agent_id):
         """ Process data sent by agent whose id is specified """
         self.agent_id = agent_id
         if msg["header"] == MOVE:
             return self.handle_move(msg, agent_id)
-        elif msg["header"] == GET_DATA:
+        elif msg["header"] == MOVE_BATCH:
+            return self.handle_move_batch(msg, agent_id)
+        if self.recorder is not None:   #the moves are logged with their result
+            self.recorder.request(agent_id, msg["header"])
+        if msg["header"] == GET_DATA:
             return {"sender": GAME_ID, "header": GET_DATA, "agent_id" : self.agent_id, "x": self.agents[agent_id].x, "y": self.agents[agent_id].y, "w": self.map_w, "h": self.map_h, "cell_val": self.map_real[self.agents[agent_id].y, self.agents[agent_id].x]}
         elif msg["header"] == GET_NB_CONNECTED_AGENTS:
             return {"sender": GAME_ID, "header": GET_NB_CONNECTED_AGENTS, "nb_connected_agents": self.nb_ready}
@@ -118,29 +176,61 @@ class Game:
             self.broadcast_message(msg, agent_id)
         
 
+    def step(self, direction, agent_id):
+        """ Make sure the desired move is allowed and update the agent's position, return it """
+        agent = self.agents[agent_id]
+        if direction in range(9):
+            dx, dy = self.moves[direction]
+            x, y = agent.x + dx, agent.y + dy
+            if 0 <= x < self.map_w and 0 <= y < self.map_h:  
+                agent.x, agent.y = x, y
+                self.agent_paths[agent_id].add(x, y)    #only logged the first time the agent goes to this cell
+                if self.snapshot is not None:
+                    self.snapshot.move(agent_id, x, y)
+        return agent.x, agent.y
+
+
     def handle_move(self, msg, agent_id):
-        """ Make sure the desired move is allowed and update the agent's position """
-        if msg["direction"] in range(9):
-            dx, dy = self.moves[msg["direction"]]
-            x, y = self.agents[agent_id].x, self.agents[agent_id].y
-            if 0 <= x + dx < self.map_w and 0 <= y + dy < self.map_h:  
-                self.agents[agent_id].x, self.agents[agent_id].y = x + dx, y + dy
-                if (self.agents[agent_id].x, self.agents[agent_id].y) not in self.agent_paths[agent_id]:    #add the current agent pose in the path only if it is the first time it goes to its current cell
-                    self.agent_paths[agent_id].append((self.agents[agent_id].x, self.agents[agent_id].y))
-                    #sleep(0.5)
-        return {"sender": GAME_ID, "header": MOVE, "x": self.agents[agent_id].x, "y": self.agents[agent_id].y, "cell_val": self.map_real[self.agents[agent_id].y, self.agents[agent_id].x]}
+        """ Move the agent and reply with its new position and the value of its cell """
+        x, y = self.step(msg["direction"], agent_id)
+        reply = {"sender": GAME_ID, "header": MOVE, "x": x, "y": y, "cell_val": self.map_real[y, x]}
+        if self.recorder is not None:
+            self.recorder.move(agent_id, msg["direction"])
+        return reply
+
+
 
+    def handle_move_batch(self, msg, agent_id):
+        """ Apply a list of moves, stopping right after the first cell matching the 'stop_on' conditions """
+        stop_on = msg.get("stop_on", STOP_NEVER)
+        trajectory, values = [], []
+        for direction in msg["directions"]:
+            x, y = self.step(direction, agent_id)
+            trajectory.append((x, y))
+            values.append(self.map_real[y, x])
+            if self.is_stop_cell(values[-1], stop_on):
+                break
+        x, y = self.agents[agent_id].x, self.agents[agent_id].y
+        if self.recorder is not None:   #only the directions, the replay moves the agent again
+            self.recorder.move_batch(agent_id, msg["directions"], len(trajectory))
+        return {"sender": GAME_ID, "header": MOVE_BATCH, "x": x, "y": y, "cell_val": self.map_real[y, x], "trajectory": trajectory, "values": values}
+
+
+    def is_stop_cell(self, cell_val, stop_on):
+        """ Check if a cell value matches one of the MOVE_BATCH stop conditions """
+        return bool((stop_on & STOP_ON_NON_ZERO and cell_val != 0)
+                    or (stop_on & STOP_ON_OBSTACLE_NEIGHBOR and cell_val == OBSTACLE_NEIGHBOUR_PERCENTAGE)
+                    or (stop_on & STOP_ON_TARGET and cell_val == 1.0))
 
 
     def handle_item_owner_request(self, agent_id):
         if self.map_real[self.agents[agent_id].y, self.agents[agent_id].x] != 1.0:  #make sure the agent is located on an item
             return {"sender": GAME_ID, "header": GET_ITEM_OWNER, "owner": None}
-        for i, key in enumerate(self.keys): #check if it's a key
-            if (self.agents[agent_id].x == key.x) and (self.agents[agent_id].y == key.y):
-                return  {"sender": GAME_ID, "header": GET_ITEM_OWNER, "owner": i, "type": KEY_TYPE}
-        for i, box in enumerate(self.boxes):    #check if it's a box
-            if (self.agents[agent_id].x == box.x) and (self.agents[agent_id].y == box.y):
-                return  {"sender": GAME_ID, "header": GET_ITEM_OWNER, "owner": i, "type": BOX_TYPE}
+        items = self.item_index.get((self.agents[agent_id].x, self.agents[agent_id].y))
+        if items is None:   #center of an obstacle
+            return {"sender": GAME_ID, "header": GET_ITEM_OWNER, "owner": None}
+        item_type, owner = min(items)   #the keys first, then the lowest owner
+        return {"sender": GAME_ID, "header": GET_ITEM_OWNER, "owner": owner, "type": item_type}
 
     def broadcast_message(self, msg, sender_id):
         """
@@ -159,6 +249,49 @@ class Game:
                     print(f"Error broadcasting message to agent {agent_id}: {e}")
 
 
+class VisitedCells:
+    """ Cells visited by an agent. A packed bitmap (one bit per cell) tells in O(1) if a cell was already visited and
+    the first visits are logged in order, as linear indices, for the GUI. The memory only depends on the map size """
+    def __init__(self, w, h):
+        self.w, self.h = w, h
+        self.bits = bytearray((w*h + 7) // 8)
+        self.order = array("I")
+
+    def add(self, x, y):
+        """ Mark a cell as visited, return True if it is the first visit """
+        i = y*self.w + x
+        mask = 1 << (i & 7)
+        if self.bits[i >> 3] & mask:
+            return False
+        self.bits[i >> 3] |= mask
+        self.order.append(i)
+        return True
+
+    def __contains__(self, cell):
+        i = cell[1]*self.w + cell[0]
+        return bool(self.bits[i >> 3] & (1 << (i & 7)))
+
+    def __len__(self):
+        return len(self.order)
+
+    def __iter__(self):
+        return self.since(0)
+
+    def since(self, start):
+        """ (x, y) of the cells first visited after the 'start' first ones, in visit order """
+        w = self.w
+        for i in self.order[start:]:
+            yield i % w, i // w
+
+    def mask(self, y0=0, y1=None):
+        """ Boolean array of the visited cells of the rows 'y0' to 'y1' (excluded), (h, w) for the whole map """
+        y1 = self.h if y1 is None else y1
+        start = y0*self.w >> 3  #only unpack the bytes of these rows
+        bits = np.unpackbits(np.frombuffer(self.bits, dtype=np.uint8)[start:(y1*self.w + 7) >> 3], bitorder="little")
+        offset = y0*self.w - start*8
+        return bits[offset:offset + (y1 - y0)*self.w].reshape(y1 - y0, self.w).astype(bool)
+
+
 class Agent:
     def __init__(self, id, x, y, color):
         self.id = id
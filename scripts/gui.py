@@ -4,20 +4,31 @@ __credits__ = ["Aybuke Ozturk Suri", "Johvany Gustave"]
 __license__ = "Apache License 2.0"
 __version__ = "1.0.0"
 
-import pygame, os
+import pygame, os, math
+import numpy as np
 from my_constants import * 
+from clock import Clock
 
 img_folder = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "resources", "img")
+SCROLL_KEYS = {pygame.K_LEFT: (-1, 0), pygame.K_RIGHT: (1, 0), pygame.K_UP: (0, -1), pygame.K_DOWN: (0, 1)}
 
 
 class GUI:
-    def __init__(self, game, fps=10, cell_size=25):
+    def __init__(self, game, fps=10, cell_size=25, max_screen_size=1000, max_cell_size=50, clock=None):
         self.game = game
         self.w, self.h = self.game.map_w, self.game.map_h
-        self.fps = fps
+        self.fps = (clock if clock is not None else Clock()).frame_rate(fps)   #'fps' frames per simulated second
         self.clock = pygame.time.Clock()
-        self.cell_size = cell_size
-        self.screen_res = (self.w*cell_size, self.h*cell_size)      
+        fit = min(cell_size, max_screen_size / max(self.w, self.h))
+        self.base_size = int(fit) if fit >= 1 else fit  #smaller cells for the large generated maps, below a pixel for the largest ones
+        self.cell_size = self.base_size
+        self.screen_res = (math.ceil(self.w*self.cell_size), math.ceil(self.h*self.cell_size))
+        #view: zoomed in by 2 per level from the whole map, (view_x, view_y) is the cell at the top left corner of the window
+        self.zoom_level, self.max_zoom_level = 0, 0
+        while self.zoom_size(self.max_zoom_level + 1) <= max(max_cell_size, self.base_size):
+            self.max_zoom_level += 1
+        self.view_x, self.view_y = 0.0, 0.0
+        self.view_changed = True
 
 
     def on_init(self):
@@ -25,29 +36,33 @@ class GUI:
         self.screen = pygame.display.set_mode(self.screen_res)
         pygame.display.set_icon(pygame.image.load(img_folder + "/icon.png"))
         pygame.display.set_caption("IN512 Project")
-        self.create_items()        
+        self.create_items()
+        self.build_heatmap()
+        self.build_background()
         self.running = True
 
 
     def create_items(self):
+        size = max(1, int(self.cell_size))
         #box
         box_img = pygame.image.load(img_folder + "/box.png")
-        box_img = pygame.transform.scale(box_img, (self.cell_size, self.cell_size))
+        box_img = pygame.transform.scale(box_img, (size, size))
         self.boxes = [box_img.copy() for _ in range(self.game.nb_agents)]
         #keys
         key_img = pygame.image.load(img_folder + "/key.png")
-        key_img = pygame.transform.scale(key_img, (self.cell_size, self.cell_size))
+        key_img = pygame.transform.scale(key_img, (size, size))
         self.keys = [key_img.copy() for _ in range(self.game.nb_agents)]
         #agent text number
-        self.font = pygame.font.SysFont("Arial", self.cell_size//4, True)
+        self.font = pygame.font.SysFont("Arial", max(1, size//4), True)
+        self.glyphs = {}    #labels of the cell values in this font
         self.text_agents = [self.font.render(f"{i+1}", True, self.game.agents[i].color) for i in range(self.game.nb_agents)]
         #agent_img
         agent_img = pygame.image.load(img_folder + "/robot.png")
-        agent_img = pygame.transform.scale(agent_img, (self.cell_size, self.cell_size))
+        agent_img = pygame.transform.scale(agent_img, (size, size))
         self.agents = [agent_img.copy() for _ in range(self.game.nb_agents)]
         #obstacle_img
         obstacle_img = pygame.image.load(img_folder + "/obstacle.png")
-        obstacle_img = pygame.transform.scale(obstacle_img, (self.cell_size, self.cell_size))  # Utilise obstacle_img
+        obstacle_img = pygame.transform.scale(obstacle_img, (size, size))  # Utilise obstacle_img
         self.obstacle = [obstacle_img.copy() for _ in range(self.game.nb_agents)]
 
 
@@ -55,6 +70,20 @@ class GUI:
     def on_event(self, event):
         if event.type == pygame.QUIT:
             self.running = False
+        elif event.type == pygame.MOUSEWHEEL:   #zoom around the mouse
+            self.zoom(event.y, pygame.mouse.get_pos())
+        elif event.type == pygame.MOUSEMOTION and event.buttons[0]:     #drag the map
+            self.move_view(self.view_x - event.rel[0]/self.cell_size, self.view_y - event.rel[1]/self.cell_size)
+        elif event.type == pygame.KEYDOWN:
+            if event.key in SCROLL_KEYS:    #a quarter of the window
+                dx, dy = SCROLL_KEYS[event.key]
+                self.move_view(self.view_x + dx*self.screen_res[0]/self.cell_size/4, self.view_y + dy*self.screen_res[1]/self.cell_size/4)
+            elif event.key in (pygame.K_PLUS, pygame.K_EQUALS, pygame.K_KP_PLUS):
+                self.zoom(1)
+            elif event.key in (pygame.K_MINUS, pygame.K_KP_MINUS):
+                self.zoom(-1)
+            elif event.key == pygame.K_HOME:    #whole map
+                self.zoom(-self.zoom_level)
 
     
     def on_cleanup(self):
@@ -75,63 +104,214 @@ class GUI:
             pass
     
 
-    def draw(self):
-        self.screen.fill(BG_COLOR)
-        #Grid
-        for i in range(1, self.h):
-            pygame.draw.line(self.screen, BLACK, (0, i*self.cell_size), (self.w*self.cell_size, i*self.cell_size))
-        for j in range(1, self.w):
-            pygame.draw.line(self.screen, BLACK, (j*self.cell_size, 0), (j*self.cell_size, self.h*self.cell_size))
-            
-        # Display cell values
-        if hasattr(self.game, "map_real"):
-            for y in range(self.game.map_real.shape[0]):
-                for x in range(self.game.map_real.shape[1]):
-                    cell_value = self.game.map_real[y, x]
-                    text_surface = self.font.render(f"{cell_value:.2f}", True, (169, 169, 169))  # Gray color
-                    text_rect = text_surface.get_rect(center=(x * self.cell_size + self.cell_size // 2, y * self.cell_size + self.cell_size // 2))
-                    self.screen.blit(text_surface, text_rect)
+    def zoom_size(self, level):
+        """ Cell size at a zoom level, a whole number of pixels from 1 pixel """
+        size = self.base_size * 2**level
+        return round(size) if size >= 1 else size
+
+
+    @property
+    def detailed(self):
+        """ True when the cells are large enough for their icons, False when the view is drawn from the heat map """
+        return self.cell_size >= MIN_CELL_SIZE_DETAIL
+
+
+    def move_view(self, x, y):
+        """ Put the cell (x, y) at the top left corner of the window, kept within the map """
+        x = min(max(0.0, x), max(0.0, self.w - self.screen_res[0]/self.cell_size))
+        y = min(max(0.0, y), max(0.0, self.h - self.screen_res[1]/self.cell_size))
+        if (x, y) != (self.view_x, self.view_y):
+            self.view_x, self.view_y, self.view_changed = x, y, True
+
+
+    def zoom(self, levels, anchor=None):
+        """ Zoom in (or out for negative 'levels'), the cell under the pixel 'anchor' (centre of the window by default)
+        staying in place """
+        level = min(max(self.zoom_level + levels, 0), self.max_zoom_level)
+        if level == self.zoom_level:
+            return
+        px, py = anchor if anchor is not None else (self.screen_res[0]//2, self.screen_res[1]//2)
+        x, y = self.view_x + px/self.cell_size, self.view_y + py/self.cell_size
+        self.zoom_level, self.cell_size = level, self.zoom_size(level)
+        if self.detailed:
+            self.create_items()
+        self.view_changed = True
+        self.move_view(x - px/self.cell_size, y - py/self.cell_size)
+
+
+    def view_range(self):
+        """ First and last (excluded) columns and rows of the cells within the window """
+        return (int(self.view_x), int(self.view_y),
+                min(self.w, math.ceil(self.view_x + self.screen_res[0]/self.cell_size)), min(self.h, math.ceil(self.view_y + self.screen_res[1]/self.cell_size)))
+
+
+    def visible(self, x, y):
+        x0, y0, x1, y1 = self.view
+        return x0 <= x < x1 and y0 <= y < y1
+
+
+    def in_view(self, cells):
+        """ The cells of 'cells' (set or dict of (x, y)) within the window, looking up the smaller of both """
+        x0, y0, x1, y1 = self.view
+        if len(cells) <= (x1 - x0)*(y1 - y0):
+            return [cell for cell in cells if x0 <= cell[0] < x1 and y0 <= cell[1] < y1]
+        return [(x, y) for y in range(y0, y1) for x in range(x0, x1) if (x, y) in cells]
+
+
+    def to_screen(self, x, y):
+        """ Pixel of the top left corner of the cell (x, y) """
+        return math.floor((x - self.view_x)*self.cell_size), math.floor((y - self.view_y)*self.cell_size)
 
+
+    def cell_rect(self, x, y, size=1):
+        """ Area of the window of the 'size' x 'size' cells from (x, y), at least a pixel """
+        left, top = self.to_screen(x, y)
+        right, bottom = self.to_screen(x + size, y + size)
+        return pygame.Rect(left, top, max(1, right - left), max(1, bottom - top))
+
+
+    def glyph(self, value):
+        """ Rendered label of a cell value, rendered once per distinct value """
+        if value not in self.glyphs:
+            self.glyphs[value] = self.font.render(f"{value:.2f}", True, (169, 169, 169))  # Gray color
+        return self.glyphs[value]
+
+
+    def build_heatmap(self):
+        """ Colors of the zoomed out views: one per block of 'self.lod' x 'self.lod' cells, about a pixel when the whole
+        map is in the window. A block gets the color of its largest value, so that the keys, boxes and obstacles stay
+        visible, and the trails are painted over. Built once with NumPy, the trails are then painted in it as the agents
+        visit new cells """
+        f = self.lod = math.ceil(1 / self.base_size) if self.base_size < 1 else 1
+        values = self.game.map_real
+        if f > 1:
+            values = np.maximum.reduceat(np.maximum.reduceat(values, np.arange(0, self.h, f), axis=0), np.arange(0, self.w, f), axis=1)
+        colors = np.array(BG_COLOR) + np.clip(values, 0, 1)[..., None]*(np.array(HEAT_COLOR) - np.array(BG_COLOR))
+        self.nb_drawn = [0]*self.game.nb_agents     #cells of each path already painted
+        for i, path in enumerate(self.game.agent_paths):    #the agent with the highest id keeps the cells crossed by several paths
+            self.nb_drawn[i] = len(path)
+            cells = np.array(path.order[:self.nb_drawn[i]], dtype=np.int64)   #copy, the path may grow meanwhile
+            colors[cells // self.w // f, cells % self.w // f] = self.game.agents[i].color
+        self.heatmap = pygame.surfarray.map_array(self.screen, colors.astype(np.uint8).transpose(1, 0, 2))   #pixels (x, y) of the window format
+        self.heat_colors = [self.screen.map_rgb(agent.color) for agent in self.game.agents]
+
+
+    def build_background(self):
+        """ Pre-render what does not move in the cells within the window: grid, cell values, trails, keys, boxes and
+        obstacles, or the heat map when zoomed out. 'self.under' holds every cell as it is drawn below an agent (without
+        obstacle icon), 'self.canvas' as it is drawn without agent. The trails are then painted in both of them as the
+        agents visit new cells, until the view is scrolled or zoomed """
+        x0, y0, x1, y1 = self.view = self.view_range()
+        self.map_rect = self.cell_rect(x0, y0).union(self.cell_rect(x1 - 1, y1 - 1)).clip(pygame.Rect((0, 0), self.screen_res))
+        self.items_at = self.game.item_index
+        self.obstacles = self.game.obstacle_centres
+        self.under = pygame.Surface(self.screen_res, 0, self.screen)
+        self.under.fill(BLACK)  #beyond the map
+        if self.detailed:
+            self.under.fill(BG_COLOR, self.map_rect)
+            lefts = [self.to_screen(x, y0)[0] for x in range(x0, x1 + 1)]     #edges of the columns and rows, like 'cell_rect'
+            tops = [self.to_screen(x0, y)[1] for y in range(y0, y1 + 1)]
+            #Grid
+            if self.cell_size >= MIN_CELL_SIZE_GRID:
+                for top in tops[1 if y0 == 0 else 0:-1]:
+                    pygame.draw.line(self.under, BLACK, (self.map_rect.left, top), (self.map_rect.right, top))
+                for left in lefts[1 if x0 == 0 else 0:-1]:
+                    pygame.draw.line(self.under, BLACK, (left, self.map_rect.top), (left, self.map_rect.bottom))
+            # Display cell values
+            if self.cell_size >= MIN_CELL_SIZE_TEXT:
+                for row, top, bottom in zip(self.game.map_real[y0:y1, x0:x1].tolist(), tops, tops[1:]):
+                    for value, left, right in zip(row, lefts, lefts[1:]):
+                        text_surface = self.glyph(value)
+                        self.under.blit(text_surface, text_surface.get_rect(center=((left + right)//2, (top + bottom)//2)))
+            # Trails
+            for i, path in enumerate(self.game.agent_paths):    #the agent with the highest id keeps the cells crossed by several paths
+                ys, xs = np.nonzero(path.mask(y0, y1)[:, x0:x1])
+                for x, y in zip(xs.tolist(), ys.tolist()):
+                    self.under.fill(self.game.agents[i].color, (lefts[x], tops[y], lefts[x + 1] - lefts[x], tops[y + 1] - tops[y]))
+            # Keys and boxes
+            for cell in self.in_view(self.items_at):
+                self.draw_items(self.under, cell)
+            # Obstacles, hidden by the agents
+            self.canvas = self.under.copy()
+            for cell in self.in_view(self.obstacles):
+                self.canvas.blit(self.obstacle[0], self.cell_rect(*cell))
+        else:
+            f, rect = self.lod, self.map_rect
+            blocks_x, blocks_y = np.arange(x0 // f, -(-x1 // f)), np.arange(y0 // f, -(-y1 // f))   #blocks within the window
+            left = np.floor((blocks_x*f - self.view_x)*self.cell_size)  #first pixel of each block, like 'to_screen'
+            top = np.floor((blocks_y*f - self.view_y)*self.cell_size)
+            cols = blocks_x[np.searchsorted(left, np.arange(rect.left, rect.right), "right") - 1]    #block of each pixel
+            rows = blocks_y[np.searchsorted(top, np.arange(rect.top, rect.bottom), "right") - 1]
+            pygame.surfarray.blit_array(self.under.subsurface(rect), self.heatmap.take(cols, axis=0).take(rows, axis=1))
+            self.canvas = self.under    #the agents are drawn over the heat map
+        self.sprite_rects = []  #areas covered by the agents on the previous frame
+        self.view_changed = False
+        self.screen.blit(self.canvas, (0, 0))
+        pygame.display.update()
+
+
+    def draw_items(self, surface, cell):
+        for item_type, owner in self.items_at[cell]:
+            image = self.keys[owner] if item_type == KEY_TYPE else self.boxes[owner]
+            pygame.draw.rect(surface, self.game.agents[owner].color, self.cell_rect(*cell), width=3)
+            surface.blit(image, self.cell_rect(*cell))
+
+
+    def paint_trails(self):
+        """ Paint the cells visited since the previous frame in the heat map and, within the window, in the layers.
+        Return the areas of the window painted. Where the paths of several agents cross, the agent with the highest id
+        keeps the cell """
+        painted = []
+        paths, f = self.game.agent_paths, self.lod
         for i in range(self.game.nb_agents):
-            #agent_paths
-            for x, y in self.game.agent_paths[i]:
-                pygame.draw.rect(self.screen, self.game.agents[i].color, (x*self.cell_size, y*self.cell_size, self.cell_size, self.cell_size))
-
-        for i in range(self.game.nb_agents):            
-            #keys
-            pygame.draw.rect(self.screen, self.game.agents[i].color, (self.game.keys[i].x*self.cell_size, self.game.keys[i].y*self.cell_size, self.cell_size, self.cell_size), width=3)
-            self.screen.blit(self.keys[i], self.keys[i].get_rect(topleft=(self.game.keys[i].x*self.cell_size, self.game.keys[i].y*self.cell_size)))
-            
-            #boxes
-            pygame.draw.rect(self.screen, self.game.agents[i].color, (self.game.boxes[i].x*self.cell_size, self.game.boxes[i].y*self.cell_size, self.cell_size, self.cell_size), width=3)
-            self.screen.blit(self.boxes[i], self.boxes[i].get_rect(topleft=(self.game.boxes[i].x*self.cell_size, self.game.boxes[i].y*self.cell_size)))
-            
-            #agents
-            self.screen.blit(self.agents[i], self.agents[i].get_rect(center=(self.game.agents[i].x*self.cell_size + self.cell_size//2, self.game.agents[i].y*self.cell_size + self.cell_size//2)))
-            self.screen.blit(self.text_agents[i], self.text_agents[i].get_rect(center=(self.game.agents[i].x*self.cell_size + self.cell_size-self.text_agents[i].get_width()//2, self.game.agents[i].y*self.cell_size + self.cell_size-self.text_agents[i].get_height()//2)))
-            
-        # Affiche les obstacles
-        if hasattr(self.game, 'map_real'):  # Vérifie si la matrice existe
-            for y in range(self.game.map_real.shape[0]):  # Parcourt les lignes de la matrice
-                for x in range(self.game.map_real.shape[1]):  # Parcourt les colonnes de la matrice
-                    cell_value = self.game.map_real[y, x]
-                    
-                    # Vérifie si c'est un centre d'obstacle (1.0)
-                    if cell_value == 1.0:
-                        # Vérifie que cette cellule n'est pas masquée par un robot, une clé ou une boîte
-                        is_free = True
-                        if hasattr(self.game, 'agents'):
-                            is_free &= not any(agent.x == x and agent.y == y for agent in self.game.agents)
-                        if hasattr(self.game, 'keys'):
-                            is_free &= not any(key.x == x and key.y == y for key in self.game.keys)
-                        if hasattr(self.game, 'boxes'):
-                            is_free &= not any(box.x == x and box.y == y for box in self.game.boxes)
-                        
-                        # Si la cellule est libre, affiche l'icône de l'obstacle
-                        if is_free:
-                            self.screen.blit(
-                                self.obstacle[0],
-                                self.obstacle[0].get_rect(topleft=(x * self.cell_size, y * self.cell_size))
-                            )
-        
-        pygame.display.update()
\ No newline at end of file
+            color = self.game.agents[i].color
+            for cell in paths[i].since(self.nb_drawn[i]):
+                self.nb_drawn[i] += 1
+                if any(cell in paths[j] for j in range(i + 1, self.game.nb_agents)):
+                    continue
+                x, y = cell
+                self.heatmap[x // f, y // f] = self.heat_colors[i]
+                if not self.visible(x, y):
+                    continue
+                if not self.detailed:   #the block of the heat map
+                    rect = self.cell_rect(x - x % f, y - y % f, f).clip(self.map_rect)
+                    self.under.fill(color, rect)
+                    painted.append(rect)
+                    continue
+                rect = self.cell_rect(x, y)
+                self.under.fill(color, rect)
+                if cell in self.items_at:
+                    self.draw_items(self.under, cell)
+                self.canvas.blit(self.under, rect, rect)
+                if cell in self.obstacles:
+                    self.canvas.blit(self.obstacle[0], rect)
+                painted.append(rect)
+        return painted
+
+
+    def draw(self):
+        """ Only redraw what changed: the new trail cells, and the areas the agents leave and enter. The whole window is
+        drawn again after the view was scrolled or zoomed """
+        if self.view_changed:
+            self.build_background()
+        dirty = self.paint_trails()
+        dirty.extend(self.sprite_rects)     #agents of the previous frame, their number may overlap the next cell
+        for rect in dirty:
+            self.screen.blit(self.canvas, rect, rect)
+        cells = [(i, self.cell_rect(agent.x, agent.y)) for i, agent in enumerate(self.game.agents) if self.visible(agent.x, agent.y)]
+        if self.detailed:
+            for _, rect in cells:
+                self.screen.blit(self.under, rect, rect)
+            self.sprite_rects = [rect for _, rect in cells]
+            for i, rect in cells:
+                #agents
+                self.screen.blit(self.agents[i], self.agents[i].get_rect(center=rect.center))
+                if self.cell_size >= MIN_CELL_SIZE_TEXT:
+                    self.sprite_rects.append(self.screen.blit(self.text_agents[i], self.text_agents[i].get_rect(center=(rect.right - self.text_agents[i].get_width()//2, rect.bottom - self.text_agents[i].get_height()//2))))
+        else:   #markers of a few pixels, whatever the zoom
+            self.sprite_rects = []
+            for i, rect in cells:
+                marker = rect.inflate(max(0, AGENT_MARKER_SIZE - rect.w), max(0, AGENT_MARKER_SIZE - rect.h))
+                self.sprite_rects.append(self.screen.fill(self.game.agents[i].color, marker))
+                pygame.draw.rect(self.screen, BLACK, marker, width=1)
+        pygame.display.update(dirty + self.sprite_rects)
@@ -0,0 +1,177 @@
+__author__ = "Aybuke Ozturk Suri, Johvany Gustave"
+__copyright__ = "Copyright 2023, IN512, IPSA 2024"
+__credits__ = ["Aybuke Ozturk Suri", "Johvany Gustave"]
+__license__ = "Apache License 2.0"
+__version__ = "1.0.0"
+
+""" Load test comparing the threaded server with the asyncio one.
+
+Each simulated agent opens a connection, negotiates the binary protocol and sends MOVE / GET_DATA requests as fast as
+the server answers them. The requests per second and the latency percentiles are reported for each server.
+"""
+
+import asyncio, pickle, argparse, os, tempfile, io
+from multiprocessing import Process
+from time import perf_counter
+import numpy as np
+
+from server import Server
+from async_server import AsyncServer
+from scenario import generate_scenario
+from snapshot import VIEWERS
+from clock import CLOCK_MODES, make_clock
+from protocol import FRAME_HEADER, decode, frame, hello_request, is_hello_ack
+from my_constants import *
+
+
+SERVERS = {"threaded": Server, "asyncio": AsyncServer}
+
+
+async def connect(conf, timeout=30):
+    """ Open a connection to the server, retrying until it listens """
+    start = perf_counter()
+    while True:
+        try:
+            return await asyncio.open_connection(*conf)
+        except OSError:
+            if perf_counter() - start > timeout:
+                raise
+            await asyncio.sleep(0.05)
+
+
+class Connection:
+    """ Client side of a connection: pickles during the handshake, then binary frames. The bytes read past a message
+    are kept for the next one """
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.buffer = bytearray()
+        self.seq = 0
+
+    async def read(self, size):
+        """ Read exactly 'size' bytes """
+        if len(self.buffer) < size:
+            self.buffer += await self.reader.readexactly(size - len(self.buffer))
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+    async def receive_pickle(self):
+        """ Read one pickled message, pickles are self-delimited """
+        while True:
+            if self.buffer:
+                stream = io.BytesIO(self.buffer)
+                try:
+                    msg = pickle.load(stream)
+                    del self.buffer[:stream.tell()]
+                    return msg
+                except (EOFError, pickle.UnpicklingError):
+                    pass    #incomplete pickle, wait for the rest
+            data = await self.reader.read(65536)
+            if not data:
+                raise ConnectionError("Connection closed by the server")
+            self.buffer += data
+
+    async def receive_frame(self):
+        """ Read one message in the binary format """
+        size, = FRAME_HEADER.unpack(await self.read(FRAME_HEADER.size))
+        return decode(await self.read(size))
+
+    async def request(self, msg):
+        """ Send a request in the binary format and wait for its reply """
+        self.seq += 1
+        msg["seq"] = self.seq
+        self.writer.write(frame(msg))
+        reply = await self.receive_frame()
+        if reply.get("seq") != self.seq or reply["header"] != msg["header"]:
+            raise RuntimeError(f"Reply {reply} does not match the request {msg}")
+        return reply
+
+
+async def simulated_agent(conf, nb_requests, connected, start, latencies):
+    """ Connect, wait until the game starts, then send the requests and record their latency """
+    connection = Connection(*await connect(conf))
+    agent_id = await connection.receive_pickle()
+    connection.writer.write(pickle.dumps(hello_request()))
+    if not is_hello_ack(await connection.receive_pickle()):
+        raise RuntimeError("The server refused the binary protocol")
+    while (await connection.receive_frame())["header"] != GAME_START:   #sent once every agent joined
+        pass
+    connected()
+    await start.wait()
+
+    for i in range(nb_requests):
+        msg = {"sender": agent_id, "header": MOVE, "direction": RIGHT if i % 4 < 2 else LEFT} if i % 2 else {"sender": agent_id, "header": GET_DATA}
+        sent = perf_counter()
+        await connection.request(msg)
+        latencies.append(perf_counter() - sent)
+    connection.writer.close()
+
+
+async def run_clients(conf, nb_agents, nb_requests):
+    """ Run all the simulated agents, return the duration of the measured phase and the latencies """
+    start = asyncio.Event()
+    latencies = []
+    nb_connected = 0
+
+    def connected():
+        nonlocal nb_connected
+        nb_connected += 1
+        if nb_connected == nb_agents:
+            start.set()
+
+    tasks = [asyncio.create_task(simulated_agent(conf, nb_requests, connected, start, latencies)) for _ in range(nb_agents)]
+    await start.wait()
+    begin = perf_counter()
+    await asyncio.gather(*tasks)
+    return perf_counter() - begin, latencies
+
+
+def load_test(mode, conf, nb_agents, map_id, nb_requests, scenario=None, viewer="none", clock=None, record=False):
+    """ Start a server in its own process, without GUI by default, and measure it. With 'record', the server logs the
+    episode in a temporary file """
+    filename = os.path.join(tempfile.mkdtemp(), "episode.log") if record else None
+    kwargs = {"gui": viewer != "none", "viewer": viewer, "scenario": scenario, "clock": clock, "record": filename}
+    server = Process(target=SERVERS[mode], args=(conf, nb_agents, map_id), kwargs=kwargs)    #not a daemon: it may start the viewer process
+    server.start()
+    duration, latencies = asyncio.run(run_clients(conf, nb_agents, nb_requests))
+    server.join(timeout=5)
+    if server.is_alive():
+        server.terminate()
+    if filename is not None and os.path.exists(filename):
+        os.remove(filename)
+    latencies = np.array(latencies) * 1000
+    return {
+        "mode": mode,
+        "viewer": viewer,
+        "record": record,
+        "requests/s": len(latencies) / duration,
+        "p50 (ms)": np.percentile(latencies, 50),
+        "p99 (ms)": np.percentile(latencies, 99),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the threaded and the asyncio servers")
+    parser.add_argument("-nb", "--nb_agents", help="Number of simulated agents (up to 4 on a map, any number on a generated scenario)", type=int, default=4)
+    parser.add_argument("-mi", "--map_id", help="Map to load: 1 or 2 or 3", type=int, default=1)
+    parser.add_argument("-r", "--requests", help="Number of requests sent by each agent", type=int, default=2000)
+    parser.add_argument("-p", "--port", help="First port used, each server gets its own", type=int, default=5600)
+    parser.add_argument("-m", "--mode", help="Server to test: threaded, asyncio or both", type=str, default="both")
+    parser.add_argument("-W", "--width", help="Play on a generated scenario of this width instead of the map", type=int, default=None)
+    parser.add_argument("-H", "--height", help="Height of the generated scenario (default: the width)", type=int, default=None)
+    parser.add_argument("-d", "--density", help="Obstacle density of the generated scenario", type=float, default=0.05)
+    parser.add_argument("-vw", "--viewer", help=f"Game window of the servers: {', '.join(VIEWERS)} or all", type=str, default="none")
+    parser.add_argument("-c", "--clock", help=f"Pace of the game window: {'/'.join(CLOCK_MODES)}", type=str, default="fast")
+    parser.add_argument("-rec", "--record", help="Event log of the servers: true, false or both", type=str, default="false")
+    args = parser.parse_args()
+    scenario = generate_scenario(args.width, args.height or args.width, args.nb_agents, args.density, seed=0) if args.width else None
+
+    modes = list(SERVERS) if args.mode == "both" else [args.mode]
+    viewers = list(VIEWERS) if args.viewer == "all" else [args.viewer]
+    records = [False, True] if args.record == "both" else [args.record == "true"]
+    runs = [(mode, viewer, record) for mode in modes for viewer in viewers for record in records]
+    results = [load_test(mode, ("localhost", args.port + i), args.nb_agents, args.map_id, args.requests, scenario, viewer, make_clock(args.clock), record) for i, (mode, viewer, record) in enumerate(runs)]
+    print(f"{'server':<10}{'viewer':<9}{'record':<8}{'requests/s':>12}{'p50 (ms)':>10}{'p99 (ms)':>10}")
+    for result in results:
+        print(f"{result['mode']:<10}{result['viewer']:<9}{str(result['record']):<8}{result['requests/s']:>12.0f}{result['p50 (ms)']:>10.3f}{result['p99 (ms)']:>10.3f}")
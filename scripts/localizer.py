@@ -0,0 +1,115 @@
+__author__ = "Aybuke Ozturk Suri, Johvany Gustave"
+__copyright__ = "Copyright 2023, IN512, IPSA 2024"
+__credits__ = ["Aybuke Ozturk Suri", "Johvany Gustave"]
+__license__ = "Apache License 2.0"
+__version__ = "1.0.0"
+
+""" Localization of a key or a box from the values read around it.
+
+The game stamps every item the same way (see game.item_kernel): 1 on the item, 'neighbour_percent' on the first ring
+and half of it on the second one. From the first reading in a ring, the item is one of the cells at distance 1 or 2.
+Every value the agent has observed since then removes the candidates that would have produced another value (each
+cell is only tested once, when its value is first known), and the agent only moves to the cell whose reading splits
+the remaining candidates the most.
+
+Items of the same kind may be close enough for their stamps to overwrite each other's rings (map 3). When no candidate
+explains every reading, the rings are not trusted anymore: a candidate is only ruled out by an empty or obstacle cell
+within its rings, or by a value other than 1 on it. The candidates then start again from every cell around the first
+reading, tested against every value observed so far.
+"""
+
+from belief import UNKNOWN_VALUE
+from my_constants import *
+
+
+RADIUS = 2  #number of rings around an item
+BACKGROUND_VALUES = {0.0, OBSTACLE_NEIGHBOUR_PERCENTAGE}    #never within the rings of an item
+ITEM_VALUES = {KEY_NEIGHBOUR_PERCENTAGE, KEY_NEIGHBOUR_PERCENTAGE/2, BOX_NEIGHBOUR_PERCENTAGE, BOX_NEIGHBOUR_PERCENTAGE/2}
+
+
+def chebyshev(a, b):
+    return max(abs(a[0] - b[0]), abs(a[1] - b[1]))
+
+
+class Localizer:
+    """ Candidate centres of an item consistent with every value observed around it """
+    def __init__(self, w, h, origin, neighbour_percent, is_excluded=lambda cell: False):
+        self.w, self.h = w, h
+        self.origin = origin
+        self.ring_values = {0: 1.0, 1: neighbour_percent, 2: neighbour_percent/2}
+        self.foreign = ITEM_VALUES - {neighbour_percent, neighbour_percent/2}   #rings of the other kind of item
+        self.initial = [cell for cell in self.window(origin, RADIUS) if not is_excluded(cell)]
+        self.candidates = list(self.initial)
+        self.area = self.window(origin, 2*RADIUS)   #cells whose value can rule out a candidate
+        self.unobserved = list(self.area)   #cells of the area whose value was unknown at the last update
+        self.strict = True  #False once the rings are known to overlap
+        self.nb_probes = 0
+
+    def window(self, centre, radius):
+        """ Cells of the map at most 'radius' away from 'centre', row by row """
+        x, y = centre
+        return [(i, j) for j in range(max(0, y - radius), min(self.h, y + radius + 1))
+                       for i in range(max(0, x - radius), min(self.w, x + radius + 1))]
+
+    def expected(self, cell, centre):
+        """ Value of 'cell' if the item is on 'centre', None when it is out of its rings """
+        return self.ring_values.get(chebyshev(cell, centre))
+
+    def is_consistent(self, centre, cell, value, strict=True):
+        """ A cell in the rings of another item (overlapping stamps) tells nothing, neither does a cell out of the
+        rings of 'centre', which may belong to another item of the same kind """
+        expected = self.expected(cell, centre)
+        if expected is None or value == expected:
+            return True
+        if strict:
+            return value in self.foreign
+        return expected != 1.0 and value not in BACKGROUND_VALUES
+
+    def observe(self, belief):
+        """ Cells of the area whose value became known since the last call, with their value """
+        values = [(cell, belief.value_of(cell)) for cell in self.unobserved]
+        self.unobserved = [cell for cell, value in values if value == UNKNOWN_VALUE]
+        return [(cell, value) for cell, value in values if value != UNKNOWN_VALUE]
+
+    def update(self, belief):
+        """ Keep the candidates consistent with the values of the belief grid, testing only the cells observed since
+        the last update. Return the number of candidates """
+        observed = self.observe(belief)
+        if self.strict:
+            candidates = [centre for centre in self.candidates
+                          if all(self.is_consistent(centre, cell, value) for cell, value in observed)]
+            if candidates:
+                self.candidates = candidates
+                return len(candidates)
+            self.strict = False
+            self.candidates = list(self.initial)
+            self.unobserved = list(self.area)   #every value observed so far, in the relaxed mode
+            observed = self.observe(belief)
+        self.candidates = [centre for centre in self.candidates
+                           if all(self.is_consistent(centre, cell, value, False) for cell, value in observed)]
+        return len(self.candidates)
+
+    def best_probe(self, position, belief):
+        """ Unobserved cell whose reading leaves the fewest candidates on average, the closest one on ties. None if no
+        reading can tell the candidates apart """
+        best, best_key = None, None
+        for cell in self.unobserved:
+            if belief.value_of(cell) != UNKNOWN_VALUE:
+                continue
+            groups = {}
+            for centre in self.candidates:
+                value = self.expected(cell, centre)
+                groups[value] = groups.get(value, 0) + 1
+            key = (sum(n*n for n in groups.values()), chebyshev(position, cell))
+            if best_key is None or key < best_key:
+                best, best_key = cell, key
+        if best is None or (len(self.candidates) > 1 and best_key[0] == len(self.candidates)**2):
+            return None
+        return best
+
+    def next_cell(self, position, belief):
+        """ Cell to go to: the item if it is known, otherwise the most informative probe """
+        if len(self.candidates) == 1:
+            return self.candidates[0]
+        self.nb_probes += 1
+        return self.best_probe(position, belief)
@@ -13,6 +13,17 @@ MOVE = 2
 GET_NB_CONNECTED_AGENTS = 3
 GET_NB_AGENTS = 4
 GET_ITEM_OWNER = 5
+HELLO = 6   #negotiate the wire protocol right after the connection (see protocol.py)
+MOVE_BATCH = 7  #execute a list of moves in a single request and get back the visited cells
+GAME_START = 8  #sent by the server to every agent as soon as the last one is connected
+
+PROTOCOL_VERSION = 1    #version of the binary wire protocol
+
+""" MOVE_BATCH STOP CONDITIONS (can be combined with |) """
+STOP_NEVER = 0
+STOP_ON_NON_ZERO = 1    #stop as soon as the agent enters a cell whose value is not 0
+STOP_ON_OBSTACLE_NEIGHBOR = 2   #stop as soon as the agent enters a cell next to an obstacle
+STOP_ON_TARGET = 4  #stop as soon as the agent enters a cell whose value is 1 (key, box or obstacle)
 
 """ ALLOWED MOVES """
 STAND = 0   #do not move
@@ -65,12 +76,16 @@ COUNTERCLOCKWISE_DIRECTION_INDEX = {
 KEY_DISCOVERED = 1  #inform other agents that you discovered a key
 BOX_DISCOVERED = 2
 COMPLETED = 3   #inform other agents that you discovered your key and you reached your own box
+REGION_CLAIM = 4    #inform other agents of your position, the map is split between the exploring agents (see explorer.py)
+REGION_RELEASE = 5  #inform other agents that you stop exploring, your region is shared between them
+OBSERVATIONS = 6    #share the cells you observed since your previous broadcast (see observations.py)
 
 """ GAME """
 GAME_ID = -1    #id of the game when it sends a message to an agent
 KEY_NEIGHBOUR_PERCENTAGE = 0.5  #value of an adjacent cell to a key
 BOX_NEIGHBOUR_PERCENTAGE = 0.6  #value of an adjacent cell to a key
 OBSTACLE_NEIGHBOUR_PERCENTAGE = 0.35
+MAX_REPLANS = 3 #an agent gives up a point of interest after replanning that many times without reaching it
 KEY_TYPE = 0    #one of the types of item that is output by the 'Get item owner' request
 BOX_TYPE = 1
 
@@ -80,6 +95,11 @@ WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
 RED = (255, 0, 0)
 GREEN = (0, 255, 0)
+MIN_CELL_SIZE_GRID = 4  #smaller cells (large maps) are drawn without grid lines
+MIN_CELL_SIZE_TEXT = 20 #smaller cells are drawn without cell values nor agent numbers
+MIN_CELL_SIZE_DETAIL = 4   #smaller cells are drawn as a heat map of the cell values, without icons
+HEAT_COLOR = (230, 60, 0)   #color of the cells of value 1 in the heat map
+AGENT_MARKER_SIZE = 7   #side in pixels of the agents drawn on the heat map
 CONSOLE_COLOR = {
     "RESET": "\033[0m",        # Réinitialiser les couleurs
     "BOLD": "\033[1m",         # Texte en gras
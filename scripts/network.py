@@ -5,14 +5,25 @@ __license__ = "Apache License 2.0"
 __version__ = "1.0.0"
 
 import socket, pickle
+from concurrent.futures import Future
+from itertools import count
+from threading import Lock
+from protocol import Channel, hello_request, is_hello_ack
+from my_constants import BROADCAST_MSG
 
 
 class Network:
     """ Class that is used by the agent to communicate with the server """
-    def __init__(self, server_ip="localhost"):
+    def __init__(self, server_ip="localhost", protocol="auto"):
         self.client = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.conf = (server_ip, 5555)
+        self.channel = Channel(self.client)
+        self.pending = {}   #sequence id -> (header, future) of the requests waiting for their reply
+        self.pending_lock = Lock()
+        self.seq = count(1)
         self.id = self.connect()
+        if protocol != "legacy":
+            self.negotiate()
 
     def connect(self):
         try:
@@ -20,12 +31,48 @@ class Network:
             return pickle.loads(self.client.recv(1024))
         except Exception as e:
             raise
-    
+
+    def negotiate(self):
+        """ Ask the server to switch to the binary format, keep the legacy one if it does not support it """
+        self.channel.send(hello_request())
+        self.channel.binary = is_hello_ack(self.channel.receive())
+
     def send(self, data):
         try:
-            self.client.sendall(pickle.dumps(data))
+            self.channel.send(data)
         except Exception as e:
             print(e)
-    
+
+    def request(self, data, timeout=5):
+        """ Send a request tagged with a sequence id and block until its own reply is received.
+        Another thread must keep calling 'receive' to read the replies. Raise TimeoutError if there is no reply. """
+        future = Future()
+        with self.pending_lock:
+            seq = next(self.seq)
+            self.pending[seq] = (data["header"], future)
+        try:
+            self.send(dict(data, seq=seq))
+            return future.result(timeout)
+        finally:
+            with self.pending_lock:
+                self.pending.pop(seq, None)
+
     def receive(self):
-        return pickle.loads(self.client.recv(1024))
\ No newline at end of file
+        msg = self.channel.receive()
+        self.resolve(msg)
+        return msg
+
+    def resolve(self, msg):
+        """ Complete the pending request answered by the message, if any """
+        if not isinstance(msg, dict):
+            return
+        with self.pending_lock:
+            if "seq" in msg:
+                entry = self.pending.pop(msg["seq"], None)
+            elif msg.get("header") != BROADCAST_MSG:  #server that does not copy the sequence id: its replies come in order
+                seq = next((seq for seq, (header, _) in self.pending.items() if header == msg.get("header")), None)
+                entry = self.pending.pop(seq, None)
+            else:
+                entry = None
+        if entry is not None:
+            entry[1].set_result(msg)
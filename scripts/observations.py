@@ -0,0 +1,90 @@
+__author__ = "Aybuke Ozturk Suri, Johvany Gustave"
+__copyright__ = "Copyright 2023, IN512, IPSA 2024"
+__credits__ = ["Aybuke Ozturk Suri", "Johvany Gustave"]
+__license__ = "Apache License 2.0"
+__version__ = "1.0.0"
+
+""" Observations shared between the agents.
+
+An agent broadcasts the cells it observed since its previous broadcast, as a delta holding the class of each cell
+(belief.CELL_CLASSES). The bounding box of the cells is scanned row by row and run-length encoded: each run is a LEB128
+varint of (length << 3 | class), the cells that are not part of the delta having the UNKNOWN class. The agents move
+along thin lines, so the box is mostly made of long UNKNOWN runs and a delta takes about one or two bytes per cell.
+"""
+
+import struct
+import numpy as np
+
+from belief import CLASS_CODE
+
+
+BOX = struct.Struct("!HHHH")    #x, y, width and height of the bounding box of the cells
+CLASS_BITS = 3  #the 8 classes of belief.CELL_CLASSES
+UNKNOWN_CODE = CLASS_CODE["UNKNOWN"]
+
+
+def encode_delta(cells, codes):
+    """ Run-length encoding of the classes 'codes' of the (x, y) 'cells' """
+    xs, ys = np.array([cell[0] for cell in cells]), np.array([cell[1] for cell in cells])
+    x0, y0 = int(xs.min()), int(ys.min())
+    w, h = int(xs.max()) - x0 + 1, int(ys.max()) - y0 + 1
+    box = np.full(w * h, UNKNOWN_CODE, dtype=np.int8)
+    box[(ys - y0) * w + (xs - x0)] = codes
+    starts = np.flatnonzero(np.r_[True, box[1:] != box[:-1]])   #first cell of each run
+    lengths = np.diff(np.r_[starts, len(box)])
+    data = bytearray(BOX.pack(x0, y0, w, h))
+    for length, code in zip(lengths.tolist(), box[starts].tolist()):
+        value = length << CLASS_BITS | code
+        while value >= 0x80:
+            data.append(value & 0x7F | 0x80)
+            value >>= 7
+        data.append(value)
+    return bytes(data)
+
+
+def decode_delta(data):
+    """ (x, y) and class of the cells of a delta produced by 'encode_delta' """
+    x0, y0, w, _ = BOX.unpack_from(data)
+    cells = []
+    index, offset, shift, value = 0, BOX.size, 0, 0
+    for byte in data[offset:]:
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if byte & 0x80:
+            continue
+        length, code = value >> CLASS_BITS, value & ((1 << CLASS_BITS) - 1)
+        if code != UNKNOWN_CODE:
+            cells.extend(((x0 + i % w, y0 + i // w), code) for i in range(index, index + length))
+        index += length
+        shift, value = 0, 0
+    return cells
+
+
+class ObservationLog:
+    """ Cells observed by an agent since its last broadcast. A delta is ready every 'interval' moves, or sooner when
+    'max_cells' cells are waiting, so that a message stays small """
+    def __init__(self, interval=20, max_cells=128):
+        self.interval = interval
+        self.max_cells = max_cells
+        self.cells = {}     #(x, y) -> class
+        self.nb_moves = 0   #since the last delta
+        self.nb_deltas = 0
+        self.nb_bytes = 0
+
+    def add(self, cell, code):
+        self.cells[cell] = code
+
+    def moved(self, nb_moves=1):
+        self.nb_moves += nb_moves
+
+    def is_ready(self):
+        return bool(self.cells) and (self.nb_moves >= self.interval or len(self.cells) >= self.max_cells)
+
+    def flush(self):
+        """ Encoded delta of the waiting cells, which are then forgotten """
+        data = encode_delta(list(self.cells), list(self.cells.values()))
+        self.cells = {}
+        self.nb_moves = 0
+        self.nb_deltas += 1
+        self.nb_bytes += len(data)
+        return data
@@ -0,0 +1,150 @@
+__author__ = "Aybuke Ozturk Suri, Johvany Gustave"
+__copyright__ = "Copyright 2023, IN512, IPSA 2024"
+__credits__ = ["Aybuke Ozturk Suri", "Johvany Gustave"]
+__license__ = "Apache License 2.0"
+__version__ = "1.0.0"
+
+""" Outbound queues of the servers.
+
+Every client gets a bounded queue of already serialized messages (OverflowQueue). The threaded server sends them from
+a writer thread of the client (OutboundQueue), so that a slow agent only delays its own messages; the asyncio server
+only queues them while the write buffer of the transport is full (see async_server.py). Replies are never dropped,
+neither are the broadcasts that an agent cannot rebuild (discoveries, completed missions, observation deltas, region
+releases). When the queue is full, the position announcements (REGION_CLAIM) are handled with one of the
+OVERFLOW_POLICIES:
+    block:       wait until the queue has room (the behaviour of a blocking send, limited to the full queue)
+    drop_oldest: remove the oldest queued announcement
+    drop_newest: discard the new announcement
+    coalesce:    remove the queued announcement of the same agent, otherwise the oldest one
+"""
+
+from collections import deque
+from threading import Thread, Condition
+from my_constants import REGION_CLAIM
+
+
+OVERFLOW_POLICIES = ("block", "drop_oldest", "drop_newest", "coalesce")
+
+
+def coalesce_key(msg):
+    """ Broadcasts with the same key announce the same thing, only the latest one is worth sending. None for the
+    broadcasts that must all be delivered """
+    if msg.get("type") != REGION_CLAIM or "nav_state" in msg:
+        return None
+    return (REGION_CLAIM, msg.get("owner"))
+
+
+class OverflowQueue:
+    """ Bounded queue of the bytes to send to one client, with the overflow policy of the broadcasts """
+    def __init__(self, max_size=256, policy="drop_oldest"):
+        if policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {policy}")
+        self.max_size = max_size
+        self.policy = policy
+        self.items = deque()    #[data, key] pairs, key is None for the messages that cannot be dropped
+        self.nb_sent = 0
+        self.nb_dropped = 0
+        self.nb_coalesced = 0
+        self.max_depth = 0
+
+    def add(self, data, key=None):
+        """ Queue serialized bytes. Messages with a 'key' are broadcasts that can be dropped or coalesced, the others
+        (replies) are always queued. With the 'block' policy, waiting for room is left to the caller. Return False if
+        the message was dropped """
+        if key is not None and self.is_full() and self.policy != "block":
+            if self.policy == "drop_newest":
+                self.nb_dropped += 1
+                return False
+            elif self.policy == "coalesce" and self.remove(key):
+                self.nb_coalesced += 1  #the new announcement goes last, after the messages queued since the old one
+            elif not self.drop_oldest():
+                self.nb_dropped += 1    #only replies are queued, the broadcast is the one that goes
+                return False
+        self.items.append([data, key])
+        self.max_depth = max(self.max_depth, len(self.items))
+        return True
+
+    def is_full(self):
+        return len(self.items) >= self.max_size
+
+    def remove(self, key):
+        """ Remove the queued broadcast having the same key, return False if there is none """
+        for item in self.items:
+            if item[1] == key:
+                self.items.remove(item)
+                return True
+        return False
+
+    def drop_oldest(self):
+        """ Remove the oldest queued broadcast, return False if there is none """
+        for item in self.items:
+            if item[1] is not None:
+                self.items.remove(item)
+                self.nb_dropped += 1
+                return True
+        return False
+
+    def stats(self):
+        """ Counters of the queue """
+        return {"depth": len(self.items), "max_depth": self.max_depth, "sent": self.nb_sent, "dropped": self.nb_dropped, "coalesced": self.nb_coalesced}
+
+
+class OutboundQueue(OverflowQueue):
+    """ Bounded queue of the bytes to send to one client, drained by its own writer thread """
+    def __init__(self, channel, max_size=256, policy="drop_oldest"):
+        super().__init__(max_size, policy)
+        self.channel = channel
+        self.cond = Condition()
+        self.closed = False
+        self.writer = Thread(target=self.write_loop, daemon=True)
+        self.writer.start()
+
+    @property
+    def binary(self):
+        return self.channel.binary
+
+    def put(self, data, key=None):
+        """ Queue serialized bytes (see OverflowQueue.add), waiting for room with the 'block' policy. Return False if
+        the message was dropped """
+        with self.cond:
+            if self.closed:
+                return False
+            if key is not None and self.policy == "block":
+                while self.is_full() and not self.closed:
+                    self.cond.wait()
+                if self.closed:
+                    return False
+            queued = self.add(data, key)
+            self.cond.notify_all()
+            return queued
+
+    def write_loop(self):
+        """ Send the queued messages in order until the queue is closed and empty """
+        while True:
+            with self.cond:
+                while not self.items and not self.closed:
+                    self.cond.wait()
+                if not self.items:
+                    break
+                data, _ = self.items.popleft()
+                self.cond.notify_all()  #wake up the senders waiting for room
+            try:
+                self.channel.sock.sendall(data)
+                self.nb_sent += 1
+            except OSError:
+                with self.cond:
+                    self.closed = True
+                    self.items.clear()
+                break
+
+    def close(self, timeout=1):
+        """ Stop accepting messages, let the writer send the queued ones (at most 'timeout' seconds) and close the socket """
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        self.writer.join(timeout)
+        self.channel.close()
+
+    def stats(self):
+        with self.cond:
+            return super().stats()
@@ -0,0 +1,103 @@
+__author__ = "Aybuke Ozturk Suri, Johvany Gustave"
+__copyright__ = "Copyright 2023, IN512, IPSA 2024"
+__credits__ = ["Aybuke Ozturk Suri", "Johvany Gustave"]
+__license__ = "Apache License 2.0"
+__version__ = "1.0.0"
+
+""" Path planning on the map known by an agent.
+
+Every move (straight or diagonal) counts for one, so without any known obstacle the straight diagonal-then-straight
+line is already a shortest path. The planner only runs A* (8-connected, Chebyshev heuristic) when that line crosses a
+costly cell. The plans are kept in an LRU cache keyed by (start, goal, map version), the version changing each time
+the cost of a cell changes.
+"""
+
+import heapq
+from collections import OrderedDict
+
+from my_constants import *
+
+
+MOVES = {LEFT: (-1, 0), RIGHT: (1, 0), UP: (0, -1), DOWN: (0, 1), UP_LEFT: (-1, -1), UP_RIGHT: (1, -1), DOWN_LEFT: (-1, 1), DOWN_RIGHT: (1, 1)}
+DIRECTION_OF = {move: direction for direction, move in MOVES.items()}
+FREE_COST = 1
+OBSTACLE_COST = 10  #cost to enter a known obstacle cell (neighbour or centre). Not blocked: items may be next to one
+
+
+def straight_line(start, goal):
+    """ Diagonal moves then straight ones, as the agent used to go """
+    commands, path = [], [start]
+    x, y = start
+    while (x, y) != goal:
+        dx = (goal[0] > x) - (goal[0] < x)
+        dy = (goal[1] > y) - (goal[1] < y)
+        x, y = x + dx, y + dy
+        commands.append(DIRECTION_OF[(dx, dy)])
+        path.append((x, y))
+    return commands, path
+
+
+class GridPlanner:
+    """ A* planner over the 8-connected grid with a cost to enter each cell """
+    def __init__(self, w, h, cache_size=256):
+        self.w, self.h = w, h
+        self.cost = [[FREE_COST]*w for _ in range(h)]   #cost[y][x], lists are faster than numpy for single cells
+        self.version = 0    #incremented each time a cost changes, part of the cache key
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+        self.nb_hits = 0
+        self.nb_searches = 0
+
+    def set_cost(self, x, y, cost):
+        if self.cost[y][x] != cost:
+            self.cost[y][x] = cost
+            self.version += 1
+
+    def plan(self, start, goal):
+        """ Cheapest path from 'start' to 'goal'. Return the directions to follow and the visited cells, 'start'
+        included, like Agent.generate_commands """
+        key = (start, goal, self.version)
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            self.nb_hits += 1
+            commands, path = self.cache[key]
+        else:
+            commands, path = straight_line(start, goal)
+            if any(self.cost[y][x] != FREE_COST for x, y in path[1:]):
+                commands, path = self.search(start, goal)
+            self.cache[key] = (commands, path)
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return list(commands), list(path)   #the agent consumes them
+
+    def search(self, start, goal):
+        """ A* with the Chebyshev distance, admissible since every move costs at least FREE_COST """
+        self.nb_searches += 1
+        cost, w, h = self.cost, self.w, self.h
+        gx, gy = goal
+        g = {start: 0}
+        parent = {start: None}
+        heap = [(max(abs(gx - start[0]), abs(gy - start[1])), 0, 0, start)]    #(f, h, g, cell)
+        while heap:
+            _, _, g_cell, cell = heapq.heappop(heap)
+            if cell == goal:
+                break
+            if g_cell > g[cell]:
+                continue    #already reached with a lower cost
+            x, y = cell
+            for dx, dy in MOVES.values():
+                nx, ny = x + dx, y + dy
+                if 0 <= nx < w and 0 <= ny < h:
+                    g_next = g_cell + cost[ny][nx]
+                    if g_next < g.get((nx, ny), g_next + 1):
+                        g[(nx, ny)] = g_next
+                        parent[(nx, ny)] = cell
+                        h_next = max(abs(gx - nx), abs(gy - ny))
+                        heapq.heappush(heap, (g_next + h_next, h_next, g_next, (nx, ny)))    #ties: closest to the goal first
+
+        path = [goal]
+        while parent[path[-1]] is not None:
+            path.append(parent[path[-1]])
+        path.reverse()
+        commands = [DIRECTION_OF[(b[0] - a[0], b[1] - a[1])] for a, b in zip(path, path[1:])]
+        return commands, path
@@ -0,0 +1,341 @@
+__author__ = "Aybuke Ozturk Suri, Johvany Gustave"
+__copyright__ = "Copyright 2023, IN512, IPSA 2024"
+__credits__ = ["Aybuke Ozturk Suri", "Johvany Gustave"]
+__license__ = "Apache License 2.0"
+__version__ = "1.0.0"
+
+""" Wire protocol shared by the server and the agents.
+
+Two formats are supported on a connection:
+    - legacy: one pickled dict per 'send' (original format), several of them may arrive in a single 'recv'
+    - binary: length-prefixed frames. The payload starts with a codec code followed by a fixed struct layout
+      for the frequent messages (MOVE, GET_DATA, GET_ITEM_OWNER, BROADCAST_MSG, MOVE_BATCH and the observations
+      shared by the agents). Any other message is sent
+      as a JSON payload, so pickle is never run on data coming from the network once the binary format is used.
+
+A request may carry a "seq" id that the server copies in its reply, so that a client can match each reply with its
+request (see Network.request).
+
+The format is negotiated right after the connection: the client sends a pickled HELLO request, a server that
+knows the binary format acknowledges it and both sides switch. An older server answers None and the client keeps
+the legacy format.
+"""
+
+import io, json, pickle, socket, struct
+import argparse
+from threading import Thread
+from time import perf_counter
+
+from my_constants import *
+
+
+FRAME_HEADER = struct.Struct("!I")  #payload length
+MAX_FRAME_SIZE = 16 * 1024 * 1024
+GENERIC_CODE = 0    #JSON payload
+PAIR_FIELDS = {"position"}  #fields holding an (x, y) tuple, packed as two integers
+NULL_VALUE = -1     #value used to pack a nullable field that is None
+SEQ_FLAG = 0x80     #set on the codec code when the request sequence id follows it
+SEQ = struct.Struct("!I")
+
+
+class Codec:
+    """ Fixed binary layout of one message shape (header + exact set of keys) """
+    def __init__(self, code, header, fields, fmt, nullable=()):
+        self.code = code
+        self.header = header
+        self.fields = fields
+        self.nullable = set(nullable)
+        self.struct = struct.Struct("!B" + fmt)
+        self.keys = frozenset(fields) | {"header"}
+        self.plain = not (self.nullable or PAIR_FIELDS & self.keys)   #every field maps to exactly one struct value
+
+    def encode(self, msg):
+        if self.plain:
+            return self.struct.pack(self.code, *[msg[field] for field in self.fields])
+        values = []
+        for field in self.fields:
+            value = msg[field]
+            if field in PAIR_FIELDS:
+                values.extend(value)
+            elif value is None and field in self.nullable:
+                values.append(NULL_VALUE)
+            else:
+                values.append(value)
+        return self.struct.pack(self.code, *values)
+
+    def decode(self, payload):
+        values = self.struct.unpack(payload)
+        if self.plain:
+            msg = dict(zip(self.fields, values[1:]))
+            msg["header"] = self.header
+            return msg
+        values = iter(values[1:])
+        msg = {"header": self.header}
+        for field in self.fields:
+            if field in PAIR_FIELDS:
+                msg[field] = (next(values), next(values))
+            else:
+                value = next(values)
+                msg[field] = None if (field in self.nullable and value == NULL_VALUE) else value
+        return msg
+
+
+class MoveBatchRequestCodec:
+    """ MOVE_BATCH request: fixed prefix followed by one byte per direction """
+    def __init__(self, code):
+        self.code = code
+        self.header = MOVE_BATCH
+        self.keys = frozenset(("sender", "header", "directions", "stop_on"))
+        self.struct = struct.Struct("!BhBI")
+
+    def encode(self, msg):
+        directions = msg["directions"]
+        return self.struct.pack(self.code, msg["sender"], msg["stop_on"], len(directions)) + bytes(directions)
+
+    def decode(self, payload):
+        _, sender, stop_on, count = self.struct.unpack_from(payload)
+        directions = list(payload[self.struct.size:self.struct.size + count])
+        return {"sender": sender, "header": self.header, "directions": directions, "stop_on": stop_on}
+
+
+class MoveBatchReplyCodec:
+    """ MOVE_BATCH reply: final position followed by the (x, y) of each visited cell, then their values """
+    def __init__(self, code):
+        self.code = code
+        self.header = MOVE_BATCH
+        self.keys = frozenset(("sender", "header", "x", "y", "cell_val", "trajectory", "values"))
+        self.struct = struct.Struct("!BhiidI")
+
+    def encode(self, msg):
+        count = len(msg["trajectory"])
+        coords = [coord for cell in msg["trajectory"] for coord in cell]
+        return (self.struct.pack(self.code, msg["sender"], msg["x"], msg["y"], msg["cell_val"], count)
+                + struct.pack(f"!{2*count}i{count}d", *coords, *msg["values"]))
+
+    def decode(self, payload):
+        _, sender, x, y, cell_val, count = self.struct.unpack_from(payload)
+        data = struct.unpack_from(f"!{2*count}i{count}d", payload, self.struct.size)
+        trajectory = list(zip(data[:2*count:2], data[1:2*count:2]))
+        return {"sender": sender, "header": self.header, "x": x, "y": y, "cell_val": cell_val, "trajectory": trajectory, "values": list(data[2*count:])}
+
+
+class ObservationsCodec:
+    """ OBSERVATIONS broadcast: fixed prefix followed by the encoded delta (see observations.py) """
+    def __init__(self, code):
+        self.code = code
+        self.header = BROADCAST_MSG
+        self.keys = frozenset(("sender", "header", "type", "owner", "delta"))
+        self.struct = struct.Struct("!BhBhI")
+
+    def encode(self, msg):
+        return self.struct.pack(self.code, msg["sender"], msg["type"], msg["owner"], len(msg["delta"])) + bytes(msg["delta"])
+
+    def decode(self, payload):
+        _, sender, type, owner, size = self.struct.unpack_from(payload)
+        delta = payload[self.struct.size:self.struct.size + size]
+        return {"sender": sender, "header": self.header, "type": type, "owner": owner, "delta": delta}
+
+
+CODECS = [
+    Codec(1, MOVE, ("sender", "direction"), "hB"),
+    Codec(2, MOVE, ("sender", "x", "y", "cell_val"), "hiid"),
+    Codec(3, GET_DATA, (), ""),
+    Codec(4, GET_DATA, ("sender",), "h"),
+    Codec(5, GET_DATA, ("sender", "agent_id", "x", "y", "w", "h", "cell_val"), "hhiiiid"),
+    Codec(6, GET_ITEM_OWNER, ("sender",), "h"),
+    Codec(7, GET_ITEM_OWNER, ("sender", "owner"), "hh", nullable=("owner",)),
+    Codec(8, GET_ITEM_OWNER, ("sender", "owner", "type"), "hhb"),
+    Codec(9, BROADCAST_MSG, ("sender", "type", "position", "owner"), "hbiih"),
+    Codec(10, BROADCAST_MSG, ("sender", "nav_state"), "hb"),
+    MoveBatchRequestCodec(11),
+    MoveBatchReplyCodec(12),
+    ObservationsCodec(13),
+]
+CODECS_BY_CODE = {codec.code: codec for codec in CODECS}
+CODECS_BY_SHAPE = {(codec.header, codec.keys): codec for codec in CODECS}
+
+
+def _json_default(value):
+    """ Convert numpy scalars (e.g. the cell values read from 'map_real') to python values """
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not serializable")
+
+
+_codec_cache = {}    #(header, keys in insertion order) -> codec or None
+
+
+def find_codec(msg):
+    """ Fixed layout matching the header and the keys of the message, None if there is none """
+    shape = (msg.get("header"), tuple(msg))
+    try:
+        return _codec_cache[shape]
+    except KeyError:
+        codec = _codec_cache[shape] = CODECS_BY_SHAPE.get((shape[0], frozenset(msg)))
+        return codec
+    except TypeError:   #unhashable header
+        return None
+
+
+def encode(msg):
+    """ Serialize a message into a binary payload (without the length header) """
+    seq = msg.get("seq")
+    body = {key: value for key, value in msg.items() if key != "seq"} if seq is not None else msg
+    codec = find_codec(body)
+    if codec is not None:
+        try:
+            payload = codec.encode(body)
+            if seq is None:
+                return payload
+            return bytes((payload[0] | SEQ_FLAG,)) + SEQ.pack(seq) + payload[1:]
+        except (struct.error, TypeError, ValueError):
+            pass    #a value does not fit the fixed layout, use the generic format
+    return bytes((GENERIC_CODE,)) + json.dumps(msg, default=_json_default, separators=(",", ":")).encode()
+
+
+def codec_of(code):
+    """ Codec of a payload code, ValueError if there is none """
+    codec = CODECS_BY_CODE.get(code)
+    if codec is None:
+        raise ValueError(f"Unknown codec code: {code}")
+    return codec
+
+
+def decode(payload):
+    """ Deserialize a binary payload produced by 'encode' """
+    code = payload[0]
+    if code == GENERIC_CODE:
+        return json.loads(payload[1:])
+    if code & SEQ_FLAG:
+        seq, = SEQ.unpack_from(payload, 1)
+        msg = codec_of(code & ~SEQ_FLAG).decode(bytes((code & ~SEQ_FLAG,)) + payload[1 + SEQ.size:])
+        msg["seq"] = seq
+        return msg
+    return codec_of(code).decode(payload)
+
+
+def frame(msg):
+    """ Serialize a message and prepend its length """
+    payload = encode(msg)
+    return FRAME_HEADER.pack(len(payload)) + payload
+
+
+class Channel:
+    """ Message oriented wrapper around a connected socket, in the legacy or the binary format """
+    def __init__(self, sock, binary=False):
+        self.sock = sock
+        self.binary = binary
+        self.buffer = bytearray()   #bytes received but not yet decoded
+
+    def serialize(self, msg):
+        """ Bytes to write on the socket for the given message """
+        return frame(msg) if self.binary else pickle.dumps(msg)
+
+    def send(self, msg):
+        self.sock.sendall(self.serialize(msg))
+
+    def receive(self):
+        while True:
+            if not self.binary and self.buffer:    #pickles are self-delimited, several of them may be in the buffer
+                stream = io.BytesIO(self.buffer)
+                try:
+                    msg = pickle.load(stream)
+                    del self.buffer[:stream.tell()]
+                    return msg
+                except (EOFError, pickle.UnpicklingError):
+                    pass    #incomplete pickle, wait for the rest
+            elif self.binary and len(self.buffer) >= FRAME_HEADER.size:
+                size, = FRAME_HEADER.unpack_from(self.buffer)
+                if size == 0 or size > MAX_FRAME_SIZE:
+                    raise ValueError(f"Invalid frame size: {size}")
+                end = FRAME_HEADER.size + size
+                if len(self.buffer) >= end:
+                    payload = bytes(self.buffer[FRAME_HEADER.size:end])
+                    del self.buffer[:end]
+                    return decode(payload)
+            data = self.sock.recv(65536)
+            if not data:
+                raise EOFError("Connection closed by peer")
+            self.buffer += data
+
+    def close(self):
+        self.sock.close()
+
+
+def hello_request():
+    """ First message sent by a client supporting the binary format """
+    return {"header": HELLO, "protocol": PROTOCOL_VERSION}
+
+
+def hello_ack():
+    """ Reply of a server accepting to switch to the binary format """
+    return {"sender": GAME_ID, "header": HELLO, "protocol": PROTOCOL_VERSION}
+
+
+def is_hello_ack(reply):
+    """ Check if the server agreed to switch to the binary format """
+    return isinstance(reply, dict) and reply.get("header") == HELLO and reply.get("protocol") == PROTOCOL_VERSION
+
+
+SAMPLE_MESSAGES = {
+    "MOVE request": {"sender": 1, "header": MOVE, "direction": DOWN_RIGHT},
+    "MOVE reply": {"sender": GAME_ID, "header": MOVE, "x": 12, "y": 7, "cell_val": 0.35},
+    "GET_DATA request": {"sender": 1, "header": GET_DATA},
+    "GET_DATA reply": {"sender": GAME_ID, "header": GET_DATA, "agent_id": 1, "x": 12, "y": 7, "w": 35, "h": 30, "cell_val": 0.25},
+    "GET_ITEM_OWNER reply": {"sender": GAME_ID, "header": GET_ITEM_OWNER, "owner": 2, "type": KEY_TYPE},
+    "BROADCAST_MSG": {"sender": 1, "header": BROADCAST_MSG, "type": KEY_TYPE, "position": (12, 7), "owner": 2},
+    "MOVE_BATCH request": {"sender": 1, "header": MOVE_BATCH, "directions": [DOWN_RIGHT]*10, "stop_on": STOP_ON_NON_ZERO},
+    "OBSERVATIONS": {"sender": 1, "header": BROADCAST_MSG, "type": OBSERVATIONS, "owner": 1, "delta": bytes(40)},
+    "MOVE_BATCH reply": {"sender": GAME_ID, "header": MOVE_BATCH, "x": 22, "y": 17, "cell_val": 0.5, "trajectory": [(12 + i, 7 + i) for i in range(1, 11)], "values": [0.0]*9 + [0.5]},
+}
+
+
+def bench_codec(iterations):
+    """ Encode/decode cost of each sample message in both formats """
+    print(f"{'message':<22}{'format':<8}{'bytes':>7}{'encode (us)':>14}{'decode (us)':>14}")
+    for name, msg in SAMPLE_MESSAGES.items():
+        for fmt, dumps, loads in (("pickle", pickle.dumps, pickle.loads), ("binary", encode, decode)):
+            data = dumps(msg)
+            start = perf_counter()
+            for _ in range(iterations):
+                dumps(msg)
+            encode_time = (perf_counter() - start) / iterations * 1e6
+            start = perf_counter()
+            for _ in range(iterations):
+                loads(data)
+            decode_time = (perf_counter() - start) / iterations * 1e6
+            print(f"{name:<22}{fmt:<8}{len(data):>7}{encode_time:>14.2f}{decode_time:>14.2f}")
+
+
+def bench_connection(nb_messages):
+    """ Request/reply round trips per second on a single local connection """
+    request, reply = SAMPLE_MESSAGES["MOVE request"], SAMPLE_MESSAGES["MOVE reply"]
+    for binary in (False, True):
+        client_sock, server_sock = socket.socketpair()
+        client, server = Channel(client_sock, binary), Channel(server_sock, binary)
+
+        def echo():
+            for _ in range(nb_messages):
+                server.receive()
+                server.send(reply)
+        Thread(target=echo, daemon=True).start()
+
+        start = perf_counter()
+        for _ in range(nb_messages):
+            client.send(request)
+            client.receive()
+        elapsed = perf_counter() - start
+        client.close()
+        server.close()
+        print(f"{'binary' if binary else 'pickle':<8}{nb_messages / elapsed:>12.0f} round trips/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro benchmark of the wire protocol")
+    parser.add_argument("-n", "--iterations", help="Number of encode/decode per message", type=int, default=100000)
+    parser.add_argument("-m", "--messages", help="Number of round trips on the connection", type=int, default=20000)
+    args = parser.parse_args()
+
+    bench_codec(args.iterations)
+    print()
+    bench_connection(args.messages)
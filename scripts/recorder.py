@@ -0,0 +1,289 @@
+__author__ = "Aybuke Ozturk Suri, Johvany Gustave"
+__copyright__ = "Copyright 2023, IN512, IPSA 2024"
+__credits__ = ["Aybuke Ozturk Suri", "Johvany Gustave"]
+__license__ = "Apache License 2.0"
+__version__ = "1.0.0"
+
+""" Binary event log of an episode, and its replay.
+
+The log starts with the magic bytes, the size of a JSON header and the header itself: the map (or scenario), the
+number of agents and the obstacles placed, so that the replay rebuilds the same game. Then come fixed-size records
+(RECORD, 16 bytes):
+
+    time: seconds since the start of the recording, float32
+    kind: REQUESTS_RECORD (up to 8 requests of the agent), BROADCAST_RECORD ('code' is the type of the message) or
+          COMPLETED_RECORD (the agent completed its mission)
+    code, agent, x, y: uint8, uint16, uint16, uint16
+    value: float32
+
+The requests take the 8 bytes of 'x', 'y' and 'value', after HEAD. A request is logged as a single byte: its direction for
+a move (NO_DIRECTION if the game ignored it), REQUEST_CODES + its header for the other ones, NO_CODE for an empty
+place. A batch of moves is its header followed by the directions the game applied. The replay moves the agents again
+from the directions.
+
+Recording only appends to a bytearray of the agent (its stream), in a single call so that no lock is needed: the bytes
+of the requests, or ENTRY_CODE followed by a record without its time. A clock thread takes what the streams received
+every 'tick' seconds and packs it into records of this time, then writes the records under the lock once they fill
+'buffer_size' records or 'flush_interval' seconds after the last write, so that nothing stays in memory longer than
+that, even for an agent that stopped sending requests. The records of each agent keep their order, the replay sorts
+them by time (stable), then replays them once to keep a keyframe every 'keyframe_every' records: positions, completed
+missions and number of cells visited by each agent. A seek starts from the last keyframe before the record it goes to.
+
+    python scripts/recorder.py episode.log -s 10 -g true
+"""
+
+import json, math, struct, argparse
+from bisect import bisect_right
+from threading import Event, Lock, Thread
+from time import monotonic, perf_counter, sleep
+import numpy as np
+import pygame
+
+from game import Game, VisitedCells
+from gui import GUI
+from clock import make_clock
+from my_constants import COMPLETED, MOVE_BATCH
+
+
+MAGIC = b"IN512LOG"
+HEADER_SIZE = struct.Struct("<I")
+RECORD = struct.Struct("<fBBHHHf")
+ENTRY = struct.Struct("<BBBHHHf")   #ENTRY_CODE and a RECORD without its time, in a stream
+TIME = struct.Struct("<f")
+HEAD = struct.Struct("<fBBH")   #time, kind, code and agent of a RECORD
+RECORD_DTYPE = np.dtype([("time", "<f4"), ("kind", "u1"), ("code", "u1"), ("agent", "<u2"), ("x", "<u2"), ("y", "<u2"), ("value", "<f4")])
+REQUESTS_RECORD, BROADCAST_RECORD, COMPLETED_RECORD = range(3)   #kinds of record
+NO_DIRECTION = 9    #code of a move in a direction that does not exist
+REQUEST_CODES = 16  #code of the header 0, for the requests other than moves
+ENTRY_CODE = 254    #start of a record in a stream
+NO_CODE = 255   #code of a header or a type that does not fit in a byte, and of an empty place
+MAX_HEADER = ENTRY_CODE - REQUEST_CODES
+BATCH_REQUEST = bytes([REQUEST_CODES + MOVE_BATCH])
+DIRECTIONS = bytes(code if code < NO_DIRECTION else NO_DIRECTION for code in range(256))    #translation of the directions of a batch
+EMPTY = bytes([NO_CODE])*8
+
+
+class Recorder:
+    """ Event log of a game, written to 'filename' """
+    def __init__(self, filename, game, buffer_size=4096, flush_interval=1.0, tick=0.01):
+        self.game = game
+        self.streams = [bytearray() for _ in range(game.nb_agents)]     #requests of each agent since the last tick
+        self.records = bytearray()  #records not written yet, only touched under the lock
+        self.buffer_size = buffer_size * RECORD.size
+        self.flush_interval = flush_interval
+        self.completed = [False]*game.nb_agents
+        self.lock = Lock()
+        header = json.dumps({"nb_agents": game.nb_agents, "map": game.map_cfg, "obstacles": game.obstacles}).encode()
+        self.file = open(filename, "wb")
+        self.file.write(MAGIC + HEADER_SIZE.pack(len(header)) + header)
+        self.origin = monotonic()
+        self.stopped = Event()
+        self.clock = Thread(target=self.run_clock, args=(tick,), daemon=True)
+        self.clock.start()
+
+    def run_clock(self, tick):
+        flush_at = self.flush_interval
+        while not self.stopped.wait(tick):
+            now = monotonic() - self.origin
+            with self.lock:
+                self.pack(now)
+                if now >= flush_at or len(self.records) >= self.buffer_size:
+                    self.write()
+                    flush_at = now + self.flush_interval
+
+    def request(self, agent_id, header):
+        try:
+            self.streams[agent_id].append(REQUEST_CODES + header if 0 <= header < MAX_HEADER else NO_CODE)
+        except TypeError:
+            self.streams[agent_id].append(NO_CODE)
+
+    def move(self, agent_id, direction):
+        try:
+            self.streams[agent_id].append(direction if direction < NO_DIRECTION else NO_DIRECTION)
+        except (TypeError, ValueError):     #not a number, or a negative one
+            self.streams[agent_id].append(NO_DIRECTION)
+
+    def move_batch(self, agent_id, directions, count):
+        """ Log the 'count' first directions of a batch of moves, the ones the game applied """
+        try:
+            codes = bytes(directions[:count])
+        except (TypeError, ValueError):
+            codes = bytes(int(direction) if direction in range(NO_DIRECTION) else NO_DIRECTION for direction in directions[:count])
+        self.streams[agent_id].extend(BATCH_REQUEST + codes.translate(DIRECTIONS))
+
+    def entry(self, kind, code, agent_id, x, y, value=0.0):
+        try:
+            data = ENTRY.pack(ENTRY_CODE, kind, code, agent_id, x, y, value)
+        except struct.error:
+            data = ENTRY.pack(ENTRY_CODE, kind, NO_CODE, agent_id, x, y, value)
+        self.streams[agent_id].extend(data)
+
+    def broadcast(self, agent_id, msg):
+        """ Log a broadcast message, and the completion of the mission it announces """
+        agent = self.game.agents[agent_id]
+        self.entry(BROADCAST_RECORD, msg.get("type", NO_CODE), agent_id, agent.x, agent.y)
+        if msg.get("nav_state") == COMPLETED and not self.completed[agent_id]:
+            self.completed[agent_id] = True
+            self.entry(COMPLETED_RECORD, 0, agent_id, agent.x, agent.y)
+
+    def pack(self, now):
+        """ Move what the streams received into records of time 'now', with the lock held """
+        time = TIME.pack(now)
+        for agent_id, stream in enumerate(self.streams):
+            size = len(stream)
+            if not size:
+                continue
+            data = bytes(stream[:size])
+            del stream[:size]   #the requests appended meanwhile stay for the next tick
+            requests = HEAD.pack(now, REQUESTS_RECORD, 0, agent_id)
+            start = 0
+            while start < size:
+                end = data.find(ENTRY_CODE, start)
+                if end < 0:
+                    end = size
+                if start < end:     #requests, 8 per record
+                    codes = data[start:end] + EMPTY[:(start - end) % 8]
+                    self.records += requests + requests.join([codes[first:first + 8] for first in range(0, len(codes), 8)])
+                if end < size:
+                    self.records += time + data[end + 1:end + ENTRY.size]
+                start = end + ENTRY.size
+
+    def write(self):
+        """ Write the packed records, with the lock held """
+        if self.records and self.file is not None:
+            self.file.write(self.records)
+            self.file.flush()
+        self.records.clear()
+
+    def close(self):
+        """ Write the last records of every agent and close the file, once the agents stopped sending requests """
+        self.stopped.set()
+        self.clock.join()
+        with self.lock:
+            self.pack(monotonic() - self.origin)
+            self.write()
+            self.file.close()
+            self.file = None
+
+
+def read_log(filename):
+    """ Header and records (RECORD_DTYPE array) of a log """
+    with open(filename, "rb") as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{filename} is not an event log")
+        size, = HEADER_SIZE.unpack(file.read(HEADER_SIZE.size))
+        header = json.loads(file.read(size))
+        data = file.read()
+    return header, np.frombuffer(data, dtype=RECORD_DTYPE, count=len(data) // RECORD.size)  #an unfinished record is ignored
+
+
+class Replay:
+    """ Game rebuilt from a log, record by record """
+    def __init__(self, filename, keyframe_every=128):
+        self.header, records = read_log(filename)
+        self.records = records[np.argsort(records["time"], kind="stable")]
+        self.times = self.records["time"]
+        self.codes = self.records.view(np.uint8).reshape(-1, RECORD.size)[:, 8:]
+        self.nb_agents = self.header["nb_agents"]
+        self.game = Game(self.nb_agents, None, gui=False, scenario=dict(self.header["map"], obstacles=0))
+        for x, y, rotation in self.header["obstacles"]:
+            self.game.place_obstacle(x, y, rotation)
+        #Keyframes: state of the game before every 'keyframe_every' records
+        self.index, self.completed, self.keyframes = 0, [False]*self.nb_agents, []
+        for start in range(0, max(len(self.records), 1), keyframe_every):
+            self.keyframes.append((start, [(agent.x, agent.y) for agent in self.game.agents], list(self.completed), [len(path) for path in self.game.agent_paths]))
+            self.apply(start + keyframe_every)
+        self.keyframe_starts = [keyframe[0] for keyframe in self.keyframes]
+        self.orders = [path.order for path in self.game.agent_paths]  #the paths of a keyframe are the start of these ones
+        self.seek(0)
+
+    def __len__(self):
+        return len(self.records)
+
+    def seek(self, index):
+        """ State of the game before the record 'index'. The paths are new objects: a GUI already drawing the game has to
+        build its background again """
+        index = min(max(0, index), len(self.records))
+        start, positions, completed, lengths = self.keyframes[bisect_right(self.keyframe_starts, index) - 1]
+        game = self.game
+        for agent, (x, y) in zip(game.agents, positions):
+            agent.x, agent.y = x, y
+        for agent_id, length in enumerate(lengths):
+            path = VisitedCells(game.map_w, game.map_h)
+            path.order = self.orders[agent_id][:length]
+            visited = np.zeros(len(path.bits)*8, dtype=bool)
+            visited[np.frombuffer(path.order, dtype=np.uint32)] = True
+            path.bits[:] = np.packbits(visited, bitorder="little").tobytes()
+            game.agent_paths[agent_id] = path
+        self.completed, self.index = list(completed), start
+        self.apply(index)
+
+    def seek_time(self, seconds):
+        self.seek(int(np.searchsorted(self.times, seconds, side="left")))
+
+    def apply(self, end):
+        """ Replay the records up to 'end' (excluded) """
+        game = self.game
+        for index, (_, kind, code, agent, _, _, _) in enumerate(self.records[self.index:end].tolist(), self.index):
+            if kind == REQUESTS_RECORD:     #moved again by the game
+                for request in self.codes[index].tolist():
+                    if request < REQUEST_CODES:
+                        game.step(request, agent)
+            elif kind == COMPLETED_RECORD:
+                self.completed[agent] = True
+        self.index = max(self.index, end)
+
+    def play(self, speed=math.inf, gui=None):
+        """ Replay the remaining records 'speed' times faster than they were recorded, on the GUI if given (which
+        must be initialized) """
+        if self.index >= len(self.records):
+            return
+        origin, start = perf_counter(), float(self.times[self.index])
+        while self.index < len(self.records) and (gui is None or gui.running):
+            now = start + (perf_counter() - origin) * speed
+            self.apply(len(self.records) if math.isinf(now) else int(np.searchsorted(self.times, now, side="right")))
+            if gui is not None:
+                for event in pygame.event.get():
+                    gui.on_event(event)
+                gui.draw()
+                gui.clock.tick(gui.fps)
+            elif self.index < len(self.records):
+                sleep((float(self.times[self.index]) - now) / speed)
+
+    def summary(self):
+        """ Statistics of each agent up to the current record """
+        before = self.records[:self.index]
+        rows = []
+        for agent_id in range(self.nb_agents):
+            mine = before["agent"] == agent_id
+            kinds, codes = before["kind"][mine], self.codes[:self.index][mine]
+            requests = codes[kinds == REQUESTS_RECORD]
+            rows.append({"agent": agent_id + 1, "moves": int(np.count_nonzero(requests < REQUEST_CODES)),
+                         "unique_cells": len(self.game.agent_paths[agent_id]), "requests": int(np.count_nonzero((requests >= REQUEST_CODES) & (requests < NO_CODE))),
+                         "broadcasts": int(np.count_nonzero(kinds == BROADCAST_RECORD)), "completed": self.completed[agent_id]})
+        return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay an event log recorded by the server (-rec)")
+    parser.add_argument("log", help="Event log to replay", type=str)
+    parser.add_argument("-s", "--speed", help="Speed-up of the replay, 0 to replay as fast as possible", type=float, default=0)
+    parser.add_argument("-t", "--start", help="Seconds of the episode skipped before the replay starts", type=float, default=0)
+    parser.add_argument("-g", "--gui", help="Display the game window : true/false", type=str, default="false")
+    args = parser.parse_args()
+
+    replay = Replay(args.log)
+    replay.seek_time(args.start)
+    gui = None
+    if args.gui == "true":
+        gui = GUI(replay.game, clock=make_clock("fast"))
+        gui.on_init()
+    start = perf_counter()
+    replay.play(args.speed or math.inf, gui)
+    duration = perf_counter() - start
+    if gui is not None:
+        gui.on_cleanup()
+    print(f"{len(replay)} records ({float(replay.times[-1]) if len(replay) else 0:.1f} s of episode) replayed in {duration:.3f} s")
+    print(f"{'agent':>6}{'moves':>8}{'unique cells':>14}{'requests':>10}{'broadcasts':>12}{'completed':>11}")
+    for row in replay.summary():
+        print(f"{row['agent']:>6}{row['moves']:>8}{row['unique_cells']:>14}{row['requests']:>10}{row['broadcasts']:>12}{str(row['completed']):>11}")
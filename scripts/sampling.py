@@ -0,0 +1,67 @@
+__author__ = "Aybuke Ozturk Suri, Johvany Gustave"
+__copyright__ = "Copyright 2023, IN512, IPSA 2024"
+__credits__ = ["Aybuke Ozturk Suri", "Johvany Gustave"]
+__license__ = "Apache License 2.0"
+__version__ = "1.0.0"
+
+""" Sampling of the points of interest explored by the agents """
+
+import math, random
+
+
+class SpatialHash:
+    """ Points bucketed in square cells of side 'radius': the points closer than 'radius' to a position are in the 3x3
+    buckets around it """
+    def __init__(self, radius):
+        self.radius = radius
+        self.buckets = {}
+
+    def bucket(self, point):
+        return int(point[0] // self.radius), int(point[1] // self.radius)
+
+    def add(self, point):
+        self.buckets.setdefault(self.bucket(point), []).append(point)
+
+    def is_far(self, point):
+        """ True if every stored point is at least 'radius' away from 'point' """
+        bx, by = self.bucket(point)
+        for i in (bx - 1, bx, bx + 1):
+            for j in (by - 1, by, by + 1):
+                for other in self.buckets.get((i, j), ()):
+                    if math.dist(point, other) < self.radius:
+                        return False
+        return True
+
+
+def border_candidate(w, h, origin):
+    """ One random point in each border band (bottom, left, top, right), the band closest to 'origin' is discarded and
+    one of the 3 others is picked """
+    candidates = [(random.randint(0, w - 1), random.randint(h - 4, h - 1)),
+                  (random.randint(0, 4), random.randint(0, h - 1)),
+                  (random.randint(0, w - 1), random.randint(0, 4)),
+                  (random.randint(w - 4, w - 1), random.randint(0, h - 1))]
+    distances = [math.dist(origin, candidate) for candidate in candidates]
+    del candidates[distances.index(min(distances))]
+    return candidates[random.randint(0, 2)]
+
+
+def border_points(w, h, num_points, origin, min_distance=5, is_forbidden=lambda point: False, attempts_per_point=30):
+    """ Poisson-disk sampling of the border bands: points at least 'min_distance' apart and not forbidden.
+
+    The number of attempts is bounded: when a band is too crowded for the requested spacing, the spacing is halved and
+    the points already accepted are kept. Fewer points than requested are returned if even a spacing of 1 is too much.
+    """
+    points = []
+    while min_distance >= 1 and len(points) < num_points:
+        grid = SpatialHash(min_distance)
+        for point in points:
+            grid.add(point)
+        for _ in range(attempts_per_point * num_points):
+            point = border_candidate(w, h, origin)
+            if not is_forbidden(point) and grid.is_far(point):
+                points.append(point)
+                grid.add(point)
+                if len(points) == num_points:
+                    break
+        min_distance /= 2
+    return points
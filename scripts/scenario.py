@@ -0,0 +1,86 @@
+__author__ = "Aybuke Ozturk Suri, Johvany Gustave"
+__copyright__ = "Copyright 2023, IN512, IPSA 2024"
+__credits__ = ["Aybuke Ozturk Suri", "Johvany Gustave"]
+__license__ = "Apache License 2.0"
+__version__ = "1.0.0"
+
+""" Procedural scenarios.
+
+A scenario has the same layout as a map of config.json ("width", "height", "agent_i", "key_i", "box_i" with i starting
+at 1) plus "nb_agents" and "obstacles", the number of L shaped obstacles placed by the game. It can be saved as a JSON
+file and given to the server, the simulation or the load test instead of a map id.
+"""
+
+import json, random, colorsys, argparse
+import numpy as np
+
+
+ITEM_RADIUS = 2     #keys and boxes are surrounded by 2 rings of cells holding their neighbour value
+OBSTACLE_AREA = 25  #an obstacle and its neighbour cells fill a 5x5 square
+
+
+def agent_color(i, nb_agents):
+    """ Colors spread around the hue circle so that the agents can be told apart """
+    r, g, b = colorsys.hsv_to_rgb(i / nb_agents, 0.85, 0.9)
+    return [int(255*r), int(255*g), int(255*b)]
+
+
+def generate_scenario(width, height, nb_agents, obstacle_density=0.05, seed=None):
+    """ Create a scenario with random keys, boxes and agents positions.
+
+    Args:
+        width (int): Number of columns of the map.
+        height (int): Number of rows of the map.
+        nb_agents (int): Number of agents, each of them gets a key and a box.
+        obstacle_density (float, optional): Fraction of the map covered by the obstacles and their neighbour cells. Defaults to 0.05.
+        seed (int, optional): Seed of the generator, the same seed gives the same scenario. Defaults to None.
+    """
+    rng = random.Random(seed)
+    taken = np.zeros((height, width), dtype=bool)   #cells within the neighbourhood of an item
+    scenario = {"width": width, "height": height, "nb_agents": nb_agents, "obstacles": int(round(obstacle_density * width * height / OBSTACLE_AREA))}
+
+    def free_item_cell():
+        """ Random cell whose neighbourhood does not overlap the one of another item """
+        for _ in range(1000):
+            x, y = rng.randrange(width), rng.randrange(height)
+            window = taken[max(0, y - 2*ITEM_RADIUS):y + 2*ITEM_RADIUS + 1, max(0, x - 2*ITEM_RADIUS):x + 2*ITEM_RADIUS + 1]
+            if not window.any():
+                taken[max(0, y - ITEM_RADIUS):y + ITEM_RADIUS + 1, max(0, x - ITEM_RADIUS):x + ITEM_RADIUS + 1] = True
+                return x, y
+        raise ValueError(f"A {width}x{height} map is too small for the items of {nb_agents} agents")
+
+    for i in range(1, nb_agents + 1):
+        for item in ("key", "box"):
+            x, y = free_item_cell()
+            scenario[f"{item}_{i}"] = {"x": x, "y": y}
+    for i in range(1, nb_agents + 1):
+        while True:
+            x, y = rng.randrange(width), rng.randrange(height)
+            if not taken[y, x]:     #do not start on an item or its neighbour cells
+                break
+        scenario[f"agent_{i}"] = {"x": x, "y": y, "color": agent_color(i - 1, nb_agents)}
+    return scenario
+
+
+def load_scenario(filename):
+    with open(filename, "r") as json_file:
+        return json.load(json_file)
+
+
+def save_scenario(scenario, filename):
+    with open(filename, "w") as json_file:
+        json.dump(scenario, json_file)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a procedural scenario")
+    parser.add_argument("-W", "--width", help="Number of columns of the map", type=int, default=500)
+    parser.add_argument("-H", "--height", help="Number of rows of the map", type=int, default=500)
+    parser.add_argument("-nb", "--nb_agents", help="Number of agents", type=int, default=100)
+    parser.add_argument("-d", "--density", help="Fraction of the map covered by obstacles", type=float, default=0.05)
+    parser.add_argument("-s", "--seed", help="Seed of the generator", type=int, default=None)
+    parser.add_argument("-o", "--output", help="JSON file to write", type=str, default="scenario.json")
+    args = parser.parse_args()
+
+    save_scenario(generate_scenario(args.width, args.height, args.nb_agents, args.density, args.seed), args.output)
+    print(f"Scenario with {args.nb_agents} agents on a {args.width}x{args.height} map saved in {args.output}")
@@ -6,11 +6,16 @@ __version__ = "1.0.0"
 
 
 import socket, pickle
-from threading import Thread, Lock
+from threading import Thread, Lock, Event
 import sys, argparse, os
 from game import Game
+from protocol import Channel, hello_ack
+from outbound import OutboundQueue, OVERFLOW_POLICIES, coalesce_key
+from scenario import load_scenario
+from clock import CLOCK_MODES, make_clock
+from snapshot import VIEWERS, ViewerProcess
+from recorder import Recorder
 from my_constants import *
-from time import sleep
 
 if os.name == "nt": #If you are on Windows
     screen_resolution_to_fix = True  #Set this variable to True if you face resolution issues when the GUI appears
@@ -21,9 +26,16 @@ if os.name == "nt": #If you are on Windows
 
 class Server:
     """ Server handling communication between the agents and the game """
-    def __init__(self, conf, nb_agents, map_id):
-        """ Initialize the server """
-        self.game = Game(nb_agents, map_id)
+    def __init__(self, conf, nb_agents, map_id, gui=True, queue_size=256, overflow_policy="drop_oldest", scenario=None, clock=None, viewer="inline", record=None):
+        """ Initialize the server. The game window is drawn by the main thread ('inline' viewer), by another process
+        ('process' viewer, see snapshot.py) or not at all ('none' viewer, or gui=False). The episode is logged in the
+        file 'record' when given (see recorder.py) """
+        self.viewer = viewer if gui else "none"
+        self.game = Game(nb_agents, map_id, gui=self.viewer == "inline", scenario=scenario, clock=clock)
+        self.clock = clock
+        if record is not None:
+            self.game.recorder = Recorder(record, self.game)
+        self.done = Event()  #set when the game is over, used to wait for the end without GUI
         self.nb_disconnected = 0
         self.id_count = 0
         self.conf = conf
@@ -31,48 +43,76 @@ class Server:
         
         self.agent_state = [1]*nb_agents
         
-        self.clients = []
+        self.clients = []   #outbound queues of the connected clients
         self.clients_lock = Lock()
+        self.queue_size = queue_size
+        self.overflow_policy = overflow_policy
         print(f"Server configuration: {conf}")
         self.s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
         self.s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)    #SO_REUSEADDR flag tells the kernel to reuse a local socket in TIME_WAIT state, without waiting for its natural timeout to expire.
         self.s.bind(conf)
-        self.s.listen()
+        self.s.listen(max(128, nb_agents))
         self.start()
 
 
     def start(self):
         """ Start listening to incoming clients """
         print("Server ready! Waiting for connections...")
+        viewer = ViewerProcess(self.game, self.clock) if self.viewer == "process" else None
         while self.id_count < self.nb_agents:
             conn, addr = self.s.accept()
             print(f'Agent connexion : {conn}')
-            with self.clients_lock:
-                self.clients.append(conn)
             Thread(target=self.client_cb, daemon=True, args=(conn, addr, self.id_count)).start()
             self.id_count += 1
-            sleep(0.1)
-        self.game.gui.render()
+        if self.viewer == "inline":
+            self.game.gui.render()
+        else:
+            self.done.wait()
+        if viewer is not None:
+            viewer.stop()
+        if self.game.recorder is not None:
+            self.game.recorder.close()
     
 
     def client_cb(self, conn, addr, client_id):
         """ Handle the interactions with a client """
         print(f"Connected to {addr[0]} on port {addr[1]}")
-        self.game.nb_ready += 1
 
         conn.send(pickle.dumps((client_id)))
+        channel = Channel(conn)
+        client = None
 
         try:
+            msg = channel.receive()
+            if msg["header"] == HELLO:   #the agent supports the binary format
+                channel.send(hello_ack())
+                channel.binary = True
+                msg = None
+            client = OutboundQueue(channel, self.queue_size, self.overflow_policy)    #from now on, everything is sent by its writer
+            with self.clients_lock:
+                self.clients.append(client)
+                self.game.nb_ready += 1
+                ready = list(self.clients) if self.game.nb_ready == self.nb_agents else []
+            for other in ready:     #the last agent is connected: start the game
+                other.put(other.channel.serialize({"sender": GAME_ID, "header": GAME_START, "nb_agents": self.nb_agents}))
+
             while True:
-                msg = pickle.loads(conn.recv(1024))
+                if msg is None:
+                    msg = channel.receive()
                 if msg["header"] == BROADCAST_MSG:
                     msg["sender"] = GAME_ID
                     if "nav_state" in msg and msg["nav_state"] == COMPLETED:
                         self.agent_state[client_id] = 0
-                    self.send_to_all(conn, msg)
+                    if self.game.recorder is not None:
+                        self.game.recorder.broadcast(client_id, msg)
+                    self.send_to_all(client, msg)
                 else:
                     reply = self.game.process(msg, client_id)
-                    conn.send(pickle.dumps(reply))
+                    if reply is not None:   #None for an unknown header, nothing to send back
+                        if "seq" in msg:    #let the agent match the reply with its request
+                            reply["seq"] = msg["seq"]
+                        client.put(channel.serialize(reply))
+                msg = None
                 
                 # Vérifier si tous les agents ont terminé
                 if all(state == 0 for state in self.agent_state):
@@ -85,11 +125,19 @@ class Server:
         finally:
             print(f"Closing connection with {addr[0]} on port {addr[1]}")
             with self.clients_lock:
-                self.clients.remove(conn)
+                if client in self.clients:
+                    self.clients.remove(client)
+            if client is not None:
+                client.close()
+                print(f"Outbound queue of client {client_id}: {client.stats()}")
+            else:
                 conn.close()
+            with self.clients_lock:
                 self.nb_disconnected += 1
                 if self.nb_disconnected >= self.nb_agents:
-                    self.game.gui.running = False
+                    if self.game.gui is not None:
+                        self.game.gui.running = False
+                    self.done.set()
                     sys.exit()
     
     
@@ -113,16 +161,23 @@ class Server:
             print(f"Error closing server socket: {e}")
 
         # Arrêter proprement le processus principal
-        self.game.gui.running = False
+        if self.game.gui is not None:
+            self.game.gui.running = False
+        self.done.set()
         sys.exit()
 
 
     def send_to_all(self, sender, msg):
-        """ Broadcast a msg to all clients except the 'sender' """
+        """ Broadcast a msg to all clients except the 'sender'. The message is only queued, the writers of the
+        clients send it """
+        data = {}   #serialize the message once per format
+        key = coalesce_key(msg)
         with self.clients_lock:
-            for client in self.clients:
-                if client != sender:
-                    client.send(pickle.dumps(msg))
+            clients = [client for client in self.clients if client != sender]
+        for client in clients:
+            if client.binary not in data:
+                data[client.binary] = client.channel.serialize(msg)
+            client.put(data[client.binary], key)
 
 
 
@@ -131,15 +186,36 @@ if __name__ == "__main__":
     parser.add_argument("-i", "--ip_server", help="Ip address of the server", type=str, default="localhost")
     parser.add_argument("-nb", "--nb_agents", help="Number of agents: 1, 2, 3 or 4", type=int, default=3)
     parser.add_argument("-mi", "--map_id", help="Map to load: 1 or 2 or 3", type=int, default=3)
+    parser.add_argument("-m", "--mode", help="Server implementation: threaded (one thread per agent) or asyncio (single event loop)", type=str, default="threaded")
+    parser.add_argument("-g", "--gui", help="Display the game window : true/false", type=str, default="true")
+    parser.add_argument("-vw", "--viewer", help=f"Where the game window is drawn: {'/'.join(VIEWERS)} (inline: by the server itself, process: by a process of its own)", type=str, default="inline")
+    parser.add_argument("-q", "--queue_size", help="Messages queued for each agent before the overflow policy applies", type=int, default=256)
+    parser.add_argument("-op", "--overflow_policy", help=f"What to do with broadcasts when a queue is full: {', '.join(OVERFLOW_POLICIES)}", type=str, default="drop_oldest")
+    parser.add_argument("-sc", "--scenario", help="Scenario generated by scenario.py, replaces the map", type=str, default=None)
+    parser.add_argument("-c", "--clock", help=f"Pace of the GUI, to match the agents : {'/'.join(CLOCK_MODES)}", type=str, default="realtime")
+    parser.add_argument("-ts", "--time_scale", help="Speed-up of the scaled clock", type=float, default=20.0)
+    parser.add_argument("-rec", "--record", help="Log the episode in this file, replayed by recorder.py", type=str, default=None)
 
 
     args = parser.parse_args()
     port = 5555
 
-    if not args.nb_agents in range(1, 5):    #Game are only designed for 1 to 4 agents
-        print("The number of agents should range between 1 and 4!")
-        sys.exit()
-    if not args.map_id in range(1, 4):    #There are only 3 maps
-        print("There are only 2 maps!")
-        sys.exit()
-    server = Server((args.ip_server, port), args.nb_agents, args.map_id)
\ No newline at end of file
+    scenario = None
+    if args.scenario is not None:    #the scenario defines the number of agents it supports
+        scenario = load_scenario(args.scenario)
+        if not args.nb_agents in range(1, scenario["nb_agents"] + 1):
+            print(f"The number of agents should range between 1 and {scenario['nb_agents']} for this scenario!")
+            sys.exit()
+    else:
+        if not args.nb_agents in range(1, 5):    #Game are only designed for 1 to 4 agents
+            print("The number of agents should range between 1 and 4!")
+            sys.exit()
+        if not args.map_id in range(1, 4):    #There are only 3 maps
+            print("There are only 2 maps!")
+            sys.exit()
+    clock = make_clock(args.clock, args.time_scale)
+    if args.mode == "asyncio":
+        from async_server import AsyncServer
+        server = AsyncServer((args.ip_server, port), args.nb_agents, args.map_id, gui=args.gui == "true", scenario=scenario, clock=clock, viewer=args.viewer, record=args.record, queue_size=args.queue_size, overflow_policy=args.overflow_policy)
+    else:
+        server = Server((args.ip_server, port), args.nb_agents, args.map_id, gui=args.gui == "true", queue_size=args.queue_size, overflow_policy=args.overflow_policy, scenario=scenario, clock=clock, viewer=args.viewer, record=args.record)
\ No newline at end of file
@@ -0,0 +1,247 @@
+__author__ = "Aybuke Ozturk Suri, Johvany Gustave"
+__copyright__ = "Copyright 2023, IN512, IPSA 2024"
+__credits__ = ["Aybuke Ozturk Suri", "Johvany Gustave"]
+__license__ = "Apache License 2.0"
+__version__ = "1.0.0"
+
+""" Headless in-process simulation of full episodes.
+
+The game runs without GUI and the agents keep their decision logic, but they talk to the game through an in-memory
+transport instead of sockets and skip their pauses, so that many episodes can be run in a row.
+"""
+
+import io, random, argparse
+from contextlib import redirect_stdout, nullcontext
+from queue import Queue
+from threading import Thread, Lock, Condition, Event
+from time import perf_counter
+import numpy as np
+
+from game import Game
+from agent import Agent
+from scenario import load_scenario
+from protocol import frame
+from clock import make_clock
+from my_constants import *
+
+
+class EpisodeAborted(Exception):
+    """ Raised in the agent threads when the episode is stopped (move budget exhausted or timeout) """
+
+
+class LocalHub:
+    """ In-memory replacement of the server: requests are processed by the game as soon as they are sent.
+
+    Once 'start_turns' is called, the agents play one at a time: an agent runs until its next request, which hands the
+    turn to the next agent. Messages for an agent are handed to its reader thread when it gets the turn back. With the
+    same seed, an episode is therefore always played the same way.
+    """
+    def __init__(self, game, max_moves):
+        self.game = game
+        self.max_moves = max_moves
+        self.lock = Lock()  #the game is mutated by one agent at a time
+        self.turn = Condition()
+        self.players = []   #ids of the agents taking turns, empty until the turns start
+        self.current = None
+        self.networks = []
+        self.agent_state = [1]*game.nb_agents
+        self.nb_requests = [0]*game.nb_agents
+        self.nb_moves = 0
+        self.nb_broadcast_bytes = 0 #bytes the broadcasts would take on the wire (binary format), once per recipient
+        self.aborted = False
+
+    def connect(self):
+        """ Create the transport of a new agent """
+        network = LocalNetwork(self, len(self.networks))
+        self.networks.append(network)
+        self.game.nb_ready += 1
+        if self.game.nb_ready == self.game.nb_agents:   #every agent is connected: start the game
+            for other in self.networks:
+                other.pending.append({"sender": GAME_ID, "header": GAME_START, "nb_agents": self.game.nb_agents})
+        return network
+
+    def handle(self, msg, client_id):
+        """ Process a message sent by an agent, return the reply if there is one """
+        with self.lock:
+            if self.aborted:
+                raise EpisodeAborted()
+            if msg["header"] == BROADCAST_MSG:
+                msg["sender"] = GAME_ID
+                self.nb_broadcast_bytes += len(frame(msg)) * (len(self.networks) - 1)
+                if "nav_state" in msg and msg["nav_state"] == COMPLETED:
+                    self.agent_state[client_id] = 0
+                for network in self.networks:
+                    if network.id != client_id:
+                        network.pending.append(dict(msg))
+                return None
+
+            self.nb_requests[client_id] += 1
+            reply = self.game.process(msg, client_id)
+            if msg["header"] == MOVE:
+                self.nb_moves += 1
+            elif msg["header"] == MOVE_BATCH:
+                self.nb_moves += len(reply["trajectory"])
+            if self.nb_moves > self.max_moves:
+                self.aborted = True
+            if "seq" in msg and reply is not None:
+                reply["seq"] = msg["seq"]
+            return reply
+
+    def start_turns(self):
+        """ From now on the agents play one at a time, in the order of their ids """
+        with self.turn:
+            self.players = [network.id for network in self.networks]
+            self.current = self.players[0]
+            self.turn.notify_all()
+
+    def wait_turn(self, client_id):
+        with self.turn:
+            while self.current != client_id and not self.aborted:
+                self.turn.wait()
+        if self.aborted:
+            raise EpisodeAborted()
+
+    def end_turn(self, client_id, leave=False):
+        """ Give the turn to the next agent, 'leave' when the agent stops playing """
+        with self.turn:
+            if client_id not in self.players:
+                return
+            index = self.players.index(client_id)
+            if leave:
+                self.players.remove(client_id)
+            else:
+                index += 1
+            self.current = self.players[index % len(self.players)] if self.players else None
+            self.turn.notify_all()
+
+    def abort(self):
+        """ Stop the episode: every following request raises EpisodeAborted and the readers are released """
+        with self.lock:
+            self.aborted = True
+        with self.turn:
+            self.turn.notify_all()
+        for network in self.networks:
+            network.inbox.put(None)
+
+
+class LocalNetwork:
+    """ Transport of an agent connected to a LocalHub, with the same interface as Network """
+    def __init__(self, hub, id):
+        self.hub = hub
+        self.id = id
+        self.pending = []   #messages waiting for the turn of the agent
+        self.inbox = Queue()    #messages read by the agent's msg_cb thread, None closes the connection
+        self.processed = Event()    #set when msg_cb asks for the next message, i.e. it processed the previous one
+
+    def send(self, data):
+        reply = self.hub.handle(data, self.id)
+        if reply is not None:
+            self.pending.append(reply)
+        self.deliver()
+
+    def request(self, data, timeout=5):
+        reply = self.hub.handle(dict(data), self.id)
+        if self.hub.players:
+            self.hub.end_turn(self.id)
+            self.hub.wait_turn(self.id)
+        self.deliver()
+        return reply
+
+    def deliver(self, timeout=1):
+        """ Hand the pending messages to msg_cb one by one, waiting until each of them is processed """
+        while self.pending:
+            self.processed.clear()
+            self.inbox.put(self.pending.pop(0))
+            self.processed.wait(timeout)
+
+    def receive(self):
+        self.processed.set()
+        msg = self.inbox.get()
+        if msg is None:
+            raise EOFError("Connection closed")
+        return msg
+
+
+def run_agent(agent, hub, errors):
+    """ Same behaviour as the autonomous mode of agent.py """
+    try:
+        hub.wait_turn(agent.network.id)
+        agent.navigate_to_points()
+        agent.communicate_completed_mission()
+    except EpisodeAborted:
+        pass
+    except Exception as e:
+        errors.append(e)
+    finally:
+        hub.end_turn(agent.network.id, leave=True)
+
+
+def duplicate_cells(game):
+    """ Number of cells visited by more than one agent """
+    visits = sum(path.mask().astype(np.int32) for path in game.agent_paths)
+    return int(np.count_nonzero(visits > 1))
+
+
+def run_episode(nb_agents, map_id, seed=None, max_moves=20000, timeout=60, verbose=False, scenario=None, planner="astar", tour="farthest", search="model", explore="border", share_every=20):
+    """ Play a full episode without GUI, sockets nor pauses and return its statistics """
+    random.seed(seed)
+    np.random.seed(seed)
+    game = Game(nb_agents, map_id, gui=False, scenario=scenario)
+    hub = LocalHub(game, max_moves)
+    networks = [hub.connect() for _ in range(nb_agents)]
+    errors = []
+
+    with nullcontext() if verbose else redirect_stdout(io.StringIO()):  #the agents print a lot, only keep it when verbose
+        start = perf_counter()
+        agents = [Agent(None, verbose, network=network, clock=make_clock("fast"), planner=planner, tour=tour, search=search, explore=explore, share_every=share_every) for network in networks]
+        threads = [Thread(target=run_agent, args=(agent, hub, errors), daemon=True) for agent in agents]
+        for thread in threads:
+            thread.start()
+        hub.start_turns()
+        for thread in threads:
+            thread.join(max(0, timeout - (perf_counter() - start)))
+        wall_time = perf_counter() - start
+        hub.abort()
+        for agent in agents:
+            agent.stop()
+
+    return {
+        "nb_agents": nb_agents,
+        "map_id": map_id,
+        "seed": seed,
+        "completed": all(agent.nav_state["nav_state"] == 'mission_completed' for agent in agents),
+        "moves": hub.nb_moves,
+        "wall_time": wall_time,
+        "round_trips": sum(hub.nb_requests),
+        "duplicate_cells": duplicate_cells(game),
+        "broadcast_bytes": hub.nb_broadcast_bytes,
+        "errors": [repr(e) for e in errors],
+        "agents": [agent.get_robot_stat() for agent in agents],
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run headless episodes in process")
+    parser.add_argument("-nb", "--nb_agents", help="Number of agents: 1 to 4, or up to the agents of the scenario", type=int, default=2)
+    parser.add_argument("-mi", "--map_id", help="Map to load: 1 or 2 or 3", type=int, default=1)
+    parser.add_argument("-e", "--episodes", help="Number of episodes to run", type=int, default=10)
+    parser.add_argument("-s", "--seed", help="Seed of the first episode, the next ones use the following seeds", type=int, default=0)
+    parser.add_argument("-mm", "--max_moves", help="Moves after which an episode is stopped", type=int, default=20000)
+    parser.add_argument("-v", "--verbose", help="Display the output of the agents : false/true", type=str, default="false")
+    parser.add_argument("-sc", "--scenario", help="Scenario generated by scenario.py, replaces the map", type=str, default=None)
+    parser.add_argument("-pl", "--planner", help="Path planning of the agents : astar/greedy", type=str, default="astar")
+    parser.add_argument("-to", "--tour", help="Order of the points of interest : farthest/shortest", type=str, default="farthest")
+    parser.add_argument("-se", "--search", help="Search of an item once in its rings : model/hotcold", type=str, default="model")
+    parser.add_argument("-ex", "--explore", help="Exploration of the map : border/frontier", type=str, default="border")
+    parser.add_argument("-sh", "--share_every", help="Moves between two broadcasts of the observed cells, 0 to disable", type=int, default=20)
+    args = parser.parse_args()
+    scenario = load_scenario(args.scenario) if args.scenario else None
+
+    start = perf_counter()
+    for i in range(args.episodes):
+        episode = run_episode(args.nb_agents, args.map_id, args.seed + i, args.max_moves, verbose=args.verbose == "true", scenario=scenario, planner=args.planner, tour=args.tour, search=args.search, explore=args.explore, share_every=args.share_every)
+        unique = [agent["unique_cells"] for agent in episode["agents"]]
+        print(f"episode {i} (seed {episode['seed']}): completed={episode['completed']} moves={episode['moves']} duplicates={episode['duplicate_cells']} "
+              f"round_trips={episode['round_trips']} unique_cells={unique} wall_time={episode['wall_time']:.2f}s {' '.join(episode['errors'])}")
+    elapsed = perf_counter() - start
+    print(f"{args.episodes} episodes in {elapsed:.1f}s ({60 * args.episodes / elapsed:.0f} episodes/min)")
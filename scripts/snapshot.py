@@ -0,0 +1,186 @@
+__author__ = "Aybuke Ozturk Suri, Johvany Gustave"
+__copyright__ = "Copyright 2023, IN512, IPSA 2024"
+__credits__ = ["Aybuke Ozturk Suri", "Johvany Gustave"]
+__license__ = "Apache License 2.0"
+__version__ = "1.0.0"
+
+""" Snapshot of the game state in shared memory, rendered by a viewer running in its own process.
+
+The server publishes what moves during a game in a multiprocessing.shared_memory block:
+
+    header: int64 slots (closed, number of agents, width, height)
+    agents: (version, x, y) of each agent, int64
+    bitmaps: cells visited by each agent, one bit per cell (the VisitedCells bitmaps of the game live in the block)
+
+The version of an agent is a sequence lock: it is odd while a move is being written, so that the viewer reads the
+position again when it changed meanwhile. An agent is only moved by the thread of its client (or by the event loop of
+the asyncio server), so each version has a single writer and no lock is needed. The version grows by 2 per move, the
+viewer knows how many moves an agent made since the previous frame.
+
+The bitmaps are only read in place: a cell never gets unvisited, a bit set during the read is simply painted on the next
+frame. An agent moves one cell at a time, so the cells it visited since the previous frame are at most as many rows away
+from it as the moves it made: the viewer only compares these rows of its bitmap. What does not move (map, colors, keys,
+boxes and obstacles) is sent once when the viewer starts.
+
+The server only pays for a few stores per move, the drawing and the window events are handled by the viewer process.
+"""
+
+from multiprocessing import Process, parent_process
+from multiprocessing.shared_memory import SharedMemory
+import numpy as np
+import pygame
+
+from game import Agent, VisitedCells
+from gui import GUI
+
+
+VIEWERS = ("inline", "process", "none")     #GUI in the server, in its own process, or no GUI at all
+HEADER_SLOTS = 8
+CLOSED, NB_AGENTS, WIDTH, HEIGHT = range(4)     #slots of the header
+AGENT_SLOTS = 3     #version, x and y of an agent
+
+
+def layout(nb_agents, w, h):
+    """ Offsets of the agents and of the bitmaps in the block, and its size """
+    agents = HEADER_SLOTS * 8
+    bitmaps = agents + AGENT_SLOTS * 8 * nb_agents
+    return agents, bitmaps, bitmaps + nb_agents * ((w*h + 7) // 8)
+
+
+class StateSnapshot:
+    """ Positions and visited cells of the agents, in a shared memory block. The block is created when 'name' is None,
+    otherwise the existing block 'name' is attached """
+    def __init__(self, name=None, nb_agents=0, w=0, h=0):
+        self.shm = SharedMemory(create=True, size=layout(nb_agents, w, h)[-1]) if name is None else SharedMemory(name=name)
+        self.header = self.shm.buf[:HEADER_SLOTS * 8].cast("q")
+        if name is None:
+            self.header[NB_AGENTS], self.header[WIDTH], self.header[HEIGHT] = nb_agents, w, h
+        self.nb_agents, self.w, self.h = self.header[NB_AGENTS], self.header[WIDTH], self.header[HEIGHT]
+        agents, bitmaps, _ = layout(self.nb_agents, self.w, self.h)
+        self.agents = self.shm.buf[agents:bitmaps].cast("q")
+        row = (self.w*self.h + 7) // 8
+        self.bitmaps = [self.shm.buf[bitmaps + i*row:bitmaps + (i+1)*row] for i in range(self.nb_agents)]
+        self.game = None
+
+    @classmethod
+    def publish(cls, game):
+        """ Snapshot of 'game', kept up to date by Game.handle_move. The bitmaps of the game are moved into the block """
+        snapshot = cls(None, game.nb_agents, game.map_w, game.map_h)
+        snapshot.game = game
+        for i, path in enumerate(game.agent_paths):
+            snapshot.bitmaps[i][:] = path.bits
+            path.bits = snapshot.bitmaps[i]
+            snapshot.agents[AGENT_SLOTS*i + 1], snapshot.agents[AGENT_SLOTS*i + 2] = game.agents[i].x, game.agents[i].y
+        game.snapshot = snapshot
+        return snapshot
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def closed(self):
+        return bool(self.header[CLOSED])
+
+    def move(self, agent_id, x, y):
+        """ Publish the new position of an agent """
+        agents, i = self.agents, AGENT_SLOTS*agent_id
+        agents[i] += 1  #odd: being written
+        agents[i + 1], agents[i + 2] = x, y
+        agents[i] += 1
+
+    def read(self, agent_id):
+        """ Version and position of an agent, read while no move of the agent was written """
+        agents, i = self.agents, AGENT_SLOTS*agent_id
+        while True:
+            version = agents[i]
+            if not version & 1:
+                x, y = agents[i + 1], agents[i + 2]
+                if agents[i] == version:
+                    return version, x, y
+
+    def close(self):
+        """ Detach the block. The game of a published snapshot gets bitmaps of its own back """
+        if self.game is not None:
+            self.game.snapshot = None
+            for path in self.game.agent_paths:
+                path.bits = bytearray(path.bits)
+        for view in [self.header, self.agents] + self.bitmaps:
+            view.release()
+        self.shm.close()
+
+
+def view_state(game):
+    """ What the viewer needs of 'game' besides the snapshot, sent once when it starts """
+    return {"map_real": game.map_real, "colors": [agent.color for agent in game.agents], "item_index": game.item_index, "obstacle_centres": game.obstacle_centres}
+
+
+class SnapshotView:
+    """ The attributes of Game read by the GUI, rebuilt from a snapshot and the state of 'view_state' """
+    def __init__(self, snapshot, state):
+        self.snapshot = snapshot
+        self.nb_agents, self.map_w, self.map_h = snapshot.nb_agents, snapshot.w, snapshot.h
+        self.map_real = state["map_real"]
+        self.item_index = state["item_index"]
+        self.obstacle_centres = state["obstacle_centres"]
+        self.agents = [Agent(i+1, 0, 0, color) for i, color in enumerate(state["colors"])]
+        self.agent_paths = [VisitedCells(self.map_w, self.map_h) for _ in range(self.nb_agents)]    #visit order of the viewer
+        self.shared_bits = [np.frombuffer(bitmap, dtype=np.uint8) for bitmap in snapshot.bitmaps]   #no copy
+        self.versions = [-1]*self.nb_agents     #versions of the agents at the previous frame, -1 to compare the whole bitmaps
+
+    def sync(self):
+        """ Copy the positions and log the cells visited since the last call, False if nothing moved meanwhile """
+        w, moved = self.map_w, False
+        for i, agent in enumerate(self.agents):
+            version, agent.x, agent.y = self.snapshot.read(i)
+            if version == self.versions[i]:
+                continue
+            nb_moves = (version - self.versions[i]) // 2 if self.versions[i] >= 0 else self.map_h
+            self.versions[i], moved = version, True
+            y0, y1 = max(0, agent.y - nb_moves), min(self.map_h - 1, agent.y + nb_moves)   #rows the new cells are in
+            start, end = y0*w >> 3, ((y1 + 1)*w + 7) >> 3
+            shared, local = self.shared_bits[i][start:end], np.frombuffer(self.agent_paths[i].bits, dtype=np.uint8)[start:end]
+            changed = np.flatnonzero(shared != local)
+            if changed.size:
+                new = np.unpackbits((shared[changed] & ~local[changed])[:, None], axis=1, bitorder="little").astype(bool)
+                for cell in ((changed + start)[:, None]*8 + np.arange(8))[new].tolist():
+                    self.agent_paths[i].add(cell % w, cell // w)
+        return moved
+
+    def close(self):
+        self.shared_bits = []   #release the views of the block
+
+
+def run_viewer(name, state, clock=None):
+    """ Render the snapshot 'name' until the window or the snapshot is closed. Entry point of the viewer process """
+    snapshot = StateSnapshot(name)
+    view = SnapshotView(snapshot, state)
+    gui = GUI(view, clock=clock)
+    parent = parent_process()
+    gui.on_init()
+    while gui.running and not snapshot.closed and (parent is None or parent.is_alive()):
+        for event in pygame.event.get():
+            gui.on_event(event)
+        if view.sync() or gui.view_changed:     #agents moved, or the view was scrolled or zoomed
+            gui.draw()
+        gui.clock.tick(gui.fps)
+    gui.on_cleanup()
+    view.close()
+    snapshot.close()
+
+
+class ViewerProcess:
+    """ Viewer rendering 'game' from its own process """
+    def __init__(self, game, clock=None):
+        self.snapshot = StateSnapshot.publish(game)
+        self.process = Process(target=run_viewer, args=(self.snapshot.name, view_state(game), clock), daemon=True)
+        self.process.start()
+
+    def stop(self, timeout=5):
+        """ Close the window and free the shared memory """
+        self.snapshot.header[CLOSED] = 1
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.snapshot.close()
+        self.snapshot.shm.unlink()
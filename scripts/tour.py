@@ -0,0 +1,136 @@
+__author__ = "Aybuke Ozturk Suri, Johvany Gustave"
+__copyright__ = "Copyright 2023, IN512, IPSA 2024"
+__credits__ = ["Aybuke Ozturk Suri", "Johvany Gustave"]
+__license__ = "Apache License 2.0"
+__version__ = "1.0.0"
+
+""" Order in which an agent visits its points of interest.
+
+    farthest: always go to the farthest remaining point, the tour zig-zags across the map and sweeps its interior
+    shortest: the tour needing the fewest moves, which mostly follows the edges where the points are sampled
+
+The agent moves in 8 directions, so the number of moves between two cells is their Chebyshev distance. The shortest
+tour starts at the position of the agent and ends at any point: a dummy end point, at distance 0 from every point, is
+appended so that the open path can be improved with the usual closed tour moves. The tour is seeded with the nearest
+neighbour heuristic, then improved with 2-opt and Or-opt moves until no move shortens it or the time budget is spent.
+"""
+
+from time import perf_counter
+import numpy as np
+
+
+TOUR_STRATEGIES = ("farthest", "shortest")
+
+
+def chebyshev_matrix(points):
+    """ Number of moves between every pair of points """
+    points = np.asarray(points, dtype=np.int64).reshape(-1, 2)
+    return np.abs(points[:, None, :] - points[None, :, :]).max(axis=2)
+
+
+def tour_length(points, start):
+    """ Number of moves to visit 'points' in order from 'start' """
+    path = np.asarray([start] + list(points), dtype=np.int64)
+    return int(np.abs(np.diff(path, axis=0)).max(axis=1).sum()) if len(path) > 1 else 0
+
+
+def farthest_first(points, start):
+    """ Tour always going to the farthest (Euclidean) remaining point, ties broken by the order of 'points' """
+    cells = np.asarray([start] + list(points), dtype=np.int64)
+    dist2 = ((cells[:, None, :] - cells[None, :, :])**2).sum(axis=2)   #squared distances are exact
+    order = [0]
+    visited = np.zeros(len(cells), dtype=bool)
+    visited[0] = True
+    for _ in range(len(points)):
+        row = np.where(visited, -1, dist2[order[-1]])
+        order.append(int(row.argmax()))
+        visited[order[-1]] = True
+    return [points[index - 1] for index in order[1:]]
+
+
+def nearest_neighbour(dist):
+    """ Tour of the indices of 'dist' from 0, always going to the closest point not visited yet """
+    n = len(dist)
+    order = [0]
+    visited = np.zeros(n, dtype=bool)
+    visited[0] = True
+    for _ in range(n - 1):
+        row = np.where(visited, np.iinfo(dist.dtype).max, dist[order[-1]])
+        order.append(int(row.argmin()))
+        visited[order[-1]] = True
+    return order
+
+
+def two_opt(order, dist):
+    """ Apply the 2-opt move (reversal of order[i:j+1]) shortening the tour the most, the first and last points stay in
+    place. Return False if there is none """
+    o = np.asarray(order)
+    k = len(o) - 2  #last position that can move
+    if k < 2:
+        return False
+    i = np.arange(1, k + 1)
+    edges = dist[o[:-1], o[1:]]     #edges[p]: from o[p] to o[p + 1]
+    delta = (dist[o[i - 1]][:, o[i]] + dist[o[i]][:, o[i + 1]] - edges[i - 1][:, None] - edges[i][None, :])
+    delta[np.tril_indices(k)] = 0   #only i < j
+    best = int(delta.argmin())
+    if delta.flat[best] >= 0:
+        return False
+    a, b = divmod(best, k)
+    order[a + 1:b + 2] = order[a + 1:b + 2][::-1]
+    return True
+
+
+def or_opt(order, dist, max_segment=3):
+    """ Apply the first Or-opt move (a segment of 1 to 'max_segment' points moved elsewhere, possibly reversed) that
+    shortens the tour, the first and last points stay in place. Return False if there is none """
+    o = np.asarray(order)
+    n = len(o)
+    edges = dist[o[:-1], o[1:]]
+    for length in range(1, max_segment + 1):
+        for i in range(1, n - length):
+            j = i + length - 1  #last position of the segment
+            first, last = o[i], o[j]
+            gain = edges[i - 1] + edges[j] - dist[o[i - 1], o[j + 1]]
+            if gain <= 0:
+                continue
+            p = np.r_[0:i - 1, j + 1:n - 1]     #insertion between o[p] and o[p + 1], not next to the segment
+            if not len(p):
+                continue
+            forward = dist[o[p], first] + dist[last, o[p + 1]] - edges[p]
+            backward = dist[o[p], last] + dist[first, o[p + 1]] - edges[p]
+            costs = np.minimum(forward, backward)
+            best = int(costs.argmin())
+            if costs[best] < gain:
+                segment = order[i:j + 1]
+                if backward[best] < forward[best]:
+                    segment.reverse()
+                insert_after = int(p[best])
+                rest = order[:i] + order[j + 1:]
+                position = insert_after + 1 if insert_after < i else insert_after + 1 - length
+                order[:] = rest[:position] + segment + rest[position:]
+                return True
+    return False
+
+
+def build_tour(points, start, time_budget=0.05):
+    """ Order the points to visit from 'start' so that the tour takes as few moves as possible.
+
+    Args:
+        points (list[tuple[int, int]]): Points to visit.
+        start (tuple[int, int]): Position of the agent.
+        time_budget (float, optional): Seconds after which the improvement stops. Defaults to 0.05.
+
+    Returns:
+        list[tuple[int, int]]: The points in the order to visit them.
+    """
+    if len(points) < 2:
+        return list(points)
+    deadline = perf_counter() + time_budget
+    n = len(points) + 1
+    dist = np.zeros((n + 1, n + 1), dtype=np.int64)     #start, points, then the dummy end
+    dist[:n, :n] = chebyshev_matrix([start] + list(points))
+    order = nearest_neighbour(dist[:n, :n]) + [n]
+    while perf_counter() < deadline:
+        if not two_opt(order, dist) and not or_opt(order, dist):
+            break   #local optimum
+    return [points[index - 1] for index in order[1:-1]]
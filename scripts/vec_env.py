@@ -0,0 +1,117 @@
+__author__ = "Aybuke Ozturk Suri, Johvany Gustave"
+__copyright__ = "Copyright 2023, IN512, IPSA 2024"
+__credits__ = ["Aybuke Ozturk Suri", "Johvany Gustave"]
+__license__ = "Apache License 2.0"
+__version__ = "1.0.0"
+
+""" Vectorized environment playing many episodes of the same map size at once, for offline strategy evaluation.
+
+The state of E episodes of N agents is held in NumPy arrays: the maps, the positions (E, N), the cells visited by
+each agent and the cells of the keys and boxes of the agents (E, N). 'step' applies one direction per agent of every
+episode with a few array operations, with the rules of Game.handle_move: a move leaving the map is ignored and the
+agent reads the value of the cell it stands on. The maps and the visited cells are flat arrays, so that the lookups
+of every agent at once are a single 'take'. An agent holds its key once it stood on it, and is done once it
+reaches its box with the key, like the agents of agent.py (the game itself does not track it).
+
+There is no network and no agent logic: the strategy being evaluated reads the arrays and chooses the next actions.
+"""
+
+import io, random
+from contextlib import redirect_stdout
+import numpy as np
+
+from game import Game, MOVES
+from my_constants import STAND
+
+
+MOVE_X = np.array([dx for dx, _ in MOVES], dtype=np.int32)   #dx and dy of each direction, indexed by the actions
+MOVE_Y = np.array([dy for _, dy in MOVES], dtype=np.int32)
+
+
+def make_games(map_id, nb_agents, nb_episodes, seed=0, scenario=None):
+    """ 'nb_episodes' games of a map (or scenario) without GUI, the obstacles of episode e being placed with the seed
+    'seed' + e like in the headless simulation """
+    games = []
+    for episode in range(nb_episodes):
+        random.seed(seed + episode)
+        np.random.seed(seed + episode)
+        with redirect_stdout(io.StringIO()):    #obstacles that cannot be placed are reported on stdout
+            games.append(Game(nb_agents, map_id, gui=False, scenario=scenario))
+    return games
+
+
+class VecEnv:
+    """ E episodes of N agents stepped together """
+    def __init__(self, maps, starts, keys, boxes):
+        """ Build the environment from the maps (E, H, W) and the (x, y) of the starts, keys and boxes (E, N, 2) """
+        maps = np.asarray(maps, dtype=float)
+        self.nb_episodes, self.h, self.w = maps.shape
+        self.maps = maps.ravel()
+        starts = np.asarray(starts, dtype=np.int32)
+        self.nb_agents = starts.shape[1]
+        self.start_x, self.start_y = starts[..., 0].copy(), starts[..., 1].copy()
+        self.key_cells = self.linear(np.asarray(keys, dtype=np.int32))
+        self.box_cells = self.linear(np.asarray(boxes, dtype=np.int32))
+        size = self.h * self.w
+        self.map_offsets = (np.arange(self.nb_episodes, dtype=np.int64) * size)[:, None]     #first cell of each map
+        self.path_offsets = np.arange(self.nb_episodes * self.nb_agents, dtype=np.int64).reshape(self.nb_episodes, self.nb_agents) * size
+        self.reset()
+
+    def linear(self, positions):
+        """ Linear index in its map of each (x, y) of 'positions' (E, N, 2) """
+        return positions[..., 1] * self.w + positions[..., 0]
+
+    @classmethod
+    def from_games(cls, games):
+        """ Environment playing the given games (same size and number of agents), built with gui=False """
+        return cls([game.map_real for game in games],
+                   [[(agent.x, agent.y) for agent in game.agents] for game in games],
+                   [[(key.x, key.y) for key in game.keys] for game in games],
+                   [[(box.x, box.y) for box in game.boxes] for game in games])
+
+    @classmethod
+    def from_map(cls, map_id, nb_agents, nb_episodes, seed=0, scenario=None):
+        """ Environment playing the games of 'make_games' """
+        return cls.from_games(make_games(map_id, nb_agents, nb_episodes, seed, scenario))
+
+    @property
+    def positions(self):
+        """ (x, y) of every agent (E, N, 2) """
+        return np.stack((self.x, self.y), axis=2)
+
+    @property
+    def visited(self):
+        """ Cells visited by every agent (E, N, H*W) """
+        return self.paths.reshape(self.nb_episodes, self.nb_agents, self.h * self.w)
+
+    def reset(self):
+        """ Put the agents back on their starts, return the values they read (E, N) """
+        self.x, self.y = self.start_x.copy(), self.start_y.copy()
+        self.paths = np.zeros(self.nb_episodes * self.nb_agents * self.h * self.w, dtype=bool)
+        self.nb_unique = np.zeros((self.nb_episodes, self.nb_agents), dtype=np.int64)
+        self.nb_moves = np.zeros((self.nb_episodes, self.nb_agents), dtype=np.int64)
+        self.has_key = np.zeros((self.nb_episodes, self.nb_agents), dtype=bool)
+        self.done = np.zeros((self.nb_episodes, self.nb_agents), dtype=bool)
+        return self.update()
+
+    def step(self, actions):
+        """ Move every agent of every episode in the direction given by 'actions' (E, N), STAND to stay. Return the
+        values of the cells the agents stand on (E, N) """
+        actions = np.asarray(actions)
+        x, y = self.x + MOVE_X.take(actions), self.y + MOVE_Y.take(actions)
+        inside = (x >= 0) & (x < self.w) & (y >= 0) & (y < self.h)
+        np.copyto(self.x, x, where=inside)
+        np.copyto(self.y, y, where=inside)
+        self.nb_moves += actions != STAND
+        return self.update()
+
+    def update(self):
+        """ Log the visits of the cells of the agents, update the keys held and the agents done, return the values
+        read """
+        cells = self.y * self.w + self.x
+        visits = self.path_offsets + cells
+        self.nb_unique += ~self.paths.take(visits)
+        self.paths.put(visits, True)
+        self.has_key |= cells == self.key_cells
+        self.done |= self.has_key & (cells == self.box_cells)
+        return self.maps.take(self.map_offsets + cells)